@@ -19,10 +19,13 @@ import torch
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import json
+import hashlib
 
-# Embedding model
-device = 'cuda' if torch.cuda.is_available() else 'cpu'
-model = SentenceTransformer('all-MiniLM-L6-v2', device=device)
+# Embedding model, loaded on first use by load_embedding_model()
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDING_BATCH_SIZE = 256
+MULTI_PROCESS_MIN_PLOTS = 2000  # Below this, starting the worker pool costs more than it saves
+model = None
 #_________________________________________________________________
 
 
@@ -384,6 +387,9 @@ def add_ontology(g):
     g.add((DBO.plotEmbedding, RDFS.domain, DBO.Film))
     g.add((DBO.plotEmbedding, RDFS.range, XSD.string))
 
+    g.add((DBO.plotEmbeddingIndex, RDFS.domain, DBO.Film))
+    g.add((DBO.plotEmbeddingIndex, RDFS.range, XSD.integer))
+
     # Add subclass relationships
     g.add((DBO.Actor, RDFS.subClassOf, DBO.Person))
     g.add((DBO.Director, RDFS.subClassOf, DBO.Person))
@@ -411,13 +417,122 @@ def add_ontology(g):
 
     return g
 
-def csv_to_rdf(csv_file, rdf_file):
+def load_embedding_model():
+    """Load the sentence embedding model once."""
+    global model
+    if model is None:
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        model = SentenceTransformer(EMBEDDING_MODEL_NAME, device=device)
+    return model
+
+def plot_hash(plot):
+    """Hash a plot text, so unchanged plots can be skipped on the next run."""
+    return hashlib.sha1(plot.encode('utf-8')).hexdigest()
+
+def encode_plots(plots, batch_size=EMBEDDING_BATCH_SIZE):
+    """
+    Encode plot texts in large batches. On a CPU-only machine with many plots, the work is spread over a
+    multi-process pool with one worker per core.
+
+    Parameters:
+        plots (list): The plot texts to encode.
+        batch_size (int): The number of plots per encode batch.
+
+    Returns:
+        np.ndarray: One embedding per plot.
+    """
+    embedding_model = load_embedding_model()
+    if not torch.cuda.is_available() and len(plots) >= MULTI_PROCESS_MIN_PLOTS and (os.cpu_count() or 1) > 1:
+        pool = embedding_model.start_multi_process_pool(target_devices=['cpu'] * os.cpu_count())
+        try:
+            return embedding_model.encode_multi_process(plots, pool, batch_size=batch_size)
+        finally:
+            embedding_model.stop_multi_process_pool(pool)
+    return embedding_model.encode(plots, batch_size=batch_size, show_progress_bar=True)
+
+def embed_plots(csv_file, cache_file):
+    """
+    Embedding stage: collect all plots of the CSV file and encode them in batches, reusing the embeddings of
+    plots whose text hash is already in the cache from a previous run.
+
+    Parameters:
+        csv_file (str): Path to the input CSV file.
+        cache_file (str): Path of the .npz cache of plot hash -> embedding.
+
+    Returns:
+        dict: Plot text -> embedding vector.
+    """
+    plots = set()
+    with open(csv_file, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            plot = row.get('plot')
+            if plot is not None and plot != '' and plot.strip() != 'N/A':
+                plots.add(plot)
+    plots = sorted(plots)
+    hashes = [plot_hash(plot) for plot in plots]
+
+    cached = {}
+    if cache_file and os.path.exists(cache_file):
+        with np.load(cache_file) as cache:
+            cached = dict(zip(cache['hashes'].tolist(), cache['vectors']))
+
+    missing = [i for i, h in enumerate(hashes) if h not in cached]
+    print(f"Embedding stage: {len(plots)} plots, {len(plots) - len(missing)} unchanged, {len(missing)} to encode")
+    if missing:
+        start_time = time.time()
+        vectors = encode_plots([plots[i] for i in missing])
+        for i, vector in zip(missing, vectors):
+            cached[hashes[i]] = vector
+        print(f"Encoded {len(missing)} plots in {time.time() - start_time:.1f} seconds")
+
+        if cache_file:
+            # Only keep the plots of the current dataset in the cache
+            os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+            np.savez(cache_file, hashes=np.array(hashes), vectors=np.array([cached[h] for h in hashes], dtype=np.float32))
+
+    return {plot: cached[h] for plot, h in zip(plots, hashes)}
+
+def embeddings_rows_file(embeddings_file):
+    """Path of the side-car file listing the movie URI and label of every row of an embeddings .npy file."""
+    return f"{os.path.splitext(embeddings_file)[0]}.rows.tsv"
+
+def save_plot_embeddings(embeddings_file, movie_uris, movie_labels, embeddings, dtype="float32"):
+    """
+    Save plot embeddings as a memory-mappable .npy matrix plus a side-car file of row URIs and labels.
+    The rows are L2-normalised, so the REST service can use the file as-is without any parsing.
+
+    Parameters:
+        embeddings_file (str): Path of the .npy file to write.
+        movie_uris (list): The movie URIs, one per row.
+        movie_labels (list): The movie labels, one per row.
+        embeddings (list): The embedding vectors, one per row.
+        dtype (str): "float32", or "float16" to halve the file size.
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix = (matrix / norms).astype(dtype)
+
+    os.makedirs(os.path.dirname(embeddings_file) or ".", exist_ok=True)
+    np.save(embeddings_file, matrix)
+    with open(embeddings_rows_file(embeddings_file), 'w', encoding='utf-8') as rows_file:
+        for movie_uri, movie_label in zip(movie_uris, movie_labels):
+            movie_label = " ".join(str(movie_label).split())  # Keep one row per line
+            rows_file.write(f"{movie_uri}\t{movie_label}\n")
+    print(f"Saved {matrix.shape[0]} plot embeddings ({dtype}) to {embeddings_file}")
+
+def csv_to_rdf(csv_file, rdf_file, embeddings_file=None, embeddings_dtype="float32", embedding_cache_file=None):
     """
     Convert a CSV file to RDF (Turtle format).
     
     Parameters:
         csv_file (str): Path to the input CSV file.
         rdf_file (str): Path to save the output Turtle file.
+        embeddings_file (str, optional): Path of a .npy file to write the plot embeddings to. When given, the RDF
+            only keeps a dbo:plotEmbeddingIndex row reference instead of a JSON string literal per movie.
+        embeddings_dtype (str, optional): The dtype of the embeddings file, "float32" or "float16".
+        embedding_cache_file (str, optional): Path of the .npz cache of plot hash -> embedding, so only new or
+            changed plots are encoded again.
     """
 
     # Create a new RDF graph
@@ -432,6 +547,9 @@ def csv_to_rdf(csv_file, rdf_file):
     processed_count = 0  # Count rows processed
     skipped_count = 0  # Count rows skipped
     movie_count = 0  # Count unique movies added to the graph
+    embedding_rows = {}  # Movie URI -> row in the embeddings file
+    embedding_labels = []
+    embedding_vectors = []
 
     df = pd.read_csv(csv_file, encoding='utf-8')
     print("Resolving unique countries...")
@@ -444,6 +562,10 @@ def csv_to_rdf(csv_file, rdf_file):
     unique_genres = df['genres'].dropna().unique()
     resolved_genres_dict = resolve_all_genres(unique_genres)
     g = preprocess_genres(g, resolved_genres_dict)
+
+    # Encode all plots up front in large batches instead of one model call per row
+    print("Embedding plots...")
+    plot_embeddings = embed_plots(csv_file, embedding_cache_file)
     
     with open(csv_file, 'r', encoding='utf-8') as f:
         print(f"Reading CSV file: {csv_file}...")
@@ -539,7 +661,14 @@ def csv_to_rdf(csv_file, rdf_file):
             # Handle embedding of plot
             plot = row.get('plot')
             if plot is not None and plot != '' and plot.strip() != 'N/A':
-                    plot_embedding = model.encode(plot)
+                if embeddings_file:
+                    if movie_uri not in embedding_rows:
+                        embedding_rows[movie_uri] = len(embedding_vectors)
+                        embedding_labels.append(movie_title)
+                        embedding_vectors.append(plot_embeddings[plot])
+                        g.add((movie_uri, DBO.plotEmbeddingIndex, Literal(embedding_rows[movie_uri], datatype=XSD.integer)))
+                else:
+                    plot_embedding = plot_embeddings[plot]
                     embedding_str = json.dumps(plot_embedding.tolist())
                     g.add((movie_uri, DBO.plotEmbedding, Literal(embedding_str, datatype=XSD.string)))
                     print(f"added embedding")
@@ -599,6 +728,9 @@ def csv_to_rdf(csv_file, rdf_file):
                         g.add((movie_uri, obj_predicate, object_uri))                        
                         g.add((object_uri, RDFS.label, Literal(value.strip(), lang="en")))
 
+    if embeddings_file and embedding_vectors:
+        save_plot_embeddings(embeddings_file, list(embedding_rows), embedding_labels, embedding_vectors, embeddings_dtype)
+
     # Serialize the graph to RDF (Turtle format)
     try:
         g.serialize(destination=rdf_file, format='turtle')
@@ -611,10 +743,16 @@ def csv_to_rdf(csv_file, rdf_file):
     print(f"Total rows skipped: {skipped_count}")
     print(f"Total unique movies added: {movie_count}")
 
-# File paths Datasets\CSVs\actors_URIs.csv
-folder_path = "DB/Datasets"
-csv_file = f"{folder_path}/CSVs/dbpedia_movies_2024_12_15_12_10_36.csv"  # Adjust the path to your CSV file
-rdf_file = f"{folder_path}/TTLs/dbpedia_movies.ttl"  # Path to save the Turtle file
-
-# Convert CSV to RDF
-csv_to_rdf(csv_file, rdf_file)
\ No newline at end of file
+if __name__ == "__main__":  # The embedding worker processes re-import this module
+    # File paths Datasets\CSVs\actors_URIs.csv
+    folder_path = "DB/Datasets"
+    csv_file = f"{folder_path}/CSVs/dbpedia_movies_2024_12_15_12_10_36.csv"  # Adjust the path to your CSV file
+    rdf_file = f"{folder_path}/TTLs/dbpedia_movies.ttl"  # Path to save the Turtle file
+    embeddings_file = None
+    # Opt-in: write the plot embeddings to a .npy side-car instead of dbo:plotEmbedding literals in the TTL
+    if os.environ.get("PLOT_EMBEDDINGS_SIDECAR", "false").lower() == "true":
+        embeddings_file = f"{folder_path}/Embeddings/plot_embeddings.npy"  # Path to save the plot embeddings
+    embedding_cache_file = f"{folder_path}/Embeddings/plot_embedding_cache.npz"  # Plot hash -> embedding of the last run
+
+    # Convert CSV to RDF
+    csv_to_rdf(csv_file, rdf_file, embeddings_file=embeddings_file, embedding_cache_file=embedding_cache_file)
\ No newline at end of file
@@ -0,0 +1,445 @@
+"""
+file: ann_index.py
+date: 17-10-2026
+description: This module provides approximate nearest-neighbour (ANN) indexes over the plot embedding matrix.
+The default index is a pure NumPy IVF (inverted file) index; an HNSW index is used when the optional hnswlib
+package is installed. Indexes are persisted to disk and calibrated at load time to reach a target recall@k.
+"""
+
+import hashlib
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:  # hnswlib is optional, the IVF index needs only NumPy
+    hnswlib = None
+
+
+ANN_INDEX_KIND = os.environ.get("ANN_INDEX", "ivf").lower()
+ANN_INDEX_DIR = os.environ.get("ANN_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "indexes"))
+ANN_TARGET_RECALL = float(os.environ.get("ANN_TARGET_RECALL", "0.95"))
+ANN_RECALL_K = int(os.environ.get("ANN_RECALL_K", "10"))
+ANN_NPROBE = int(os.environ.get("ANN_NPROBE", "8"))
+ANN_EF = int(os.environ.get("ANN_EF", "64"))
+
+
+def fingerprint(embeddings):
+    """
+    Fingerprint an embedding matrix, so a persisted index is only reused for the same catalogue and vectors.
+    Regenerated embeddings (a new model, edited plots) change the fingerprint even if the movies stay the same.
+
+    Args:
+        embeddings (PlotEmbeddingMatrix): The loaded embedding matrix.
+
+    Returns:
+        str: A hex digest of the movie URIs in row order and of the matrix shape, dtype and contents.
+    """
+    digest = hashlib.sha1()
+    for uri in embeddings.uris:
+        digest.update(uri.encode("utf-8"))
+        digest.update(b"\n")
+    matrix = np.ascontiguousarray(embeddings.matrix)
+    digest.update(f"{matrix.shape}:{matrix.dtype}".encode("utf-8"))
+    digest.update(matrix.reshape(-1).view(np.uint8))
+    return digest.hexdigest()
+
+
+def _normalise_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores, k):
+    """
+    Get the indices of the k highest scores, best first.
+    """
+    if k < len(scores):
+        best = np.argpartition(-scores, k - 1)[:k]
+    else:
+        best = np.arange(len(scores))
+    return best[np.argsort(-scores[best], kind="stable")]
+
+
+class AnnIndex(ABC):
+    """
+    Base class of the nearest-neighbour indexes over a PlotEmbeddingMatrix. Subclasses implement build, search_rows,
+    save and load.
+    """
+
+    kind = None
+
+    def __init__(self, embeddings):
+        """
+        Initialize the index over an embedding matrix.
+
+        Args:
+            embeddings (PlotEmbeddingMatrix): The loaded, L2-normalised embedding matrix.
+        """
+        self.embeddings = embeddings
+        self.recall = None
+
+    @abstractmethod
+    def build(self):
+        """
+        Build the index from the embedding matrix.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def search_rows(self, query_vector, k):
+        """
+        Find the k nearest matrix rows of a normalised query vector.
+
+        Returns:
+            tuple: (rows, cosine similarities), most similar first.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def save(self, path):
+        """
+        Persist the index to disk.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def load(self, path):
+        """
+        Load a persisted index from disk.
+
+        Returns:
+            bool: True if the persisted index matches the current catalogue and was loaded, False otherwise.
+        """
+        raise NotImplementedError
+
+    def search(self, query_vector, k):
+        """
+        Find the k movies whose embeddings are most similar to the query vector.
+
+        Args:
+            query_vector (array-like): The query embedding.
+            k (int): The number of results to return.
+
+        Returns:
+            list: A list of (movie URI, cosine similarity) tuples, most similar first.
+        """
+        if k <= 0 or not self.embeddings.is_loaded:
+            return []
+        rows, scores = self.search_rows(self.embeddings.normalise(query_vector), k)
+        scores = np.clip(np.round(scores, 6), -1.0, 1.0)
+        return [(self.embeddings.uris[row], float(score)) for row, score in zip(rows, scores)]
+
+    def measure_recall(self, queries, k):
+        """
+        Measure the mean recall@k of the index against exact search.
+
+        Args:
+            queries (np.ndarray): Normalised query vectors, one per row.
+            k (int): The number of neighbours to compare.
+
+        Returns:
+            float: The mean fraction of the exact top-k that the index returns.
+        """
+        exact = self.embeddings.matrix @ queries.T
+        hits = 0
+        for i, query in enumerate(queries):
+            truth = set(_top_k(exact[:, i], k).tolist())
+            found, _ = self.search_rows(query, k)
+            hits += len(truth.intersection(np.asarray(found).tolist()))
+        return hits / (len(queries) * k)
+
+    def calibrate(self, target_recall=ANN_TARGET_RECALL, k=ANN_RECALL_K, sample_size=200, seed=0):
+        """
+        Widen the search until the measured recall@k reaches the target.
+        """
+        self.recall = 1.0
+
+    def calibration_queries(self, sample_size, seed=0):
+        """
+        Generate calibration queries that fall between catalogue films, like free-text descriptions do.
+        """
+        matrix = self.embeddings.matrix
+        rng = np.random.default_rng(seed)
+        first = rng.integers(0, len(matrix), size=sample_size)
+        second = rng.integers(0, len(matrix), size=sample_size)
+        return _normalise_rows(matrix[first] + matrix[second]).astype(np.float32)
+
+    def describe(self):
+        """
+        Describe the index settings.
+
+        Returns:
+            dict: The index kind, size and measured recall.
+        """
+        return {"kind": self.kind, "size": len(self.embeddings.uris), "recall_at_k": self.recall, "k": ANN_RECALL_K}
+
+
+class ExactIndex(AnnIndex):
+    """
+    Exact brute-force search over the full matrix. Always has a recall of 1.0.
+    """
+
+    kind = "exact"
+
+    def build(self):
+        pass
+
+    def search_rows(self, query_vector, k):
+        scores = self.embeddings.matrix @ query_vector
+        best = _top_k(scores, k)
+        return best, scores[best]
+
+    def save(self, path):
+        pass
+
+    def load(self, path):
+        return True
+
+
+class IVFIndex(AnnIndex):
+    """
+    An inverted file index: films are clustered with spherical k-means, and a query only scores the films
+    of its nprobe closest clusters. The vectors are stored grouped by cluster, so each probed cluster is one
+    contiguous slice of the matrix.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, embeddings, n_lists=None, nprobe=ANN_NPROBE, iterations=10):
+        """
+        Initialize the IVF index.
+
+        Args:
+            embeddings (PlotEmbeddingMatrix): The loaded, L2-normalised embedding matrix.
+            n_lists (int, optional): The number of clusters. Defaults to 4 * sqrt(number of films).
+            nprobe (int, optional): The minimum number of clusters scored per query. Defaults to ANN_NPROBE.
+            iterations (int, optional): The number of k-means iterations. Defaults to 10.
+        """
+        super().__init__(embeddings)
+        size = len(embeddings.uris)
+        self.n_lists = n_lists or max(1, min(size, int(4 * np.sqrt(size))))
+        self.nprobe = max(1, min(nprobe, self.n_lists))
+        self.iterations = iterations
+        self.centroids = None
+        self.offsets = None
+        self.ids = None
+        self.vectors = None
+
+    def _assign(self, vectors, centroids, chunk_size=8192):
+        assignment = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = vectors[start:start + chunk_size]
+            assignment[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+        return assignment
+
+    def build(self, seed=0):
+        matrix = self.embeddings.matrix
+        rng = np.random.default_rng(seed)
+
+        # Train the centroids on a sample, then assign every film to its closest centroid
+        sample_size = min(len(matrix), self.n_lists * 64)
+        sample = matrix[rng.choice(len(matrix), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, self.n_lists, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignment = self._assign(sample, centroids)
+            order = np.argsort(assignment, kind="stable")
+            counts = np.bincount(assignment, minlength=self.n_lists)
+            filled = np.flatnonzero(counts)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+            centroids[filled] = np.add.reduceat(sample[order], starts, axis=0)
+            # Re-seed empty clusters with random films
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                centroids[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+            centroids = _normalise_rows(centroids).astype(np.float32)
+
+        self._set_lists(centroids, self._assign(matrix, centroids))
+
+    def _set_lists(self, centroids, assignment):
+        self.centroids = centroids
+        self.ids = np.argsort(assignment, kind="stable").astype(np.int32)
+        counts = np.bincount(assignment, minlength=self.n_lists)
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.vectors = np.ascontiguousarray(self.embeddings.matrix[self.ids])
+
+    def search_rows(self, query_vector, k, nprobe=None):
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        probes = _top_k(self.centroids @ query_vector, nprobe)
+        segments = [(self.offsets[probe], self.offsets[probe + 1]) for probe in probes]
+        segments = [(start, end) for start, end in segments if end > start]
+        if not segments:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        scores = np.concatenate([self.vectors[start:end] @ query_vector for start, end in segments])
+        positions = np.concatenate([np.arange(start, end) for start, end in segments])
+        best = _top_k(scores, k)
+        return self.ids[positions[best]], scores[best]
+
+    def calibrate(self, target_recall=ANN_TARGET_RECALL, k=ANN_RECALL_K, sample_size=200, seed=0):
+        queries = self.calibration_queries(sample_size, seed)
+        while True:
+            self.recall = self.measure_recall(queries, k)
+            if self.recall >= target_recall or self.nprobe >= self.n_lists:
+                break
+            self.nprobe = min(self.nprobe * 2, self.n_lists)
+        logging.info(f"IVF index calibrated: nprobe={self.nprobe}/{self.n_lists}, recall@{k}={self.recall:.3f}")
+
+    def save(self, path):
+        np.savez(path, fingerprint=fingerprint(self.embeddings), centroids=self.centroids,
+                 assignment=self._assignment())
+
+    def _assignment(self):
+        assignment = np.empty(len(self.ids), dtype=np.int32)
+        for cluster in range(self.n_lists):
+            assignment[self.ids[self.offsets[cluster]:self.offsets[cluster + 1]]] = cluster
+        return assignment
+
+    def load(self, path):
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as stored:
+            if str(stored["fingerprint"]) != fingerprint(self.embeddings):
+                logging.info(f"Persisted IVF index {path} is for a different catalogue, rebuilding")
+                return False
+            centroids = stored["centroids"]
+            assignment = stored["assignment"]
+        self.n_lists = len(centroids)
+        self.nprobe = min(self.nprobe, self.n_lists)
+        self._set_lists(centroids, assignment)
+        return True
+
+    def describe(self):
+        description = super().describe()
+        description.update({"n_lists": self.n_lists, "nprobe": self.nprobe})
+        return description
+
+
+class HNSWIndex(AnnIndex):
+    """
+    A hierarchical navigable small world graph index, backed by the optional hnswlib package.
+    """
+
+    kind = "hnsw"
+
+    def __init__(self, embeddings, ef=ANN_EF, m=16, ef_construction=200):
+        """
+        Initialize the HNSW index.
+
+        Args:
+            embeddings (PlotEmbeddingMatrix): The loaded, L2-normalised embedding matrix.
+            ef (int, optional): The minimum size of the dynamic candidate list at query time. Defaults to ANN_EF.
+            m (int, optional): The number of graph links per node. Defaults to 16.
+            ef_construction (int, optional): The candidate list size while building. Defaults to 200.
+        """
+        if hnswlib is None:
+            raise ImportError("hnswlib is not installed")
+        super().__init__(embeddings)
+        self.ef = ef
+        self.m = m
+        self.ef_construction = ef_construction
+        self.index = None
+
+    def _new_index(self):
+        return hnswlib.Index(space="ip", dim=self.embeddings.matrix.shape[1])
+
+    def build(self):
+        matrix = self.embeddings.matrix
+        self.index = self._new_index()
+        self.index.init_index(max_elements=len(matrix), ef_construction=self.ef_construction, M=self.m)
+        self.index.add_items(matrix, np.arange(len(matrix)))
+        self.index.set_ef(self.ef)
+
+    def search_rows(self, query_vector, k):
+        k = min(k, len(self.embeddings.uris))
+        if self.ef < k:
+            self.index.set_ef(k)
+        labels, distances = self.index.knn_query(query_vector, k=k)
+        if self.ef < k:
+            self.index.set_ef(self.ef)
+        # hnswlib reports inner-product distance as 1 - similarity
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+
+    def calibrate(self, target_recall=ANN_TARGET_RECALL, k=ANN_RECALL_K, sample_size=200, seed=0):
+        queries = self.calibration_queries(sample_size, seed)
+        size = len(self.embeddings.uris)
+        while True:
+            self.index.set_ef(self.ef)
+            self.recall = self.measure_recall(queries, k)
+            if self.recall >= target_recall or self.ef >= size:
+                break
+            self.ef = min(self.ef * 2, size)
+        logging.info(f"HNSW index calibrated: ef={self.ef}, recall@{k}={self.recall:.3f}")
+
+    def save(self, path):
+        self.index.save_index(path)
+        with open(f"{path}.fingerprint", "w") as f:
+            f.write(fingerprint(self.embeddings))
+
+    def load(self, path):
+        if not (os.path.exists(path) and os.path.exists(f"{path}.fingerprint")):
+            return False
+        with open(f"{path}.fingerprint", "r") as f:
+            if f.read().strip() != fingerprint(self.embeddings):
+                logging.info(f"Persisted HNSW index {path} is for a different catalogue, rebuilding")
+                return False
+        self.index = self._new_index()
+        self.index.load_index(path, max_elements=len(self.embeddings.uris))
+        self.index.set_ef(self.ef)
+        return True
+
+    def describe(self):
+        description = super().describe()
+        description.update({"ef": self.ef, "m": self.m})
+        return description
+
+
+ANN_INDEXES = {
+    "exact": (ExactIndex, None),
+    "ivf": (IVFIndex, "plot_embeddings.ivf.npz"),
+    "hnsw": (HNSWIndex, "plot_embeddings.hnsw.bin"),
+}
+
+
+def load_ann_index(embeddings, kind=ANN_INDEX_KIND, index_dir=ANN_INDEX_DIR):
+    """
+    Load the persisted ANN index for the embedding matrix, or build and persist it if it is missing or stale,
+    then calibrate it to the target recall.
+
+    Args:
+        embeddings (PlotEmbeddingMatrix): The loaded, L2-normalised embedding matrix.
+        kind (str, optional): "ivf", "hnsw" or "exact". Defaults to the ANN_INDEX environment variable.
+        index_dir (str, optional): The directory of the persisted indexes. Defaults to ANN_INDEX_DIR.
+
+    Returns:
+        AnnIndex: The ready-to-query index.
+    """
+    if kind == "hnsw" and hnswlib is None:
+        logging.warning("hnswlib is not installed, falling back to the IVF index")
+        kind = "ivf"
+    if kind not in ANN_INDEXES:
+        raise ValueError(f"Unknown ANN index kind '{kind}', expected one of {list(ANN_INDEXES)}")
+
+    index_class, file_name = ANN_INDEXES[kind]
+    index = index_class(embeddings)
+    start = time.time()
+    path = os.path.join(index_dir, file_name) if file_name else None
+
+    if path is None or not index.load(path):
+        logging.info(f"Building {kind} index over {len(embeddings.uris)} plot embeddings")
+        index.build()
+        if path is not None:
+            try:
+                os.makedirs(index_dir, exist_ok=True)
+                index.save(path)
+                logging.info(f"Persisted {kind} index to {path}")
+            except OSError as e:
+                logging.warning(f"Failed to persist {kind} index to {path}: {e}")
+
+    index.calibrate()
+    logging.info(f"{kind} index ready in {time.time() - start:.2f} seconds: {index.describe()}")
+    return index
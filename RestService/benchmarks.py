@@ -0,0 +1,203 @@
+"""
+file: benchmarks.py
+date: 17-10-2026
+description: This module benchmarks the query strategies of the REST service against a running GraphDB repository.
+Run it from the RestService directory, e.g. `python benchmarks.py details --movies 100`,
+`python benchmarks.py serialization --movies 500` or `python benchmarks.py fts --terms star love`.
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from db_crud import MovieDatabase, DETAIL_LARGE_PROPERTIES
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+async def time_call(function, *args, repeats=5, **kwargs):
+    """
+    Time an async function over a number of repeats, after one warm-up call.
+
+    Args:
+        function (callable): The async function to time.
+        repeats (int, optional): The number of timed calls. Defaults to 5.
+
+    Returns:
+        tuple: The median and maximum latency in milliseconds, and the result of the last call.
+    """
+    result = await function(*args, **kwargs)
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = await function(*args, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies), max(latencies), result
+
+
+def time_sync(function, *args, repeats=5):
+    """
+    Time a function over a number of repeats, after one warm-up call.
+
+    Args:
+        function (callable): The function to time.
+        repeats (int, optional): The number of timed calls. Defaults to 5.
+
+    Returns:
+        tuple: The median and maximum latency in milliseconds, and the result of the last call.
+    """
+    result = function(*args)
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies), max(latencies), result
+
+
+def encode_default(content):
+    """
+    Encode a response body like FastAPI does for a plain return value with its default JSONResponse.
+    """
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def encode_orjson(content):
+    """
+    Encode a response body like the endpoints that return an ORJSONResponse themselves.
+    """
+    return ORJSONResponse(content).body
+
+
+async def fetch_movies_by_cast_size(db, sample_size):
+    """
+    Fetch a sample of films with their number of actors, smallest cast first.
+
+    Args:
+        db (MovieDatabase): The database to query.
+        sample_size (int): The number of films to fetch.
+
+    Returns:
+        list: A list of (movie URI, cast size) tuples.
+    """
+    query = f"""
+    PREFIX dbo: <http://dbpedia.org/ontology/>
+
+    SELECT ?movie (COUNT(DISTINCT ?actor) AS ?cast)
+    WHERE {{
+    ?movie a dbo:Film ;
+           dbo:starring ?actor .
+    }}
+    GROUP BY ?movie
+    ORDER BY DESC(?cast)
+    LIMIT {sample_size}
+    """
+    results = await db.execute_query(query)
+    movies = [(result["movie"]["value"], int(result["cast"]["value"])) for result in results["results"]["bindings"]]
+    return sorted(movies, key=lambda movie: movie[1])
+
+
+async def benchmark_details(args):
+    """
+    Compare the latency of the detail-fetch strategies for batches of films with growing cast sizes.
+    """
+    db = MovieDatabase()
+    try:
+        movies = await fetch_movies_by_cast_size(db, args.movies * args.buckets * 4)
+        step = max(1, len(movies) // args.buckets)
+        print(f"{'mean cast':>10} {'strategy':>10} {'median ms':>10} {'max ms':>10} {'movies':>8}")
+        for bucket in range(args.buckets):
+            # Take the batch from the upper end of each slice, so the last bucket holds the largest casts
+            end = min(len(movies), (bucket + 1) * step)
+            batch = movies[max(bucket * step, end - args.movies):end]
+            if not batch:
+                continue
+            mean_cast = statistics.mean(cast for _, cast in batch)
+            request = [{"object_uri": movie_uri} for movie_uri, _ in batch]
+            for strategy in args.strategies:
+                median, worst, details = await time_call(db.fetch_movies_details, request, strategy=strategy,
+                                                         repeats=args.repeats)
+                print(f"{mean_cast:>10.1f} {strategy:>10} {median:>10.1f} {worst:>10.1f} {len(details):>8}")
+    finally:
+        await db.close()
+
+
+async def benchmark_serialization(args):
+    """
+    Compare the cost of encoding /movies_details responses with the default JSON path and with orjson,
+    with and without the large details.
+    """
+    db = MovieDatabase()
+    try:
+        movies = await fetch_movies_by_cast_size(db, args.movies)
+        details = await db.fetch_movies_details([{"object_uri": movie_uri} for movie_uri, _ in movies], exclude=())
+    finally:
+        await db.close()
+    trimmed = [{field: value for field, value in movie.items() if field not in DETAIL_LARGE_PROPERTIES}
+               for movie in details]
+
+    print(f"{'payload':>8} {'encoder':>8} {'median ms':>10} {'max ms':>10} {'KB':>10}")
+    for payload_name, payload in (("full", details), ("trimmed", trimmed)):
+        for encoder_name, encode in (("default", encode_default), ("orjson", encode_orjson)):
+            median, worst, body = time_sync(encode, payload, repeats=args.repeats)
+            print(f"{payload_name:>8} {encoder_name:>8} {median:>10.2f} {worst:>10.2f} {len(body) / 1024:>10.1f}")
+
+
+async def benchmark_fts(args):
+    """
+    Compare the latency of name lookups and filtered movie searches matched with CONTAINS scans and with the
+    GraphDB full-text index.
+    """
+    db = MovieDatabase()
+    try:
+        if not await db.detect_full_text_search():
+            print("The repository has no full-text index; create it with GRAPHDB_FULL_TEXT_SEARCH=true run_script.py "
+                  "to compare both modes. Timing CONTAINS only.")
+        modes = [("contains", False)] + ([("fts", True)] if db.full_text_search else [])
+        searches = []
+        for term in args.terms:
+            searches.append((f"Film ~ {term}", db.fetch_objects_by_title, ("Film", term), {}))
+            searches.append((f"Actor ~ {term}", db.fetch_objects_by_title, ("Actor", term), {}))
+            searches.append((f"genre ~ {term}", db.fetch_movies_by_properties, (), {"genre": [term],
+                                                                                      "number_of_results": 1000}))
+
+        print(f"{'search':>24} {'mode':>10} {'median ms':>10} {'max ms':>10} {'results':>8}")
+        for name, function, function_args, kwargs in searches:
+            for mode, full_text_search in modes:
+                db.full_text_search = full_text_search
+                median, worst, results = await time_call(function, *function_args, repeats=args.repeats, **kwargs)
+                print(f"{name:>24} {mode:>10} {median:>10.1f} {worst:>10.1f} {len(results):>8}")
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the query strategies of the REST service")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    details = subparsers.add_parser("details", help="Compare the detail-fetch strategies of fetch_movies_details")
+    details.add_argument("--movies", type=int, default=100, help="Films per batch")
+    details.add_argument("--buckets", type=int, default=4, help="Batches of growing cast size")
+    details.add_argument("--repeats", type=int, default=5, help="Timed calls per batch and strategy")
+    details.add_argument("--strategies", nargs="+", default=["grouped", "split"], choices=["grouped", "split"])
+    details.set_defaults(run=benchmark_details)
+
+    serialization = subparsers.add_parser("serialization", help="Compare the JSON encoders of /movies_details responses")
+    serialization.add_argument("--movies", type=int, default=500, help="Films in the encoded response")
+    serialization.add_argument("--repeats", type=int, default=20, help="Timed encodings per payload and encoder")
+    serialization.set_defaults(run=benchmark_serialization)
+
+    fts = subparsers.add_parser("fts", help="Compare name filters with CONTAINS and with the full-text index")
+    fts.add_argument("--terms", nargs="+", default=["star", "love", "drama"], help="Names to search for")
+    fts.add_argument("--repeats", type=int, default=5, help="Timed calls per search and mode")
+    fts.set_defaults(run=benchmark_fts)
+
+    args = parser.parse_args()
+    asyncio.run(args.run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+file: cache_warmup.py
+date: 17-10-2026
+description: This module warms the response caches after a data load or on service start. It replays a configurable
+list of hot requests (the unfiltered lookups the UI loads at startup and the similar-movie searches of a sample of
+popular films) through the application itself with bounded concurrency, so the cached responses are exactly the ones
+real requests will look up.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import httpx
+
+WARMUP_QUERIES_FILE = os.environ.get("WARMUP_QUERIES_FILE",
+                                     os.path.join(os.path.dirname(os.path.abspath(__file__)), "warmup_queries.json"))
+WARMUP_CONCURRENCY = int(os.environ.get("WARMUP_CONCURRENCY", "4"))
+WARMUP_ON_START = os.environ.get("WARMUP_ON_START", "true").lower() == "true"
+# Only one worker warms the shared Redis cache on start; the lock expires in case that worker dies
+WARMUP_LOCK_SECONDS = int(os.environ.get("WARMUP_LOCK_SECONDS", "600"))
+
+
+def load_warmup_queries(queries_file=WARMUP_QUERIES_FILE):
+    """
+    Load the warm-up configuration.
+
+    Args:
+        queries_file (str, optional): Path of the JSON configuration. Defaults to WARMUP_QUERIES_FILE.
+
+    Returns:
+        dict: The "queries" to replay, each with a "path", optional "params" and optional "follow_cursor", and the
+            "similar_movies" sample size, number of results and detail fields.
+    """
+    with open(queries_file, 'r', encoding='utf-8') as config_file:
+        return json.load(config_file)
+
+
+async def fetch_popular_movies(database, sample):
+    """
+    Fetch the films with the highest box office, as a sample of popular similar-movie searches.
+
+    Args:
+        database (MovieDatabase): The database to query.
+        sample (int): The number of films.
+
+    Returns:
+        list: A list of (movie URI, label) tuples, with labels capitalized like the /movies lookup.
+    """
+    query = f"""
+    PREFIX dbo: <http://dbpedia.org/ontology/>
+    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+    PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
+
+    SELECT ?movie (SAMPLE(?label) AS ?title) (MAX(?gross) AS ?maxGross)
+    WHERE {{
+    ?movie a dbo:Film ;
+           rdfs:label ?label ;
+           dbo:boxOffice ?boxOffice .
+    FILTER (LANG(?label) = "en")
+    BIND (xsd:double(?boxOffice) AS ?gross)
+    FILTER (BOUND(?gross))
+    }}
+    GROUP BY ?movie
+    ORDER BY DESC(?maxGross)
+    LIMIT {sample}
+    """
+    results = await database.execute_query(query)
+    return [(result["movie"]["value"], result["title"]["value"].capitalize())
+            for result in results["results"]["bindings"]]
+
+
+class CacheWarmup:
+    """
+    Replays hot requests through the application to fill the response caches.
+    """
+
+    def __init__(self, app, database, concurrency=WARMUP_CONCURRENCY, queries_file=WARMUP_QUERIES_FILE):
+        """
+        Initialize the warm-up.
+
+        Args:
+            app (FastAPI): The application to replay the requests through.
+            database (MovieDatabase): The database to sample popular films from.
+            concurrency (int, optional): The maximum number of requests replayed at once. Defaults to WARMUP_CONCURRENCY.
+            queries_file (str, optional): Path of the JSON configuration. Defaults to WARMUP_QUERIES_FILE.
+        """
+        self.app = app
+        self.database = database
+        self.concurrency = concurrency
+        self.queries_file = queries_file
+        self.last_report = None
+        self._lock = asyncio.Lock()
+
+    async def build_requests(self):
+        """
+        Build the list of requests to replay from the configuration.
+
+        Returns:
+            list: The requests, each a dictionary with a path, params and follow_cursor.
+        """
+        config = load_warmup_queries(self.queries_file)
+        requests = [{"path": query["path"], "params": query.get("params", {}),
+                     "follow_cursor": query.get("follow_cursor", False)} for query in config.get("queries", [])]
+
+        similar_movies = config.get("similar_movies", {})
+        if similar_movies.get("sample"):
+            try:
+                movies = await fetch_popular_movies(self.database, similar_movies["sample"])
+            except Exception as e:
+                logging.error(f"Sampling popular films for the cache warm-up failed: {e}")
+                movies = []
+            # The same parameters as the search of the UI, so the warmed entries are the ones it looks up
+            for movie_uri, title in movies:
+                params = {"movieLabel": [title], "movieUri": [movie_uri],
+                          "number_of_results": similar_movies.get("number_of_results", 10), "getSimilarMovies": True}
+                if similar_movies.get("fields"):
+                    params["fields"] = similar_movies["fields"]
+                requests.append({"path": "/movies_details", "follow_cursor": False, "params": params})
+        return requests
+
+    async def _replay(self, client, request, semaphore):
+        """
+        Replay one request, following the pagination cursor if requested.
+
+        Returns:
+            int: The number of responses fetched.
+        """
+        params = dict(request["params"])
+        pages = 0
+        while True:
+            async with semaphore:
+                response = await client.get(request["path"], params=params)
+            response.raise_for_status()
+            pages += 1
+            cursor = response.headers.get("X-Next-Cursor")
+            if not request["follow_cursor"] or not cursor:
+                return pages
+            params["cursor"] = cursor
+
+    async def run(self):
+        """
+        Replay all warm-up requests. Concurrent runs wait for each other instead of replaying twice at once.
+
+        Returns:
+            dict: The number of requests, responses and failures, and the time to warm in seconds.
+        """
+        async with self._lock:
+            start = time.perf_counter()
+            requests = await self.build_requests()
+            semaphore = asyncio.Semaphore(self.concurrency)
+            transport = httpx.ASGITransport(app=self.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://warmup", timeout=None) as client:
+                outcomes = await asyncio.gather(*(self._replay(client, request, semaphore) for request in requests),
+                                                return_exceptions=True)
+
+            failures = []
+            for request, outcome in zip(requests, outcomes):
+                if isinstance(outcome, Exception):
+                    logging.error(f"Warming {request['path']} {request['params']} failed: {outcome}")
+                    failures.append({"path": request["path"], "params": request["params"], "error": str(outcome)})
+            self.last_report = {
+                "requests": len(requests),
+                "responses": sum(outcome for outcome in outcomes if not isinstance(outcome, Exception)),
+                "failed": failures,
+                "seconds": round(time.perf_counter() - start, 3),
+                "finished_at": time.time(),
+            }
+            logging.info(f"Cache warmed with {self.last_report['responses']} responses of {len(requests)} requests "
+                         f"in {self.last_report['seconds']} seconds, {len(failures)} failed")
+            return self.last_report
+
+    async def run_on_start(self, redis_client, prefix, wait_for=None):
+        """
+        Warm the caches once per deployment: the first worker to take the Redis lock replays the requests.
+
+        Args:
+            redis_client (redis.asyncio.Redis): The Redis client.
+            prefix (str): The prefix of the cache keys, used for the lock key.
+            wait_for (asyncio.Task, optional): A task to wait for first, e.g. loading the label indexes. Defaults to None.
+
+        Returns:
+            dict: The warm-up report, or None if another worker is warming the caches.
+        """
+        if wait_for is not None:
+            await asyncio.wait([wait_for])
+        try:
+            acquired = await redis_client.set(f"{prefix}:warmup:lock", os.getpid(), nx=True, ex=WARMUP_LOCK_SECONDS)
+        except Exception as e:
+            logging.error(f"Taking the cache warm-up lock failed: {e}")
+            return None
+        if not acquired:
+            logging.info("Another worker is warming the caches")
+            return None
+        return await self.run()
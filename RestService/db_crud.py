@@ -5,17 +5,23 @@ description: This module provides a class for interacting with a SPARQL endpoint
 such as movies, actors, directors, etc., from a GraphDB repository.
 """
 
-from SPARQLWrapper import SPARQLWrapper, JSON
 import logging
 import asyncio
 import numpy as np
 import os
+import time
 from urllib.parse import unquote
 import pandas as pd
-from sentence_transformers import SentenceTransformer
-import torch
 import json
-from sklearn.metrics.pairwise import cosine_similarity
+from embeddings import PlotEmbeddingMatrix
+from ann_index import load_ann_index
+from encoder import encoder
+from sparql_client import AsyncSparqlClient, SparqlConnectionError
+from health import CircuitBreaker, CircuitOpenError
+from label_index import LabelIndex, LABEL_INDEX_MAX_RESULTS, rank_matches
+from similarity import HybridScorer, SimilarityTable, SIMILARITY_FEATURES, SIMILARITY_WEIGHTS, SIMILARITY_TABLE_FILE
+from sparql_templates import query_templates, literal, typed_literal, integer, number, iri, iri_encode, values_block, \
+    fts_query
 
 
 
@@ -28,24 +34,138 @@ def is_running_in_docker():
     return False
 
 
-def add_filters(filters, param_name, param_values, sparql_property, use_or=False):
-    if param_values:
-        if not isinstance(param_values, list):
-            param_values = [param_values]
-        
-        if use_or:
-            conditions = [f'CONTAINS(LCASE(STR(?{param_name})), "{value.lower()}")' for value in param_values]
-            filter_condition = " || ".join(conditions)
-            filters.append(f'FILTER ({filter_condition})')
-        else:
-            for value in param_values:
-                filters.append(f'?movie {sparql_property} ?{param_name} . ?{param_name} rdfs:label ?{param_name}Label . FILTER (CONTAINS(LCASE(STR(?{param_name}Label)), "{value.lower()}")) .')
-    return filters
+def filter_patterns(param_name, count, sparql_property, fts=False):
+    """
+    Build the template text of the label filters on a property, with its own variables and placeholder per value
+    (e.g. ?genre_0 bound to $genre_0), so several values of one property are all required.
+
+    Args:
+        param_name (str): The name of the filter.
+        count (int): The number of values.
+        sparql_property (str): The property linking the movie to the filtered objects.
+        fts (bool, optional): Whether to find the labels in the full-text index first (bound to $genre_0_fts),
+            leaving CONTAINS to verify the matches. Defaults to False.
+
+    Returns:
+        list: The graph patterns.
+    """
+    patterns = []
+    for i in range(count):
+        label = f"?{param_name}_{i}_label"
+        fts_pattern = f"{label} onto:fts ${param_name}_{i}_fts . " if fts else ""
+        patterns.append(f'{fts_pattern}?movie {sparql_property} ?{param_name}_{i} . ?{param_name}_{i} rdfs:label {label} . '
+                        f'FILTER (CONTAINS(LCASE(STR({label})), ${param_name}_{i})) .')
+    return patterns
+
+
+def bind_filters(bindings, param_name, param_values, fts=False):
+    """
+    Bind the values of the label filters of filter_patterns as lower-case literals.
+
+    Args:
+        bindings (dict): The bindings to add to.
+        param_name (str): The name of the filter.
+        param_values (list): The values.
+        fts (bool, optional): Whether to also bind the full-text queries. Defaults to False.
+
+    Returns:
+        dict: The bindings.
+    """
+    for i, value in enumerate(param_values):
+        bindings[f"{param_name}_{i}"] = literal(value.lower())
+        if fts:
+            bindings[f"{param_name}_{i}_fts"] = literal(fts_query([value]))
+    return bindings
+
+
+def as_list(param_values):
+    """Normalize an optional filter value to a list of values."""
+    if not param_values:
+        return []
+    return param_values if isinstance(param_values, list) else [param_values]
 
 GRAPHDB_ENDPOINT = "http://localhost:7200/repositories/MoviesRepo"
 if is_running_in_docker():
     GRAPHDB_ENDPOINT = "http://graphdb:7200/repositories/MoviesRepo"
 
+# Object types served by the lookup endpoints, whose labels are kept in memory for autocompletion
+LABEL_INDEX_TYPES = ["Film", "Genre", "Actor", "Director", "Distributor", "Writer", "Producer", "Composer",
+                     "Cinematographer", "productionCompany", "Country"]
+
+# How fetch_movies_details queries the details: "split" (one UNION branch per property) or "grouped" (one GROUP BY)
+DETAILS_STRATEGY = os.environ.get("DETAILS_STRATEGY", "split")
+# Movies per VALUES block of a details query, and the number of those queries run at once
+DETAILS_CHUNK_SIZE = int(os.environ.get("DETAILS_CHUNK_SIZE", "200"))
+DETAILS_CONCURRENCY = int(os.environ.get("DETAILS_CONCURRENCY", "4"))
+
+# Single-valued movie details and their predicates; the country is looked up by its English label
+DETAIL_SCALAR_PROPERTIES = {
+    "abstract": "dbo:abstract",
+    "plotEmbedding": "dbo:plotEmbedding",
+    "runtime": "dbo:runtime",
+    "budget": "dbo:budget",
+    "boxOffice": "dbo:boxOffice",
+    "releaseYear": "dbo:releaseYear",
+    "country": "dbo:country",
+}
+# Multi-valued movie details, returned as comma-separated English labels
+DETAIL_LIST_PROPERTIES = {
+    "genres": "dbo:genre",
+    "starring": "dbo:starring",
+    "directors": "dbo:director",
+    "producers": "dbo:producer",
+    "writers": "dbo:writer",
+    "composers": "dbo:musicComposer",
+    "cinematographers": "dbo:cinematography",
+}
+# Result variables of the grouped details query that differ from the detail name
+DETAIL_GROUPED_VARIABLES = {"country": "country_label"}
+# Details left out of fetch_movies_details unless asked for, as they dominate the size of the response
+DETAIL_LARGE_PROPERTIES = ("plotEmbedding",)
+
+# Label filters of the movie search: parameter name -> property linking the movie to the filtered objects
+MOVIE_FILTER_PROPERTIES = {
+    "genre": "dbo:genre",
+    "actor": "dbo:starring",
+    "director": "dbo:director",
+    "distributor": "dbo:distributor",
+    "writer": "dbo:writer",
+    "producer": "dbo:producer",
+    "composer": "dbo:musicComposer",
+    "cinematographer": "dbo:cinematography",
+    "production_company": "dbo:productionCompany",
+}
+
+
+def select_detail_fields(fields=None, exclude=DETAIL_LARGE_PROPERTIES):
+    """
+    Select the movie details to fetch. The movie URI and title are always returned.
+
+    Args:
+        fields (list, optional): The details to fetch. Defaults to None (all details not in exclude).
+        exclude (tuple, optional): The details to leave out when no fields are given. Defaults to DETAIL_LARGE_PROPERTIES.
+
+    Returns:
+        tuple: The selected details, in the order of DETAIL_SCALAR_PROPERTIES and DETAIL_LIST_PROPERTIES.
+
+    Raises:
+        ValueError: If a field is not a known detail.
+    """
+    known = list(DETAIL_SCALAR_PROPERTIES) + list(DETAIL_LIST_PROPERTIES)
+    if fields is None:
+        return tuple(field for field in known if field not in exclude)
+    unknown = set(fields) - set(known) - {"movie", "title"}
+    if unknown:
+        raise ValueError(f"Unknown movie details: {', '.join(sorted(unknown))}")
+    return tuple(field for field in known if field in fields)
+
+# Match names with the GraphDB full-text index (onto:fts) before verifying them with CONTAINS: "auto" uses it
+# when the repository has the index enabled, "true" always and "false" never
+FULL_TEXT_SEARCH = os.environ.get("FULL_TEXT_SEARCH", "auto").lower()
+
+# Plot embeddings written by the RDF pipeline; when the file is missing they are loaded from GraphDB instead
+PLOT_EMBEDDINGS_FILE = os.environ.get("PLOT_EMBEDDINGS_FILE", "../DB/Datasets/Embeddings/plot_embeddings.npy")
+
 class MovieDatabase:
     """
     A class to interact with a SPARQL endpoint to fetch various types of objects.
@@ -55,16 +175,127 @@ class MovieDatabase:
         """
         Initialize the MovieDatabase with the SPARQL endpoint.
         """
-        self.sparql = SPARQLWrapper(GRAPHDB_ENDPOINT)
+        self.sparql = AsyncSparqlClient(GRAPHDB_ENDPOINT)
+        self.breaker = CircuitBreaker()
         self.limit = 50000
+        self.plot_embeddings = PlotEmbeddingMatrix()
+        self._plot_embeddings_lock = asyncio.Lock()
+        self.ann_index = None
+        self.label_indexes = {}
+        self.similarity = HybridScorer(self.plot_embeddings)
+        self.similarity_table = SimilarityTable()
+        self.full_text_search = FULL_TEXT_SEARCH == "true"
+
+    async def close(self):
+        """
+        Close the connections to the SPARQL endpoint.
+        """
+        await self.sparql.close()
+
+    async def reconnect(self):
+        """
+        Drop the pooled connections to the SPARQL endpoint and open a fresh pool.
+        """
+        old_client, self.sparql = self.sparql, AsyncSparqlClient(GRAPHDB_ENDPOINT)
+        await old_client.close()
+
+    async def execute_query(self, query):
+        """
+        Execute a SPARQL query and record its outcome in the circuit breaker. After a connection failure
+        the connection pool is replaced and the query is retried once.
+
+        Args:
+            query (str): The SPARQL query.
+
+        Returns:
+            dict: The parsed SPARQL JSON results.
+        """
+        for attempt in range(2):
+            if not self.breaker.allow_request():
+                raise CircuitOpenError(f"The database at {GRAPHDB_ENDPOINT} is unavailable: {self.breaker.last_error}")
+
+            client = self.sparql
+            try:
+                results = await client.query(query)
+            except SparqlConnectionError as e:
+                self.breaker.record_failure(e)
+                if attempt > 0:
+                    raise
+                logging.info(f"Query failed with a connection error, attempting to reconnect: {e}")
+                # Concurrent failures share one replacement pool
+                if client is self.sparql:
+                    await self.reconnect()
+                continue
+
+            self.breaker.record_success()
+            return results
+
+    async def stream_query(self, query):
+        """
+        Execute a SPARQL SELECT query and yield its rows as they arrive, recording the outcome in the
+        circuit breaker.
+
+        Args:
+            query (str): The SPARQL query.
+
+        Returns:
+            AsyncIterator[dict]: The value of every bound variable per row.
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"The database at {GRAPHDB_ENDPOINT} is unavailable: {self.breaker.last_error}")
+        try:
+            async for row in self.sparql.stream_rows(query):
+                yield row
+        except SparqlConnectionError as e:
+            self.breaker.record_failure(e)
+            raise
+        self.breaker.record_success()
+
+    async def execute_template(self, template, **bindings):
+        """
+        Bind the parameters of a prepared query template, execute it and record its execution time.
+
+        Args:
+            template (QueryTemplate): The prepared template.
+            **bindings: The SPARQL terms of the placeholders.
+
+        Returns:
+            dict: The parsed SPARQL JSON results.
+        """
+        query = template.render(**bindings)
+        logging.info(f"Executing SPARQL query {template.name}")
+        logging.debug(query)
+        start = time.perf_counter()
+        try:
+            results = await self.execute_query(query)
+        except Exception:
+            template.record(time.perf_counter() - start, failed=True)
+            raise
+        template.record(time.perf_counter() - start)
+        return results
 
-    def close(self):
+    async def stream_template(self, template, **bindings):
         """
-        Close the connection to the SPARQL endpoint.
+        Bind the parameters of a prepared query template and stream its rows, recording the time until the last row.
+
+        Args:
+            template (QueryTemplate): The prepared template.
+            **bindings: The SPARQL terms of the placeholders.
+
+        Returns:
+            AsyncIterator[dict]: The value of every bound variable per row.
         """
-        self.sparql = None
+        query = template.render(**bindings)
+        start = time.perf_counter()
+        try:
+            async for row in self.stream_query(query):
+                yield row
+        except Exception:
+            template.record(time.perf_counter() - start, failed=True)
+            raise
+        template.record(time.perf_counter() - start)
 
-    def is_connected(self):
+    async def is_connected(self):
         """
         Check if the connection to the SPARQL endpoint is active.
 
@@ -72,42 +303,137 @@ class MovieDatabase:
             bool: True if connected, False otherwise.
         """
         try:
-            self.sparql.queryType = 'SELECT'
-            self.sparql.setQuery("ASK WHERE { ?s ?p ?o }")
-            self.sparql.setReturnFormat(JSON)
-            result = self.sparql.query().convert()
-            return result.get('boolean', False)
+            return await self.sparql.ask()
         except Exception as e:
             logging.error(f"Database connection check failed: {e}")
             return False
 
-    async def fetch_objects_by_title(self, object_type: str, title: str = None):
+    async def detect_full_text_search(self):
+        """
+        Detect whether the repository has the full-text index enabled, by searching the label of one film in it.
+        With FULL_TEXT_SEARCH set to "true" or "false" the setting is used as is.
+
+        Returns:
+            bool: Whether name filters use the full-text index.
+        """
+        if FULL_TEXT_SEARCH != "auto":
+            self.full_text_search = FULL_TEXT_SEARCH == "true"
+            return self.full_text_search
+
+        available = False
+        try:
+            results = await self.execute_query("""
+            PREFIX dbo: <http://dbpedia.org/ontology/>
+            PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+
+            SELECT ?label WHERE { ?movie a dbo:Film ; rdfs:label ?label . FILTER (LANG(?label) = "en") }
+            LIMIT 1
+            """)
+            bindings = results["results"]["bindings"]
+            query = fts_query([bindings[0]["label"]["value"]]) if bindings else None
+            if query:
+                # Without the index GraphDB treats onto:fts as a plain predicate, which matches nothing
+                results = await self.execute_query(f"""
+                PREFIX onto: <http://www.ontotext.com/>
+
+                ASK {{ ?label onto:fts {literal(query)} . }}
+                """)
+                available = bool(results.get("boolean"))
+        except Exception as e:
+            logging.error(f"Detecting the full-text index failed: {e}")
+        self.full_text_search = available
+        logging.info(f"Name filters {'use the full-text index' if available else 'scan the labels with CONTAINS'}")
+        return available
+
+    def use_full_text_search(self, *value_lists):
         """
-        Fetch objects by title from the SPARQL endpoint.
+        Check whether the name filters of a query can use the full-text index: it must be available and every
+        value must contain a word to search for.
 
         Args:
-            object_type (str): The type of object to fetch (e.g., "Film", "Actor").
-            title (str, optional): The title to search for. Defaults to None.
+            *value_lists (list): The filter values of the query.
 
         Returns:
-            list: A list of dictionaries containing object URIs and labels.
+            bool: Whether to find the names in the full-text index.
         """
-        return_data = []
+        return self.full_text_search and all(fts_query([value]) for values in value_lists for value in values)
 
-        # Check if connected to the database
-        if not self.is_connected():
-            logging.info("Not connected to the database. Attempting to reconnect.")
-            self.sparql = SPARQLWrapper(GRAPHDB_ENDPOINT)
-            if not self.is_connected():
-                logging.error("Failed to reconnect to the database.")
-                raise Exception("Failed to reconnect to the database.")
+    async def load_plot_embeddings(self):
+        """
+        Load the plot embeddings of all films into the in-memory embedding matrix, memory-mapping the binary
+        PLOT_EMBEDDINGS_FILE when it exists and falling back to the dbo:plotEmbedding literals in the SPARQL endpoint.
+        This is done once at service startup, so similarity queries no longer ship embeddings over the wire.
+        The approximate nearest-neighbour index used by description searches is loaded (or built) alongside.
 
-        # Generate case-insensitive filters
-        name_filter = 'LANG(?label) = "en"'
-        if title:
-            name_filter += f'&& CONTAINS(LCASE(STR(?label)), "{title.lower()}")'
+        Returns:
+            int: The number of films loaded into the matrix.
+        """
+        if PLOT_EMBEDDINGS_FILE and os.path.exists(PLOT_EMBEDDINGS_FILE):
+            self.plot_embeddings.load_file(PLOT_EMBEDDINGS_FILE)
+            # Building and calibrating the index is CPU-bound, so it runs off the event loop
+            self.ann_index = await asyncio.get_running_loop().run_in_executor(None, load_ann_index,
+                                                                              self.plot_embeddings)
+            return len(self.plot_embeddings.uris)
+
+        query = """
+        PREFIX dbo: <http://dbpedia.org/ontology/>
+        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
 
-        # Construct the SPARQL query
+        SELECT ?movie ?title ?plotEmbedding
+        WHERE {
+        ?movie a dbo:Film .
+        ?movie dbo:plotEmbedding ?plotEmbedding .
+        OPTIONAL { ?movie rdfs:label ?title . FILTER (LANG(?title) = "en") }
+        }
+        """
+
+        try:
+            logging.info("Loading plot embeddings into memory - load_plot_embeddings")
+            results = await self.execute_query(query)
+            uris, labels, vectors = [], [], []
+            seen = set()
+            for result in results["results"]["bindings"]:
+                movie_uri = result["movie"]["value"]
+                if movie_uri in seen:
+                    continue
+                seen.add(movie_uri)
+                uris.append(movie_uri)
+                labels.append(result.get("title", {}).get("value", ""))
+                vectors.append(json.loads(result["plotEmbedding"]["value"]))
+            if uris:
+                self.plot_embeddings.build(uris, labels, vectors)
+                self.ann_index = await asyncio.get_running_loop().run_in_executor(None, load_ann_index,
+                                                                                  self.plot_embeddings)
+            else:
+                logging.warning("No plot embeddings found in SPARQL query response.")
+        except Exception as e:
+            logging.error(f"load_plot_embeddings - Failed: {e}")
+            raise
+
+        return len(self.plot_embeddings.uris)
+
+    async def _ensure_plot_embeddings(self):
+        """
+        Lazily load the embedding matrix if it was not loaded at startup. Concurrent requests share one load.
+        """
+        if self.plot_embeddings.is_loaded:
+            return
+        async with self._plot_embeddings_lock:
+            # Another request may have loaded the matrix while this one waited
+            if not self.plot_embeddings.is_loaded:
+                await self.load_plot_embeddings()
+
+    async def load_label_index(self, object_type: str):
+        """
+        Load the English labels of an object type from the SPARQL endpoint into an in-memory label index,
+        replacing the previous index of that type once the new one is built.
+
+        Args:
+            object_type (str): The type of object to index (e.g., "Film", "Actor").
+
+        Returns:
+            int: The number of distinct labels in the index.
+        """
         query = f"""
         PREFIX dbo: <http://dbpedia.org/ontology/>
         PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
@@ -116,19 +442,158 @@ class MovieDatabase:
         WHERE {{
         ?object a dbo:{object_type} .
         ?object rdfs:label ?label .
-        FILTER ({name_filter})
+        FILTER (LANG(?label) = "en")
         }}
-        ORDER BY ASC(?label)
-        LIMIT {self.limit}
         """
 
-        self.sparql.setQuery(query)
-        self.sparql.setReturnFormat(JSON)
+        logging.info(f"Loading the label index for {object_type} - load_label_index")
+        results = await self.execute_query(query)
+        index = LabelIndex(object_type)
+        # Building the index is CPU-bound, keep the event loop serving requests in the meantime
+        await asyncio.get_running_loop().run_in_executor(None, index.build, results["results"]["bindings"])
+        self.label_indexes[object_type] = index
+        return len(index.entries)
+
+    async def load_label_indexes(self, object_types: list = None):
+        """
+        Load the label indexes of the given object types, or of all types served by the lookup endpoints.
+
+        Args:
+            object_types (list, optional): The object types to index. Defaults to None (LABEL_INDEX_TYPES).
+
+        Returns:
+            dict: The number of labels indexed per object type, or the error for types that failed to load.
+        """
+        loaded = {}
+        for object_type in object_types or LABEL_INDEX_TYPES:
+            try:
+                loaded[object_type] = await self.load_label_index(object_type)
+            except Exception as e:
+                logging.error(f"load_label_indexes - Failed for {object_type}: {e}")
+                loaded[object_type] = f"failed: {e}"
+        return loaded
+
+    async def load_similarity_scorer(self):
+        """
+        Export the English titles and the similarity attributes of all films in one streamed query and build the
+        in-memory similarity scorer from them, replacing the previous scorer once the new one is built.
+
+        Returns:
+            int: The number of films in the scorer.
+        """
+        branches = ['{ ?movie rdfs:label ?value . FILTER (lang(?value) = "en") BIND("title" AS ?property) }']
+        for feature, predicate in SIMILARITY_FEATURES.items():
+            branches.append(f'{{ ?movie {predicate} ?value . BIND("{feature}" AS ?property) }}')
+        union = "\n            UNION ".join(branches)
+        query = f"""
+        PREFIX dbo: <http://dbpedia.org/ontology/>
+        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+
+        SELECT ?movie ?property ?value ?label
+        WHERE {{
+            ?movie a dbo:Film .
+            {union}
+            OPTIONAL {{ ?value rdfs:label ?label . FILTER (lang(?label) = "en") }}
+        }}
+        """
+
+        try:
+            logging.info("Loading the similarity attributes of all films - load_similarity_scorer")
+            rows = [(row["movie"], row["property"], row["value"], row.get("label"))
+                    async for row in self.stream_query(query)]
+            scorer = HybridScorer(self.plot_embeddings)
+            # Building the matrices is CPU-bound, keep the event loop serving requests in the meantime
+            await asyncio.get_running_loop().run_in_executor(None, scorer.build, rows)
+            self.similarity = scorer
+        except Exception as e:
+            logging.error(f"load_similarity_scorer - Failed: {e}")
+            raise
+        return len(self.similarity.uris)
+
+    async def load_similarity_table(self):
+        """
+        Load the precomputed similar-movies table written by precompute_similar.py, if it exists. A table computed
+        with other weights than SIMILARITY_WEIGHTS is not used.
+
+        Returns:
+            int: The number of films in the table.
+        """
+        if not SIMILARITY_TABLE_FILE or not os.path.exists(SIMILARITY_TABLE_FILE):
+            logging.info(f"No similar-movies table at {SIMILARITY_TABLE_FILE}, similar movies are scored live")
+            return 0
+        table = SimilarityTable()
+        await asyncio.get_running_loop().run_in_executor(None, table.load, SIMILARITY_TABLE_FILE)
+        if table.is_loaded and table.weights != {feature: float(weight) for feature, weight in SIMILARITY_WEIGHTS.items()}:
+            logging.warning(f"The similar-movies table was computed with the weights {table.weights}, "
+                            f"not {SIMILARITY_WEIGHTS}; similar movies are scored live")
+            table = SimilarityTable()
+        self.similarity_table = table
+        return len(table.uris)
+
+    def objects_by_title_query(self, object_type: str, title: str = None):
+        """
+        Prepare the SPARQL query for the English labels of an object type containing a title.
+
+        Args:
+            object_type (str): The type of object to fetch (e.g., "Film", "Actor").
+            title (str, optional): The title to search for. Defaults to None.
+
+        Returns:
+            tuple: The prepared template, ordered by label, and its bindings.
+        """
+        def build(shape):
+            object_type, has_title, fts = shape
+            # Case-insensitive filter on the bound title, on the labels found in the full-text index if available
+            name_filter = 'LANG(?label) = "en"'
+            fts_pattern = ""
+            if has_title:
+                name_filter += ' && CONTAINS(LCASE(STR(?label)), $title)'
+                if fts:
+                    fts_pattern = "?label onto:fts $title_fts ."
+            return f"""
+            SELECT DISTINCT ?object ?label
+            WHERE {{
+            {fts_pattern}
+            ?object a dbo:{object_type} .
+            ?object rdfs:label ?label .
+            FILTER ({name_filter})
+            }}
+            ORDER BY ASC(?label) ASC(?object)
+            LIMIT $limit
+            """
+
+        fts = bool(title) and self.use_full_text_search([title])
+        template = query_templates.prepare("objects_by_title", (object_type, bool(title), fts), build)
+        bindings = {"limit": integer(self.limit)}
+        if title:
+            bindings["title"] = literal(title.lower())
+        if fts:
+            bindings["title_fts"] = literal(fts_query([title]))
+        return template, bindings
+
+    async def fetch_objects_by_title(self, object_type: str, title: str = None):
+        """
+        Fetch objects by title from the in-memory label index of the object type, or from the SPARQL endpoint
+        while the index is not loaded. Both return the same matches in the same order, so pages cached in either
+        mode agree.
+
+        Args:
+            object_type (str): The type of object to fetch (e.g., "Film", "Actor").
+            title (str, optional): The title to search for. Defaults to None.
+
+        Returns:
+            list: A list of dictionaries containing object URIs and labels.
+        """
+        index = self.label_indexes.get(object_type)
+        if index is not None:
+            return index.search(title, LABEL_INDEX_MAX_RESULTS if title else self.limit)
+
+        return_data = []
+        template, bindings = self.objects_by_title_query(object_type, title)
 
         # Execute the query and process results
         try:
-            logging.info(f"Executing SPARQL query: {query}")
-            results = self.sparql.query().convert()
+            results = await self.execute_template(template, **bindings)
             if "results" in results and "bindings" in results["results"]:
                 unique_data = {}
                 for result in results["results"]["bindings"]:
@@ -140,6 +605,8 @@ class MovieDatabase:
                             "label": label_cap
                         }
                 return_data = list(unique_data.values())
+                if title:
+                    return_data = rank_matches(return_data, title)
             else:
                 logging.warning("No results found in SPARQL query response.")
         except Exception as e:
@@ -148,6 +615,73 @@ class MovieDatabase:
 
         return return_data
 
+    async def fetch_objects_page(self, object_type: str, title: str = None, limit: int = 1000, offset: int = 0):
+        """
+        Fetch one page of the objects matching a title, in a stable order.
+
+        Args:
+            object_type (str): The type of object to fetch (e.g., "Film", "Actor").
+            title (str, optional): The title to search for. Defaults to None.
+            limit (int, optional): The maximum number of objects on the page. Defaults to 1000.
+            offset (int, optional): The number of objects before the page. Defaults to 0.
+
+        Returns:
+            tuple: A list of dictionaries containing object URIs and labels, and the total number of matching objects.
+        """
+        index = self.label_indexes.get(object_type)
+        if index is not None:
+            return index.page(title, limit, offset)
+
+        return_data = await self.fetch_objects_by_title(object_type, title)
+        return return_data[offset:offset + limit], len(return_data)
+
+    def count_objects_by_title(self, object_type: str, title: str = None):
+        """
+        Count the objects matching a title in the label index of the object type.
+
+        Args:
+            object_type (str): The type of object to count (e.g., "Film", "Actor").
+            title (str, optional): The title to search for. Defaults to None.
+
+        Returns:
+            int: The number of matching objects, not capped at LABEL_INDEX_MAX_RESULTS, or None while the label
+                index is not loaded.
+        """
+        index = self.label_indexes.get(object_type)
+        if index is None:
+            return None
+        return len(index.search(title, len(index.entries))) if title else len(index.entries)
+
+    async def stream_objects_by_title(self, object_type: str, title: str = None, offset: int = 0):
+        """
+        Stream all objects matching a title, in the order of fetch_objects_page but not capped at
+        LABEL_INDEX_MAX_RESULTS. While the label index is not loaded, the rows are yielded as the SPARQL results arrive.
+
+        Args:
+            object_type (str): The type of object to fetch (e.g., "Film", "Actor").
+            title (str, optional): The title to search for. Defaults to None.
+            offset (int, optional): The number of objects to skip. Defaults to 0.
+
+        Returns:
+            AsyncIterator[dict]: Dictionaries containing object URIs and labels.
+        """
+        index = self.label_indexes.get(object_type)
+        if index is not None:
+            entries = index.search(title, len(index.entries)) if title else index.entries
+            for position in range(offset, len(entries)):
+                yield entries[position]
+            return
+
+        seen = set()
+        template, bindings = self.objects_by_title_query(object_type, title)
+        async for result in self.stream_template(template, **bindings):
+            label_cap = result["label"].capitalize()
+            if label_cap in seen:
+                continue
+            seen.add(label_cap)
+            if len(seen) > offset:
+                yield {"object_uri": result["object"], "label": label_cap}
+
     # async def fetch_movies_by_name(self, title: str = None):
     #     """
     #     Fetch movies by title from the SPARQL endpoint.
@@ -292,6 +826,46 @@ class MovieDatabase:
         """
         return await self.fetch_objects_by_title("Film", title)
 
+    @staticmethod
+    def movies_by_properties_query(shape):
+        """
+        Build the template text of the movie search for one shape of filters.
+
+        Args:
+            shape (tuple): The number of titles, the number of values per MOVIE_FILTER_PROPERTIES filter, whether
+                a start and an end year are given, and whether names are found in the full-text index.
+
+        Returns:
+            str: The template text.
+        """
+        title_count, filter_counts, has_start_year, has_end_year, fts = shape
+        patterns = []
+        if has_start_year or has_end_year:
+            patterns.append("?movie dbo:releaseYear ?releaseYear .")
+        if title_count:
+            if fts:
+                patterns.append("?title onto:fts $titles_fts .")
+            conditions = " || ".join(f"CONTAINS(LCASE(STR(?title)), $title_{i})" for i in range(title_count))
+            patterns.append(f"FILTER ({conditions})")
+        for (param_name, sparql_property), count in zip(MOVIE_FILTER_PROPERTIES.items(), filter_counts):
+            patterns.extend(filter_patterns(param_name, count, sparql_property, fts))
+        if has_start_year:
+            patterns.append("FILTER (?releaseYear >= $start_year)")
+        if has_end_year:
+            patterns.append("FILTER (?releaseYear <= $end_year)")
+        patterns = "\n            ".join(patterns)
+
+        return f"""
+            SELECT DISTINCT ?movie ?title
+            WHERE {{
+            ?movie a dbo:Film .
+            ?movie rdfs:label ?title .
+            {patterns}
+            FILTER (LANG(?title) = "en")
+            }}
+            LIMIT $limit
+            """
+
     async def fetch_movies_by_properties(self, title: list = None, movie_uri:list = None, genre: list = None, start_year: int = None, end_year: int = None, actor: list = None, director: list = None, description: str = "", number_of_results: int = 10, distributor: list = None, writer: list = None, producer: list = None, composer: list = None, cinematographer: list = None, production_company: list = None,
                                          get_similar_movies=False):
         """
@@ -318,14 +892,6 @@ class MovieDatabase:
         Returns:
             list: A list of dictionaries containing movie URIs and labels.
         """
-        # Check if connected to the database
-        if not self.is_connected():
-            logging.info("Not connected to the database. Attempting to reconnect.")
-            self.sparql = SPARQLWrapper(GRAPHDB_ENDPOINT)
-            if not self.is_connected():
-                logging.error("Failed to reconnect to the database.")
-                raise Exception("Failed to reconnect to the database.")
-
         return_data = []
 
         if get_similar_movies and title: # if title is given fetch similar movies
@@ -342,111 +908,57 @@ class MovieDatabase:
             similar_movies = await self.fetch_similar_movies(params)
             return similar_movies
         else:  # fetch movies based on properties
-            # Construct the SPARQL query
+            # Prepare the SPARQL query of the given filters and bind their values
             logging.info("Fetching movies based on properties. - fetch_movies_by_properties")
-            query = """
-            PREFIX dbo: <http://dbpedia.org/ontology/>
-            PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-
-            SELECT DISTINCT ?movie ?title ?plotEmbedding
-            WHERE {
-            ?movie a dbo:Film .
-            ?movie rdfs:label ?title .
-            OPTIONAL {{ ?movie dbo:plotEmbedding ?plotEmbedding . }}
-            """
+            titles = as_list(title)
+            filter_values = {
+                "genre": as_list(genre), "actor": as_list(actor), "director": as_list(director),
+                "distributor": as_list(distributor), "writer": as_list(writer), "producer": as_list(producer),
+                "composer": as_list(composer), "cinematographer": as_list(cinematographer),
+                "production_company": as_list(production_company),
+            }
 
-            # Add filters based on provided properties
-            filters = []
-            add_filters(filters, 'title', title, 'rdfs:label', use_or=True)
-            add_filters(filters, 'genre', genre, 'dbo:genre')
-            add_filters(filters, 'actor', actor, 'dbo:starring')
-            add_filters(filters, 'director', director, 'dbo:director')
-            add_filters(filters, 'distributor', distributor, 'dbo:distributor')
-            add_filters(filters, 'writer', writer, 'dbo:writer')
-            add_filters(filters, 'producer', producer, 'dbo:producer')
-            add_filters(filters, 'composer', composer, 'dbo:musicComposer')
-            add_filters(filters, 'cinematographer', cinematographer, 'dbo:cinematography')
-            add_filters(filters, 'production_company', production_company, 'dbo:productionCompany')
+            has_description = bool(description and len(description) > 0)
+            has_filters = bool(titles) or any(filter_values.values())
+            if has_description and not has_filters and not (start_year or end_year):
+                # Nothing to filter on, so rank the whole catalogue straight from the embedding matrix
+                return await self.fetch_movies_by_description(description, number_of_results)
 
             max_number_of_results = number_of_results
-            if description and len(description) > 0:
+            if has_description:
                 max_number_of_results = 5000
 
-            # Nikita we need to add the description filter logic here
-
-            if start_year or end_year:
-                query += "?movie dbo:releaseYear ?releaseYear ."
-                if start_year:
-                    filters.append(f'FILTER (?releaseYear >= "{start_year}"^^xsd:gYear)')
-                if end_year:
-                    filters.append(f'FILTER (?releaseYear <= "{end_year}"^^xsd:gYear)')
-
-            query += " ".join(filters)
-            query += """
-            FILTER (LANG(?title) = "en")
-            }"""
-            query += f"""
-            LIMIT {max_number_of_results}
-            """
-
-            logging.info(f"SPARQL query: {query} - fetch_movies_by_properties")
-            self.sparql.setQuery(query)
-            self.sparql.setReturnFormat(JSON)
+            fts = self.use_full_text_search(titles, *filter_values.values())
+            shape = (len(titles), tuple(len(filter_values[name]) for name in MOVIE_FILTER_PROPERTIES), bool(start_year),
+                     bool(end_year), fts)
+            template = query_templates.prepare("movies_by_properties", shape, self.movies_by_properties_query)
+            bindings = {"limit": integer(max_number_of_results)}
+            for i, value in enumerate(titles):
+                bindings[f"title_{i}"] = literal(value.lower())
+            if titles and fts:
+                bindings["titles_fts"] = literal(fts_query(titles))
+            for param_name, values in filter_values.items():
+                bind_filters(bindings, param_name, values, fts)
+            if start_year:
+                bindings["start_year"] = typed_literal(start_year, "xsd:gYear")
+            if end_year:
+                bindings["end_year"] = typed_literal(end_year, "xsd:gYear")
 
             # Execute the query and process results
             try:
-                logging.info(f"Executing SPARQL query: {query}")
-                results = self.sparql.query().convert()
+                results = await self.execute_template(template, **bindings)
                 if "results" in results and "bindings" in results["results"]:
                     return_data = [
                         {
                             "object_uri": result["movie"]["value"],
-                            "label": result["title"]["value"],
-                            "plotEmbedding": result.get("plotEmbedding", {}).get("value", "")
+                            "label": result["title"]["value"]
                         }
                         for result in results["results"]["bindings"]
                     ]
 
-                    if description and len(description) > 0:
-                        # Filter the movies based on the description
-                         # Convert return_data to DataFrame
-                        df_movies = pd.DataFrame(return_data)
-                        logging.info(f"DataFrame created with {len(df_movies)} movies")
-
-                        # Deserialize the JSON string back to a Python list, set to None if plotEmbedding is None
-                        df_movies['embedding'] = df_movies['plotEmbedding'].apply(
-                            lambda embedding_literal: json.loads(embedding_literal) if (embedding_literal is not None and len(embedding_literal) > 0) else None
-                        )
-                        logging.info("Embeddings deserialized")
-
-                        # Calculate the embedding of the given description
-                        device = 'cuda' if torch.cuda.is_available() else 'cpu'
-                        model = SentenceTransformer('all-MiniLM-L6-v2', device=device)
-                        description_embedding = model.encode(description)
-                        logging.info("Description embedding calculated")
-
-                        # Calculate cosine similarity between the description and each movie
-                        df_movies['cosine_similarity'] = df_movies['embedding'].apply(
-                            lambda emb: cosine_similarity([description_embedding], [emb])[0][0] if emb is not None else 0
-                        )
-                        logging.info("Cosine similarity calculated")
-
-                        # Scale cosine similarity to the range of 0 to 100
-                        df_movies['cosine_similarity_scaled'] = ((df_movies['cosine_similarity'] + 1) * 50).astype(int)
-
-                        # Calculate the total_similarity_score of the description with itself
-                        description_total_similarity_score = df_movies['cosine_similarity_scaled'].max()
-
-                        # Scale total_similarity_score to the range of 0 to 10
-                        df_movies['total_similarity_score'] = (df_movies['cosine_similarity_scaled'] / description_total_similarity_score) * 10
-
-                        # Sort by total_similarity_score in descending order
-                        df_movies = df_movies.sort_values(by='total_similarity_score', ascending=False)
-                        logging.info("Movies sorted by total similarity score")
-                        top_movies = df_movies.head(number_of_results)
-                        top_movies_list = top_movies.to_dict(orient='records')
-                        logging.info(f"Returning {len(top_movies_list)} movies")
-                        return top_movies_list
+                    if has_description:
+                        # Rank only the filtered candidates by their similarity to the description
+                        return await self.fetch_movies_by_description(description, number_of_results, candidates=return_data)
                 else:
                     logging.warning("No results found in SPARQL query response.")
             except Exception as e:
@@ -454,180 +966,340 @@ class MovieDatabase:
                 raise
 
             return return_data
+
+    async def fetch_movies_by_description(self, description: str, number_of_results: int = 10, candidates: list = None):
+        """
+        Rank movies by the cosine similarity of their plot embedding to a free-text description.
+
+        Args:
+            description (str): The description to search for.
+            number_of_results (int, optional): The number of results to return. Defaults to 10.
+            candidates (list, optional): Restrict the ranking to these movies (dictionaries with object_uri and label).
+                Defaults to None (the whole catalogue).
+
+        Returns:
+            list: A list of dictionaries containing movie URIs, labels and similarity scores, most similar first.
+        """
+        await self._ensure_plot_embeddings()
+
+        # Calculate the embedding of the given description with the shared, cached encoder
+        description_embedding = await encoder.encode(description)
+        logging.info("Description embedding calculated")
+
+        if candidates is None:
+            labels = dict(zip(self.plot_embeddings.uris, self.plot_embeddings.labels))
+            if self.ann_index is not None:
+                ranked = self.ann_index.search(description_embedding, number_of_results)
+            else:
+                ranked = self.plot_embeddings.top_k(description_embedding, number_of_results)
+        else:
+            labels = {movie["object_uri"]: movie["label"] for movie in candidates}
+            ranked = self.plot_embeddings.top_k(description_embedding, number_of_results, uris=labels.keys())
+        logging.info("Cosine similarity calculated")
+
+        top_movies_list = []
+        for movie_uri, similarity in ranked:
+            top_movies_list.append({
+                "object_uri": movie_uri,
+                "label": labels.get(movie_uri, ""),
+                "cosine_similarity": similarity,
+                # Scale cosine similarity to the range of 0 to 100
+                "cosine_similarity_scaled": int((similarity + 1) * 50)
+            })
+
+        if top_movies_list:
+            # Scale the scores to the range of 0 to 10 relative to the best match
+            description_total_similarity_score = max(movie["cosine_similarity_scaled"] for movie in top_movies_list) or 1
+            for movie in top_movies_list:
+                movie["total_similarity_score"] = (movie["cosine_similarity_scaled"] / description_total_similarity_score) * 10
+
+        logging.info(f"Returning {len(top_movies_list)} movies")
+        return top_movies_list
     
 
-    async def fetch_movies_details(self, movies):
+    async def fetch_movies_details(self, movies, strategy: str = None, fields: list = None,
+                                   exclude=DETAIL_LARGE_PROPERTIES):
         """
-        Fetch movies details from the SPARQL endpoint.
+        Fetch movies details from the SPARQL endpoint. Only the selected details are queried. Large batches are
+        split into queries of DETAILS_CHUNK_SIZE movies, of which DETAILS_CONCURRENCY run at once.
 
         Args:
             movies (list): The movies to get details for.
+            strategy (str, optional): "split" to fetch every property in its own UNION branch, or "grouped" to join
+                all properties in one GROUP BY query. Defaults to None (DETAILS_STRATEGY).
+            fields (list, optional): The details to fetch besides the movie URI and title. Defaults to None (all
+                details not in exclude).
+            exclude (tuple, optional): Details to leave out when no fields are given. Defaults to DETAIL_LARGE_PROPERTIES.
 
         Returns:
             list: A list of dictionaries containing movie URIs and their details.
         """
-        return_data = []
+        strategy = strategy or DETAILS_STRATEGY
+        fields = select_detail_fields(fields, exclude)
+        if strategy == "grouped":
+            fetch_chunk = self.fetch_movies_details_grouped
+        elif strategy == "split":
+            fetch_chunk = self.fetch_movies_details_split
+        else:
+            raise ValueError(f"Unknown details strategy: {strategy}")
 
-        # Check if connected to the database
-        if not self.is_connected():
-            logging.info("Not connected to the database. Attempting to reconnect.")
-            self.sparql = SPARQLWrapper(GRAPHDB_ENDPOINT)
-            if not self.is_connected():
-                logging.error("Failed to reconnect to the database.")
-                raise Exception("Failed to reconnect to the database.")
+        movies = list({movie["object_uri"]: movie for movie in movies}.values())
+        if len(movies) <= DETAILS_CHUNK_SIZE:
+            return await fetch_chunk(movies, fields)
 
-        # Construct the SPARQL query
-        movies_filter = " ".join([f"<{movie['object_uri']}>" for movie in movies])
+        semaphore = asyncio.Semaphore(DETAILS_CONCURRENCY)
 
-        query = f"""
-        PREFIX dbo: <http://dbpedia.org/ontology/>
-        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+        async def fetch_bounded(chunk):
+            async with semaphore:
+                return await fetch_chunk(chunk, fields)
 
-        SELECT ?movie ?title ?abstract ?runtime ?budget ?plotEmbedding ?boxOffice ?releaseYear ?country_label 
-            (GROUP_CONCAT(DISTINCT ?genre_label; separator=", ") AS ?genres)
-            (GROUP_CONCAT(DISTINCT ?starring_label; separator=", ") AS ?starring)
-            (GROUP_CONCAT(DISTINCT ?director_label; separator=", ") AS ?directors)
-            (GROUP_CONCAT(DISTINCT ?producer_label; separator=", ") AS ?producers)
-            (GROUP_CONCAT(DISTINCT ?writer_label; separator=", ") AS ?writers)
-            (GROUP_CONCAT(DISTINCT ?composer_label; separator=", ") AS ?composers)
-            (GROUP_CONCAT(DISTINCT ?cinematographer_label; separator=", ") AS ?cinematographers)
-        WHERE {{
-            VALUES ?movie {{ {movies_filter} }}
-            ?movie rdfs:label ?title .
+        chunks = [movies[start:start + DETAILS_CHUNK_SIZE] for start in range(0, len(movies), DETAILS_CHUNK_SIZE)]
+        results = await asyncio.gather(*(fetch_bounded(chunk) for chunk in chunks))
+        return [movie_details for chunk_details in results for movie_details in chunk_details]
 
-            OPTIONAL {{ ?movie dbo:abstract ?abstract . }}
-            OPTIONAL {{ ?movie dbo:runtime ?runtime . }}
-            OPTIONAL {{ ?movie dbo:budget ?budget . }}
-            OPTIONAL {{ ?movie dbo:plotEmbedding ?plotEmbedding . }}
-            OPTIONAL {{ ?movie dbo:boxOffice ?boxOffice . }}
-            OPTIONAL {{ ?movie dbo:releaseYear ?releaseYear . }}
-            OPTIONAL {{ ?movie dbo:country ?country .
+    @staticmethod
+    def movies_details_grouped_query(fields):
+        """
+        Build the template text of the grouped details query of a selection of details, with one OPTIONAL pattern
+        per detail.
+
+        Args:
+            fields (tuple): The details to fetch.
+
+        Returns:
+            str: The template text, with the movies bound to $movies.
+        """
+        scalar_fields = [field for field in DETAIL_SCALAR_PROPERTIES if field in fields]
+        list_fields = [field for field in DETAIL_LIST_PROPERTIES if field in fields]
+        variables = " ".join(f"?{DETAIL_GROUPED_VARIABLES.get(field, field)}" for field in scalar_fields)
+        aggregates = "\n            ".join(f'(GROUP_CONCAT(DISTINCT ?{field}_label; separator=", ") AS ?{field})'
+                                          for field in list_fields)
+        patterns = []
+        for field in scalar_fields:
+            if field == "country":
+                patterns.append(f"""OPTIONAL {{ ?movie {DETAIL_SCALAR_PROPERTIES[field]} ?country .
                     ?country rdfs:label ?country_label .
                     FILTER (lang(?country_label) = 'en')
-                    }}        
-            OPTIONAL {{ ?movie dbo:genre ?genre .
-                    ?genre rdfs:label ?genre_label .
-                    FILTER (lang(?genre_label) = 'en')
-                    }}
-            OPTIONAL {{ ?movie dbo:starring ?starring .
-                    ?starring rdfs:label ?starring_label .
-                    FILTER (lang(?starring_label) = 'en')
-                    }}
-            OPTIONAL {{ ?movie dbo:director ?director .
-                    ?director rdfs:label ?director_label .
-                    FILTER (lang(?director_label) = 'en')
-                    }}
-            OPTIONAL {{ ?movie dbo:producer ?producer .
-                    ?producer rdfs:label ?producer_label .
-                    FILTER (lang(?producer_label) = 'en')
-                    }}
-            OPTIONAL {{ ?movie dbo:writer ?writer .
-                    ?writer rdfs:label ?writer_label .
-                    FILTER (lang(?writer_label) = 'en')
-                    }}
-            OPTIONAL {{ ?movie dbo:musicComposer ?composer .
-                    ?composer rdfs:label ?composer_label .
-                    FILTER (lang(?composer_label) = 'en')
-                    }}
-            OPTIONAL {{ ?movie dbo:cinematography ?cinematographer .
-                    ?cinematographer rdfs:label ?cinematographer_label .
-                    FILTER (lang(?cinematographer_label) = 'en')
-                    }}
+                    }}""")
+            else:
+                patterns.append(f"OPTIONAL {{ ?movie {DETAIL_SCALAR_PROPERTIES[field]} ?{field} . }}")
+        for field in list_fields:
+            patterns.append(f"""OPTIONAL {{ ?movie {DETAIL_LIST_PROPERTIES[field]} ?{field}_object .
+                    ?{field}_object rdfs:label ?{field}_label .
+                    FILTER (lang(?{field}_label) = 'en')
+                    }}""")
+        patterns = "\n            ".join(patterns)
+
+        return f"""
+        SELECT ?movie ?title {variables}
+            {aggregates}
+        WHERE {{
+            $movies
+            ?movie rdfs:label ?title .
+
+            {patterns}
         }}
-        GROUP BY ?movie ?title ?abstract ?runtime ?budget ?boxOffice ?releaseYear ?country_label ?plotEmbedding
+        GROUP BY ?movie ?title {variables}
+        """
+
+    async def fetch_movies_details_grouped(self, movies, fields=None):
+        """
+        Fetch movies details with a single GROUP BY query over all properties. The OPTIONAL patterns of the
+        multi-valued properties are joined before grouping, so the intermediate result grows with the product
+        of the number of genres, actors, directors, etc. of each movie.
+
+        Args:
+            movies (list): The movies to get details for.
+            fields (tuple, optional): The details to fetch. Defaults to None (all details).
+
+        Returns:
+            list: A list of dictionaries containing movie URIs and their details.
         """
-        self.sparql.setQuery(query)
-        self.sparql.setReturnFormat(JSON)
-        results = self.sparql.query().convert()
+        if fields is None:
+            fields = select_detail_fields(exclude=())
+        scalar_fields = [field for field in DETAIL_SCALAR_PROPERTIES if field in fields]
+        list_fields = [field for field in DETAIL_LIST_PROPERTIES if field in fields]
+
+        template = query_templates.prepare("movie_details_grouped", tuple(fields), self.movies_details_grouped_query)
+        movies_filter = values_block("movie", [iri(movie["object_uri"]) for movie in movies])
+        results = await self.execute_template(template, movies=movies_filter)
 
         # Use a dictionary to remove duplicates based on the movie URI
         unique_movies = {}
         for result in results["results"]["bindings"]:
             movie_uri = result["movie"]["value"]
             if movie_uri not in unique_movies:
-                unique_movies[movie_uri] = {
-                    "movie": movie_uri,
-                    "title": result["title"]["value"],
-                    "abstract": result.get("abstract", {}).get("value", ""),
-                    "plotEmbedding": result.get("plotEmbedding", {}).get("value", ""),
-                    "runtime": result.get("runtime", {}).get("value", ""),
-                    "budget": result.get("budget", {}).get("value", ""),
-                    "boxOffice": result.get("boxOffice", {}).get("value", ""),
-                    "releaseYear": result.get("releaseYear", {}).get("value", ""),
-                    "country": result.get("country_label", {}).get("value", ""),
-                    "genres": result.get("genres", {}).get("value", ""),
-                    "starring": result.get("starring", {}).get("value", ""),
-                    "directors": result.get("directors", {}).get("value", ""),
-                    "producers": result.get("producers", {}).get("value", ""),
-                    "writers": result.get("writers", {}).get("value", ""),
-                    "composers": result.get("composers", {}).get("value", ""),
-                    "cinematographers": result.get("cinematographers", {}).get("value", "")
-                }
+                unique_movies[movie_uri] = {"movie": movie_uri, "title": result["title"]["value"]}
+                for field in scalar_fields:
+                    unique_movies[movie_uri][field] = result.get(DETAIL_GROUPED_VARIABLES.get(field, field), {}).get("value", "")
+                for field in list_fields:
+                    unique_movies[movie_uri][field] = result.get(field, {}).get("value", "")
 
         return list(unique_movies.values())
-    
 
-    async def generate_sparql_query(self, params):
+    @staticmethod
+    def movies_details_split_query(fields):
+        """
+        Build the template text of the split details query of a selection of details, with one UNION branch per
+        detail.
+
+        Args:
+            fields (tuple): The details to fetch.
+
+        Returns:
+            str: The template text, with the movies bound to $movies.
+        """
+        scalar_fields = [field for field in DETAIL_SCALAR_PROPERTIES if field in fields]
+        list_fields = [field for field in DETAIL_LIST_PROPERTIES if field in fields]
+
+        branches = ['{ ?movie rdfs:label ?value . BIND("title" AS ?property) }']
+        for field in scalar_fields:
+            if field == "country":
+                continue
+            branches.append(f'{{ ?movie {DETAIL_SCALAR_PROPERTIES[field]} ?value . BIND("{field}" AS ?property) }}')
+        labelled = {field: DETAIL_LIST_PROPERTIES[field] for field in list_fields}
+        if "country" in scalar_fields:
+            labelled["country"] = DETAIL_SCALAR_PROPERTIES["country"]
+        for field, predicate in labelled.items():
+            branches.append(f"""{{ ?movie {predicate} ?object .
+                ?object rdfs:label ?value .
+                FILTER (lang(?value) = 'en')
+                BIND("{field}" AS ?property) }}""")
+        union = "\n            UNION ".join(branches)
+
+        return f"""
+        SELECT ?movie ?property ?value
+        WHERE {{
+            $movies
+            {union}
+        }}
+        """
+
+    async def fetch_movies_details_split(self, movies, fields=None):
+        """
+        Fetch movies details with one UNION branch per property, so every branch returns one row per value and
+        the result grows with the sum, not the product, of the number of values. The rows are assembled into
+        one record per movie in Python.
+
+        Args:
+            movies (list): The movies to get details for.
+            fields (tuple, optional): The details to fetch. Defaults to None (all details).
+
+        Returns:
+            list: A list of dictionaries containing movie URIs and their details, in the order of movies.
+        """
+        if fields is None:
+            fields = select_detail_fields(exclude=())
+        scalar_fields = [field for field in DETAIL_SCALAR_PROPERTIES if field in fields]
+        list_fields = [field for field in DETAIL_LIST_PROPERTIES if field in fields]
+
+        template = query_templates.prepare("movie_details_split", tuple(fields), self.movies_details_split_query)
+        movies_filter = values_block("movie", [iri(movie["object_uri"]) for movie in movies])
+        results = await self.execute_template(template, movies=movies_filter)
+
+        values = {}
+        for result in results["results"]["bindings"]:
+            movie_values = values.setdefault(result["movie"]["value"], {})
+            movie_values.setdefault(result["property"]["value"], []).append(result["value"]["value"])
+
+        return_data = []
+        for movie_uri in dict.fromkeys(movie["object_uri"] for movie in movies):
+            movie_values = values.get(movie_uri)
+            # Like the grouped query, skip movies without a label
+            if not movie_values or "title" not in movie_values:
+                continue
+            movie_details = {"movie": movie_uri, "title": movie_values["title"][0]}
+            for field in scalar_fields:
+                movie_details[field] = movie_values.get(field, [""])[0]
+            for field in list_fields:
+                movie_details[field] = ", ".join(dict.fromkeys(movie_values.get(field, [])))
+            return_data.append(movie_details)
+
+        return return_data
+
+    async def generate_sparql_query(self, params, weights=None):
+        """
+        Prepare the SPARQL query scoring the movies that share attributes with the target movie of a search.
+
+        Args:
+            params (dict): The search parameters, with the target in movie_uri, or else in title.
+            weights (dict, optional): The weight per shared attribute. Defaults to None (SIMILARITY_WEIGHTS).
+
+        Returns:
+            tuple: The prepared template and its bindings.
+
+        Raises:
+            ValueError: If the target is not a valid IRI.
+        """
+        weights = SIMILARITY_WEIGHTS if weights is None else {**SIMILARITY_WEIGHTS, **weights}
         title = params.get('title')
-        genre = params.get('genre')
-        actors = params.get('actor')
-        director = params.get('director')
+        genre = as_list(params.get('genre'))
+        actors = as_list(params.get('actor'))
+        director = as_list(params.get('director'))
         movie_uri = params.get('movie_uri')
         start_year = params.get('start_year')
         end_year = params.get('end_year')
 
-    
-        if movie_uri:
-            if len(movie_uri) > 0 and isinstance(movie_uri, list):
-                movie_uri = movie_uri[0]
-                movie_uri = movie_uri.replace("http://dbpedia.org/resource/", 'dbr:')
-
-        else:
-            if title and isinstance(title, list) and len(title) > 0: 
-                title = title[0]
-                title = title.replace(' ', '_')
-
-        # Add filters based on provided properties
-        filters = []
-        add_filters(filters, 'genre', genre, 'dbo:genre')
-        add_filters(filters, 'actor', actors, 'dbo:starring')
-        add_filters(filters, 'director', director, 'dbo:director')
+        if isinstance(movie_uri, list):
+            movie_uri = movie_uri[0] if movie_uri else None
+        if not movie_uri:
+            if isinstance(title, list):
+                title = title[0] if title else None
+            # Without a URI the target is the DBpedia resource of the title
+            movie_uri = "http://dbpedia.org/resource/" + iri_encode((title or "").replace(' ', '_'))
 
         # Nikita we need to add the description filter logic here
+        has_year_range = bool(start_year and end_year)
+
+        fts = self.use_full_text_search(genre, actors, director)
+        shape = (len(genre), len(actors), len(director), has_year_range, fts)
+        template = query_templates.prepare("similar_movies", shape, self.similar_movies_query)
+        bindings = {"target_movie": iri(movie_uri)}
+        for attribute in ("genre", "actor", "director", "country", "releaseYear"):
+            bindings[f"{attribute}_weight"] = number(weights[attribute])
+        bind_filters(bindings, 'genre', genre, fts)
+        bind_filters(bindings, 'actor', actors, fts)
+        bind_filters(bindings, 'director', director, fts)
+        if has_year_range:
+            bindings["start_year"] = typed_literal(start_year, "xsd:gYear")
+            bindings["end_year"] = typed_literal(end_year, "xsd:gYear")
+        return template, bindings
+
+    @staticmethod
+    def similar_movies_query(shape):
+        """
+        Build the template text of the similar-movies query for one shape of filters.
 
-        if start_year and end_year:
-            if start_year:
-                filters.append(f'FILTER (?releaseYear >= "{start_year}"^^xsd:gYear)')
-            if end_year:
-                filters.append(f'FILTER (?releaseYear <= "{end_year}"^^xsd:gYear)')
-
-        filters_str = ""
-        if filters and len(filters) > 0:
-            filters_str = " ".join(filters)
-
-        # Construct the SPARQL query
-        query = f"""
-        PREFIX dbo: <http://dbpedia.org/ontology/>
-        PREFIX dbr: <http://dbpedia.org/resource/>
+        Args:
+            shape (tuple): The number of genre, actor and director filters, whether a year range is given, and
+                whether names are found in the full-text index.
 
-        SELECT DISTINCT ?movie ?title ?plotEmbedding ?similarityScore
+        Returns:
+            str: The template text.
+        """
+        genre_count, actor_count, director_count, has_year_range, fts = shape
+        filters = filter_patterns('genre', genre_count, 'dbo:genre', fts)
+        filters += filter_patterns('actor', actor_count, 'dbo:starring', fts)
+        filters += filter_patterns('director', director_count, 'dbo:director', fts)
+        if has_year_range:
+            filters.append('FILTER (?releaseYear >= $start_year)')
+            filters.append('FILTER (?releaseYear <= $end_year)')
+        filters_str = " ".join(filters)
+
+        return f"""
+        SELECT DISTINCT ?movie ?title ?similarityScore
         WHERE {{
             # Explicitly set the target movie
-            BIND({movie_uri} AS ?targetMovie)
+            BIND($target_movie AS ?targetMovie)
 
             # Retrieve movies linked to the given movie entity
             ?movie rdf:type dbo:Film ;
                 rdfs:label ?title .
 
             # add properties from the selected movies    
-            OPTIONAL {{
-                ?movie dbo:plotEmbedding ?plotEmbedding .
-            }}
-
             OPTIONAL {{ ?movie dbo:abstract ?abstract . }}
             OPTIONAL {{ ?movie dbo:runtime ?runtime . }}
             OPTIONAL {{ ?movie dbo:budget ?budget . }}
-            OPTIONAL {{ ?movie dbo:plotEmbedding ?plotEmbedding . }}
             OPTIONAL {{ ?movie dbo:boxOffice ?boxOffice . }}
             OPTIONAL {{ ?movie dbo:releaseYear ?releaseYear . }}
             OPTIONAL {{ ?movie dbo:country ?country .
@@ -641,27 +1313,27 @@ class MovieDatabase:
             OPTIONAL {{
                 ?movie dbo:genre ?genre .
                 ?targetMovie dbo:genre ?genre .
-                BIND(10 AS ?genreWeight)
+                BIND($genre_weight AS ?genreWeight)
             }}
             OPTIONAL {{
                 ?movie dbo:starring ?actor .
                 ?targetMovie dbo:starring ?actor .
-                BIND(6 AS ?actorWeight)
+                BIND($actor_weight AS ?actorWeight)
             }}
             OPTIONAL {{
                 ?movie dbo:director ?director .
                 ?targetMovie dbo:director ?director .
-                BIND(5 AS ?directorWeight)
+                BIND($director_weight AS ?directorWeight)
             }}
             OPTIONAL {{
                 ?movie dbo:country ?country .
                 ?targetMovie dbo:country ?country .
-                BIND(4 AS ?countryWeight)
+                BIND($country_weight AS ?countryWeight)
             }}
             OPTIONAL {{
                 ?movie dbo:country ?country .
                 ?targetMovie dbo:country ?country .
-                BIND(3 AS ?releaseYearWeight)
+                BIND($releaseYear_weight AS ?releaseYearWeight)
             }}
 
 
@@ -677,32 +1349,76 @@ class MovieDatabase:
 
             {filters_str}
         }}
-        GROUP BY ?movie ?title ?similarityScore ?plotEmbedding
+        GROUP BY ?movie ?title ?similarityScore
         HAVING (?similarityScore > 0) # Keep only movies with a positive relevance score
         ORDER BY DESC(?similarityScore)
-        LIMIT {500}
+        LIMIT 500
         """
-        return query
 
-    async def fetch_similar_movies(self, params):
-        query = await self.generate_sparql_query(params)
-        logging.info(f"SPARQL query: {query}")
-        
-        self.sparql.setQuery(query)
-        self.sparql.setReturnFormat(JSON)
+    async def fetch_similar_movies_in_memory(self, target_movie_uri, params, weights=None):
+        """
+        Score the movies similar to the target movie with the in-memory scorer, applying the genre, actor,
+        director and release year filters of the search.
+
+        Args:
+            target_movie_uri (str): The URI of the target movie.
+            params (dict): The search parameters.
+            weights (dict, optional): The weight per shared attribute. Defaults to None (SIMILARITY_WEIGHTS).
+
+        Returns:
+            list: The number_of_results most similar movies, plus the target movie if it is not among them.
+        """
+        await self._ensure_plot_embeddings()
+        filters = {name: params.get(name) for name in ('genre', 'actor', 'director', 'start_year', 'end_year')}
+        ranked = self.similarity.score(target_movie_uri, weights, filters)
+        number_of_results = params.get('number_of_results') or 10
+        top_movies = ranked[:number_of_results]
+
+        # Ensure the target movie is included
+        if all(movie["object_uri"] != target_movie_uri for movie in top_movies):
+            top_movies += [movie for movie in ranked if movie["object_uri"] == target_movie_uri]
+        logging.info(f"Returning {len(top_movies)} movies")
+        return top_movies
+
+    async def fetch_similar_movies(self, params, weights=None):
+        """
+        Fetch the movies most similar to the target movie of the search, by shared attributes and plot.
+        The in-memory scorer is used once it is loaded; until then the candidates are scored by GraphDB.
+
+        Args:
+            params (dict): The search parameters, with the target in movie_uri.
+            weights (dict, optional): The weight per shared attribute. Defaults to None (SIMILARITY_WEIGHTS).
+
+        Returns:
+            list: A list of dictionaries with the object URIs, labels and similarity scores, most similar first.
+        """
+        target_movie_uri = params.get('movie_uri')
+        if isinstance(target_movie_uri, list):
+            target_movie_uri = target_movie_uri[0] if target_movie_uri else None
+
+        # The precomputed neighbours hold for the default weights and an unfiltered search
+        filtered = any(params.get(name) for name in ('genre', 'actor', 'director')) or \
+            (params.get('start_year') and params.get('end_year'))
+        if target_movie_uri and weights is None and not filtered:
+            top_movies = self.similarity_table.neighbours(target_movie_uri, params.get('number_of_results') or 10)
+            if top_movies is not None:
+                return top_movies
+
+        if target_movie_uri and target_movie_uri in self.similarity.uri_to_id:
+            return await self.fetch_similar_movies_in_memory(target_movie_uri, params, weights)
+
+        template, bindings = await self.generate_sparql_query(params, weights)
 
         # Execute the query and process results
         try:
-            logging.info(f"Executing SPARQL query: {query}")
-            results = self.sparql.query().convert()
+            results = await self.execute_template(template, **bindings)
             if "results" in results and "bindings" in results["results"]:
                 results_binding = results["results"]["bindings"]
                 return_data = [
                     {
                         "object_uri": result["movie"]["value"] if "movie" in result and result["movie"]["value"] is not None else None,
                         "label": result["title"]["value"] if "title" in result and result["title"]["value"] is not None else None,
-                        "plotEmbedding": result["plotEmbedding"]["value"] if "plotEmbedding" in result and result["plotEmbedding"]["value"] is not None else None,
-                        "similarity_score": result["similarityScore"]["value"] if "similarityScore" in result and result["similarityScore"]["value"] is not None else None
+                        "similarity_score": float(result["similarityScore"]["value"]) if "similarityScore" in result and result["similarityScore"]["value"] is not None else None
                     }
                     for result in results_binding
                 ]
@@ -717,31 +1433,23 @@ class MovieDatabase:
                         target_movie_uri = target_movie_uri[0]
                     
                     if target_movie_uri:
-                        # Deserialize the JSON string back to a Python list, set to None if plotEmbedding is None
-                        df_movies['embedding'] = df_movies['plotEmbedding'].apply(
-                            lambda embedding_literal: json.loads(embedding_literal) if embedding_literal is not None else None
-                        )
-                        logging.info("Embeddings deserialized")
+                        await self._ensure_plot_embeddings()
 
                         # Get the embedding of the target movie
                         # Ensure target_movie_uri exists in the DataFrame
                         if target_movie_uri in df_movies['object_uri'].values:
-                            target_embedding_row = df_movies.loc[df_movies['object_uri'] == target_movie_uri, 'embedding']
-                            if not target_embedding_row.empty:
-                                target_embedding = target_embedding_row.values[0]
+                            target_embedding = self.plot_embeddings.vector(target_movie_uri)
+                            if target_embedding is not None:
                                 logging.info(f"Target embedding found for {target_movie_uri}")
                             else:
-                                target_embedding = None
                                 logging.warning(f"Target embedding not found for {target_movie_uri}")
                         else:
                             target_embedding = None
                             logging.warning(f"Target movie URI {target_movie_uri} not found in DataFrame")
 
-                        if target_embedding:
-                            # Calculate cosine similarity between the target movie and each other movie
-                            df_movies['cosine_similarity'] = df_movies['embedding'].apply(
-                                lambda emb: cosine_similarity([target_embedding], [emb])[0][0] if emb is not None else 0
-                            )
+                        if target_embedding is not None:
+                            # Calculate cosine similarity between the target movie and each other movie in one matrix-vector product
+                            df_movies['cosine_similarity'] = self.plot_embeddings.similarities(target_embedding, df_movies['object_uri'])
                             logging.info("Cosine similarity calculated")
 
                             # Scale cosine similarity to the range of 0 to 100
@@ -863,5 +1571,7 @@ async def main():
     movies = await db.fetch_movies_by_properties()
     print(movies[:10])
 
+    await db.close()
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
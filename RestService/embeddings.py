@@ -0,0 +1,192 @@
+"""
+file: embeddings.py
+date: 17-10-2026
+description: This module keeps the plot embeddings of all films in memory as a single L2-normalised float32 matrix,
+so that similarity queries are answered with one matrix-vector product instead of per-row JSON parsing.
+"""
+
+import logging
+import os
+import numpy as np
+
+
+def embeddings_rows_file(embeddings_file):
+    """
+    Get the path of the side-car file listing the movie URI and label of every row of an embeddings .npy file.
+
+    Args:
+        embeddings_file (str): Path of the .npy file.
+
+    Returns:
+        str: Path of the tab-separated rows file.
+    """
+    return f"{os.path.splitext(embeddings_file)[0]}.rows.tsv"
+
+
+class PlotEmbeddingMatrix:
+    """
+    An in-memory matrix of L2-normalised plot embeddings with a movie URI -> row index.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty embedding matrix.
+        """
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.uris = []
+        self.labels = []
+        self.uri_to_row = {}
+
+    @property
+    def is_loaded(self):
+        """
+        Check if the matrix holds any embeddings.
+
+        Returns:
+            bool: True if at least one embedding is loaded, False otherwise.
+        """
+        return len(self.uris) > 0
+
+    def build(self, uris, labels, vectors):
+        """
+        Build the matrix from parallel lists of URIs, labels and raw embedding vectors.
+
+        Args:
+            uris (list): The movie URIs, one per row.
+            labels (list): The movie labels, one per row.
+            vectors (list): The raw (not normalised) embedding vectors, one per row.
+        """
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2:
+            raise ValueError(f"Expected a 2-d embedding matrix, got shape {matrix.shape}")
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+
+        self.matrix = matrix / norms
+        self.uris = list(uris)
+        self.labels = list(labels)
+        self.uri_to_row = {uri: row for row, uri in enumerate(self.uris)}
+        logging.info(f"Plot embedding matrix built with shape {self.matrix.shape}")
+
+    def load_file(self, embeddings_file):
+        """
+        Memory-map a plot embeddings .npy file written by the RDF pipeline (DB/Datasets/dbpedia_csv_to_rdf.py),
+        together with its side-car file of row URIs and labels. The rows are already L2-normalised, so a float32
+        file is used in place without parsing or copying.
+
+        Args:
+            embeddings_file (str): Path of the .npy file.
+        """
+        matrix = np.load(embeddings_file, mmap_mode='r')
+        if matrix.dtype != np.float32:
+            # e.g. a float16 file: upcast and re-normalise once, so queries do not convert the whole matrix every time
+            matrix = np.asarray(matrix, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix = matrix / norms
+
+        uris, labels = [], []
+        with open(embeddings_rows_file(embeddings_file), 'r', encoding='utf-8') as rows_file:
+            for line in rows_file:
+                uri, _, label = line.rstrip("\n").partition("\t")
+                uris.append(uri)
+                labels.append(label)
+        if len(uris) != matrix.shape[0]:
+            raise ValueError(f"{embeddings_file} has {matrix.shape[0]} rows but its rows file lists {len(uris)} movies")
+
+        self.matrix = matrix
+        self.uris = uris
+        self.labels = labels
+        self.uri_to_row = {uri: row for row, uri in enumerate(self.uris)}
+        logging.info(f"Plot embedding matrix mapped from {embeddings_file} with shape {self.matrix.shape}")
+
+    def vector(self, uri):
+        """
+        Get the normalised embedding of a movie.
+
+        Args:
+            uri (str): The movie URI.
+
+        Returns:
+            np.ndarray: The normalised embedding, or None if the movie has no embedding.
+        """
+        row = self.uri_to_row.get(uri)
+        if row is None:
+            return None
+        return self.matrix[row]
+
+    @staticmethod
+    def normalise(vector):
+        """
+        L2-normalise a query vector.
+
+        Args:
+            vector (array-like): The query vector.
+
+        Returns:
+            np.ndarray: The normalised float32 vector.
+        """
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _rows_for(self, uris):
+        """
+        Map URIs to matrix rows, using -1 for URIs without an embedding.
+        """
+        return np.fromiter((self.uri_to_row.get(uri, -1) for uri in uris), dtype=np.int64, count=len(uris))
+
+    def similarities(self, query_vector, uris):
+        """
+        Calculate the cosine similarity between a query vector and the given movies.
+
+        Args:
+            query_vector (array-like): The query embedding.
+            uris (list): The movie URIs to score.
+
+        Returns:
+            np.ndarray: One cosine similarity per URI, 0 for movies without an embedding.
+        """
+        uris = list(uris)
+        rows = self._rows_for(uris)
+        scores = np.zeros(len(uris), dtype=np.float32)
+        known = rows >= 0
+        if known.any():
+            scores[known] = self.matrix[rows[known]] @ self.normalise(query_vector)
+        # float32 round-off would otherwise push a movie's similarity with itself just below 1.0
+        return np.clip(np.round(scores, 6), -1.0, 1.0)
+
+    def top_k(self, query_vector, k, uris=None):
+        """
+        Find the k movies whose embeddings are most similar to the query vector.
+
+        Args:
+            query_vector (array-like): The query embedding.
+            k (int): The number of results to return.
+            uris (list, optional): Restrict the search to these movie URIs. Defaults to None (all movies).
+
+        Returns:
+            list: A list of (movie URI, cosine similarity) tuples, most similar first.
+        """
+        if not self.is_loaded or k <= 0:
+            return []
+
+        query_vector = self.normalise(query_vector)
+        if uris is None:
+            rows = np.arange(len(self.uris))
+            scores = self.matrix @ query_vector
+        else:
+            rows = self._rows_for(list(uris))
+            rows = np.unique(rows[rows >= 0])
+            scores = self.matrix[rows] @ query_vector
+
+        if len(rows) == 0:
+            return []
+        if k < len(rows):
+            best = np.argpartition(-scores, k - 1)[:k]
+        else:
+            best = np.arange(len(rows))
+        best = best[np.argsort(-scores[best], kind="stable")]
+
+        scores = np.clip(np.round(scores, 6), -1.0, 1.0)
+        return [(self.uris[rows[i]], float(scores[i])) for i in best]
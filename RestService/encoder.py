@@ -0,0 +1,170 @@
+"""
+file: encoder.py
+date: 17-10-2026
+description: This module provides a process-wide sentence encoder for plot descriptions. The SentenceTransformer
+model is loaded lazily once per process, recent encodings are kept in a bounded LRU cache, and requests that
+arrive within a few milliseconds of each other are encoded together in a single batch.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+ENCODER_MODEL = os.environ.get("ENCODER_MODEL", "all-MiniLM-L6-v2")
+ENCODER_CACHE_SIZE = int(os.environ.get("ENCODER_CACHE_SIZE", "1024"))
+ENCODER_BATCH_WINDOW_MS = float(os.environ.get("ENCODER_BATCH_WINDOW_MS", "5"))
+ENCODER_MAX_BATCH_SIZE = int(os.environ.get("ENCODER_MAX_BATCH_SIZE", "64"))
+
+
+def normalise_text(text):
+    """
+    Normalise a description for use as a cache key. all-MiniLM-L6-v2 lower-cases its input,
+    so case and whitespace differences do not change the embedding.
+
+    Args:
+        text (str): The description.
+
+    Returns:
+        str: The lower-cased description with collapsed whitespace.
+    """
+    return " ".join(str(text).split()).lower()
+
+
+class SharedEncoder:
+    """
+    A lazily loaded SentenceTransformer with an LRU cache and micro-batching of concurrent requests.
+    """
+
+    def __init__(self, model_name=ENCODER_MODEL, cache_size=ENCODER_CACHE_SIZE,
+                 batch_window_ms=ENCODER_BATCH_WINDOW_MS, max_batch_size=ENCODER_MAX_BATCH_SIZE):
+        """
+        Initialize the encoder without loading the model.
+
+        Args:
+            model_name (str, optional): The SentenceTransformer model name. Defaults to ENCODER_MODEL.
+            cache_size (int, optional): The maximum number of cached encodings. Defaults to ENCODER_CACHE_SIZE.
+            batch_window_ms (float, optional): How long to wait for more requests before encoding a batch.
+                Defaults to ENCODER_BATCH_WINDOW_MS.
+            max_batch_size (int, optional): Encode immediately once this many texts are waiting.
+                Defaults to ENCODER_MAX_BATCH_SIZE.
+        """
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._flush_handle = None
+        self._tasks = set()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @property
+    def model(self):
+        """
+        Get the SentenceTransformer model, loading it on first use.
+
+        Returns:
+            SentenceTransformer: The loaded model.
+        """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    import torch
+
+                    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+                    logging.info(f"Loading SentenceTransformer '{self.model_name}' on {device}")
+                    self._model = SentenceTransformer(self.model_name, device=device)
+        return self._model
+
+    def _remember(self, key, vector):
+        self._cache[key] = vector
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def encode(self, text):
+        """
+        Encode a description, sharing the work with identical or concurrent requests.
+
+        Args:
+            text (str): The description to encode.
+
+        Returns:
+            np.ndarray: The description embedding.
+        """
+        key = normalise_text(text)
+        vector = self._cache.get(key)
+        if vector is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return vector
+
+        future = self._pending.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        # Shield the shared future, so one cancelled request does not fail the others waiting on it
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        """
+        Hand the waiting texts over to a background batch encode.
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._encode_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _encode_sync(self, texts):
+        return self.model.encode(texts)
+
+    async def _encode_batch(self, batch):
+        texts = list(batch)
+        try:
+            # Load the model and encode in a worker thread so the event loop keeps serving other requests
+            vectors = await asyncio.get_running_loop().run_in_executor(None, self._encode_sync, texts)
+        except Exception as e:
+            logging.error(f"Encoding a batch of {len(texts)} descriptions failed: {e}")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        logging.info(f"Encoded a batch of {len(texts)} descriptions")
+        for text, vector in zip(texts, vectors):
+            self._remember(text, vector)
+            future = batch[text]
+            if not future.done():
+                future.set_result(vector)
+
+    def stats(self):
+        """
+        Get the cache statistics of the encoder.
+
+        Returns:
+            dict: The cache size, hits, misses and requests that joined an identical pending encode.
+        """
+        return {"model": self.model_name, "loaded": self._model is not None, "cached": len(self._cache),
+                "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+
+encoder = SharedEncoder()
@@ -0,0 +1,191 @@
+"""
+file: health.py
+date: 17-10-2026
+description: This module tracks the liveness of the SPARQL endpoint. A circuit breaker is fed by the outcome of
+every real query and by a periodic background probe, so requests no longer check the connection before each query
+and fail fast while GraphDB is down.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+HEALTH_PROBE_INTERVAL = float(os.environ.get("HEALTH_PROBE_INTERVAL", "30"))
+HEALTH_FAILURE_THRESHOLD = int(os.environ.get("HEALTH_FAILURE_THRESHOLD", "3"))
+HEALTH_RESET_TIMEOUT = float(os.environ.get("HEALTH_RESET_TIMEOUT", "15"))
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when a query is rejected because the SPARQL endpoint is known to be unavailable.
+    """
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker over the SPARQL endpoint.
+
+    The circuit is closed while queries succeed. After failure_threshold consecutive connection failures it opens
+    and queries are rejected immediately. Once reset_timeout seconds have passed it is half-open: the next query
+    (or probe) is let through as the single trial, closing the circuit on success and opening it again on failure.
+    Other queries are rejected while the trial is in flight, or until reset_timeout seconds have passed if it never
+    reports back.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold=HEALTH_FAILURE_THRESHOLD, reset_timeout=HEALTH_RESET_TIMEOUT):
+        """
+        Initialize a closed circuit breaker.
+
+        Args:
+            failure_threshold (int, optional): Consecutive failures that open the circuit.
+                Defaults to HEALTH_FAILURE_THRESHOLD.
+            reset_timeout (float, optional): Seconds before an open circuit lets a trial query through.
+                Defaults to HEALTH_RESET_TIMEOUT.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started_at = None
+        self.last_success = None
+        self.last_failure = None
+        self.last_error = None
+
+    @property
+    def state(self):
+        """
+        Get the current state of the circuit.
+
+        Returns:
+            str: One of CLOSED, OPEN or HALF_OPEN.
+        """
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def allow_request(self):
+        """
+        Check if a query may be sent to the endpoint.
+
+        Returns:
+            bool: False while the circuit is open or a half-open trial query is in flight, True otherwise.
+        """
+        state = self.state
+        if state == self.OPEN:
+            return False
+        if state == self.HALF_OPEN:
+            now = time.monotonic()
+            if self.trial_started_at is not None and now - self.trial_started_at < self.reset_timeout:
+                return False
+            self.trial_started_at = now
+        return True
+
+    def record_success(self):
+        """
+        Record a successful query, closing the circuit.
+        """
+        if self._state != self.CLOSED:
+            logging.info("SPARQL endpoint is reachable again, closing the circuit")
+        self._state = self.CLOSED
+        self.failures = 0
+        self.trial_started_at = None
+        self.last_success = time.time()
+
+    def record_failure(self, error=None):
+        """
+        Record a failed query, opening the circuit when the failure threshold is reached.
+
+        Args:
+            error (Exception, optional): The error of the failed query. Defaults to None.
+        """
+        self.failures += 1
+        self.last_failure = time.time()
+        self.last_error = str(error) if error is not None else None
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                logging.error(f"SPARQL endpoint failed {self.failures} times, opening the circuit: {error}")
+            self._state = self.OPEN
+            self.opened_at = time.monotonic()
+        self.trial_started_at = None
+
+    def describe(self):
+        """
+        Get the state of the circuit breaker.
+
+        Returns:
+            dict: The state, the number of consecutive failures and the time of the last success and failure.
+        """
+        return {"state": self.state, "failures": self.failures, "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout, "last_success": self.last_success,
+                "last_failure": self.last_failure, "last_error": self.last_error}
+
+
+class HealthMonitor:
+    """
+    A background task that probes the SPARQL endpoint of a MovieDatabase at a fixed interval.
+    """
+
+    def __init__(self, database, interval=HEALTH_PROBE_INTERVAL):
+        """
+        Initialize the monitor without starting it.
+
+        Args:
+            database (MovieDatabase): The database whose endpoint and circuit breaker are monitored.
+            interval (float, optional): Seconds between probes. Defaults to HEALTH_PROBE_INTERVAL.
+        """
+        self.database = database
+        self.interval = interval
+        self._task = None
+
+    async def probe(self):
+        """
+        Probe the endpoint once and feed the outcome into the circuit breaker. A failed probe replaces
+        the connection pool, so the next query does not reuse broken connections.
+
+        Returns:
+            bool: True if the endpoint answered, False otherwise.
+        """
+        breaker = self.database.breaker
+        if await self.database.is_connected():
+            breaker.record_success()
+            return True
+
+        breaker.record_failure(f"Health probe of {self.database.sparql.endpoint} failed")
+        await self.database.reconnect()
+        return False
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Health probe failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """
+        Start probing in the background of the running event loop.
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logging.info(f"Health monitor started, probing every {self.interval} seconds")
+
+    async def stop(self):
+        """
+        Stop probing.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,250 @@
+"""
+file: label_index.py
+date: 17-10-2026
+description: This module keeps the English labels of one object type (films, actors, genres, ...) in memory for the
+autocomplete endpoints. A sorted array of lower-cased labels answers prefix queries with a binary search, a sorted
+array of word suffixes answers word-prefix queries, and a trigram index answers substring queries, so a lookup no
+longer scans the labels in GraphDB.
+"""
+
+import bisect
+import logging
+import os
+import time
+import numpy as np
+
+LABEL_INDEX_MAX_RESULTS = int(os.environ.get("LABEL_INDEX_MAX_RESULTS", "500"))
+NGRAM_SIZE = 3
+# Characters after which a word of a label starts
+WORD_SEPARATORS = " -(:"
+
+
+def ngrams(text, n=NGRAM_SIZE):
+    """
+    Get the distinct character n-grams of a text.
+
+    Args:
+        text (str): The text.
+        n (int, optional): The n-gram length. Defaults to NGRAM_SIZE.
+
+    Returns:
+        set: The n-grams of the text.
+    """
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def rank_matches(entries, title, max_results=LABEL_INDEX_MAX_RESULTS):
+    """
+    Rank labels containing a title in the order of LabelIndex.search, without building an index: exact matches and
+    labels starting with the title, then labels with a word starting with it, then the other labels containing it.
+
+    Args:
+        entries (list): Dictionaries containing object URIs and labels.
+        title (str): The text to search for.
+        max_results (int, optional): The maximum number of labels to return. Defaults to LABEL_INDEX_MAX_RESULTS.
+
+    Returns:
+        list: The matching dictionaries.
+    """
+    key = title.lower()
+    groups = ([], [], [])
+    for entry in entries:
+        label = entry["label"].lower()
+        if label.startswith(key):
+            groups[0].append((label, entry))
+        elif any(label[position - 1] in WORD_SEPARATORS and label[position] != " " and label.startswith(key, position)
+                 for position in range(1, len(label))):
+            groups[1].append((label, entry))
+        elif key in label:
+            groups[2].append((label, entry))
+    ranked = [entry for group in groups for _, entry in sorted(group, key=lambda pair: pair[0])]
+    return ranked[:max_results]
+
+
+class LabelIndex:
+    """
+    An in-memory index of the labels of one object type with ranked prefix and substring search.
+    """
+
+    def __init__(self, object_type):
+        """
+        Initialize an empty index.
+
+        Args:
+            object_type (str): The object type whose labels are indexed (e.g., "Film", "Actor").
+        """
+        self.object_type = object_type
+        self.entries = []
+        self.keys = []
+        self.sorted_keys = []
+        self.sorted_rows = np.zeros(0, dtype=np.int32)
+        self.rank = np.zeros(0, dtype=np.int32)
+        self.word_keys = []
+        self.word_rows = np.zeros(0, dtype=np.int32)
+        self.postings = {}
+        self.built_at = None
+        self.build_seconds = None
+
+    def build(self, bindings):
+        """
+        Build the index from SPARQL result bindings with ?object and ?label. Labels are capitalized and
+        de-duplicated, keeping the first object URI of each label in label order.
+
+        Args:
+            bindings (list): The SPARQL result bindings.
+        """
+        start = time.perf_counter()
+        pairs = sorted((result["label"]["value"], result["object"]["value"]) for result in bindings)
+        unique_data = {}
+        for label, object_uri in pairs:
+            label_cap = label.capitalize()
+            if label_cap not in unique_data:
+                unique_data[label_cap] = {"object_uri": object_uri, "label": label_cap}
+
+        entries = list(unique_data.values())
+        keys = [entry["label"].lower() for entry in entries]
+
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        rank = np.empty(len(keys), dtype=np.int32)
+        rank[order] = np.arange(len(keys), dtype=np.int32)
+
+        # Every suffix that starts a word after the first one, so "godfather" finds "The Godfather"
+        words = []
+        for row, key in enumerate(keys):
+            for position in range(1, len(key)):
+                if key[position - 1] in WORD_SEPARATORS and key[position] != " ":
+                    words.append((key[position:], row))
+        words.sort()
+
+        postings = {}
+        for row, key in enumerate(keys):
+            for gram in ngrams(key):
+                postings.setdefault(gram, []).append(row)
+
+        self.entries = entries
+        self.keys = keys
+        self.sorted_keys = [keys[row] for row in order]
+        self.sorted_rows = np.asarray(order, dtype=np.int32)
+        self.rank = rank
+        self.word_keys = [word for word, _ in words]
+        self.word_rows = np.fromiter((row for _, row in words), dtype=np.int32, count=len(words))
+        self.postings = {gram: np.asarray(rows, dtype=np.int32) for gram, rows in postings.items()}
+        self.built_at = time.time()
+        self.build_seconds = time.perf_counter() - start
+        logging.info(f"Label index for {self.object_type} built with {len(entries)} labels "
+                     f"in {self.build_seconds:.2f} seconds")
+
+    @staticmethod
+    def _prefix_range(sorted_keys, prefix):
+        low = bisect.bisect_left(sorted_keys, prefix)
+        high = bisect.bisect_left(sorted_keys, prefix + "\uffff", low)
+        return low, high
+
+    def _substring_rows(self, key, limit, skip):
+        """
+        Find rows whose label contains the key, in label order, skipping the rows in skip.
+        """
+        if len(key) < NGRAM_SIZE:
+            # Too short for the trigram index: scan the labels in sorted order and stop once enough are found
+            rows = []
+            for position, candidate in enumerate(self.sorted_keys):
+                if key in candidate:
+                    row = int(self.sorted_rows[position])
+                    if row not in skip:
+                        rows.append(row)
+                        if len(rows) >= limit:
+                            break
+            return rows
+
+        lists = []
+        for gram in ngrams(key):
+            posting = self.postings.get(gram)
+            if posting is None:
+                return []
+            lists.append(posting)
+        lists.sort(key=len)
+        candidates = lists[0]
+        for posting in lists[1:]:
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+            if len(candidates) == 0:
+                return []
+
+        # The trigrams may occur apart from each other, so verify the candidates
+        candidates = candidates[np.argsort(self.rank[candidates], kind="stable")]
+        rows = []
+        for row in candidates.tolist():
+            if row not in skip and key in self.keys[row]:
+                rows.append(row)
+                if len(rows) >= limit:
+                    break
+        return rows
+
+    def search(self, title=None, max_results=LABEL_INDEX_MAX_RESULTS):
+        """
+        Find the labels containing a title, case-insensitively. Exact matches come first, then labels starting
+        with the title, then labels with a word starting with the title, then any other labels containing it.
+        Within each group the labels are in alphabetical order.
+
+        Args:
+            title (str, optional): The text to search for. Defaults to None (all labels in label order).
+            max_results (int, optional): The maximum number of labels to return. Defaults to LABEL_INDEX_MAX_RESULTS.
+
+        Returns:
+            list: A list of dictionaries containing object URIs and labels.
+        """
+        if not title:
+            return self.entries[:max_results]
+
+        key = title.lower()
+        rows = []
+        seen = set()
+
+        low, high = self._prefix_range(self.sorted_keys, key)
+        for row in self.sorted_rows[low:min(high, low + max_results)].tolist():
+            rows.append(row)
+            seen.add(row)
+
+        if len(rows) < max_results:
+            low, high = self._prefix_range(self.word_keys, key)
+            # word_keys is ordered by suffix, so put the whole group back in label order before truncating it
+            word_rows = np.unique(self.word_rows[low:high])
+            word_rows = word_rows[np.argsort(self.rank[word_rows], kind="stable")]
+            for row in word_rows.tolist():
+                if row not in seen:
+                    rows.append(row)
+                    seen.add(row)
+                    if len(rows) >= max_results:
+                        break
+
+        if len(rows) < max_results:
+            rows.extend(self._substring_rows(key, max_results - len(rows), seen))
+
+        return [self.entries[row] for row in rows]
+
+    def page(self, title=None, limit=LABEL_INDEX_MAX_RESULTS, offset=0):
+        """
+        Get one page of the labels containing a title, in the order of search().
+
+        Args:
+            title (str, optional): The text to search for. Defaults to None (all labels in label order).
+            limit (int, optional): The maximum number of labels on the page. Defaults to LABEL_INDEX_MAX_RESULTS.
+            offset (int, optional): The number of labels before the page. Defaults to 0.
+
+        Returns:
+            tuple: The labels on the page and the total number of labels, capped at LABEL_INDEX_MAX_RESULTS
+                for a search.
+        """
+        if not title:
+            return self.entries[offset:offset + limit], len(self.entries)
+        matches = self.search(title)
+        return matches[offset:offset + limit], len(matches)
+
+    def describe(self):
+        """
+        Get the size and age of the index.
+
+        Returns:
+            dict: The object type, the number of labels, word suffixes and trigrams, and the build time.
+        """
+        return {"object_type": self.object_type, "labels": len(self.entries), "word_suffixes": len(self.word_keys),
+                "ngrams": len(self.postings), "built_at": self.built_at, "build_seconds": self.build_seconds}
@@ -0,0 +1,110 @@
+"""
+file: precompute_similar.py
+date: 17-10-2026
+description: This module precomputes the top-K most similar films of every film into the table served by
+MovieDatabase (SIMILARITY_TABLE_FILE). It exports the similarity attributes from the running GraphDB repository,
+loads the plot embeddings and scores the films in chunks of targets across worker processes. Run it from the
+RestService directory after importing new data, e.g. `python precompute_similar.py --k 50`, then call
+/similarity_index/refresh.
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+import numpy as np
+from db_crud import MovieDatabase
+from similarity import SimilarityTable, SIMILARITY_TABLE_FILE, SIMILARITY_TABLE_K, SIMILARITY_WEIGHTS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+# The scorer shared with the worker processes, which inherit it when they are forked
+_scorer = None
+
+
+def _score_chunk(task):
+    """
+    Compute the neighbours of one chunk of target films in a worker process.
+    """
+    start, stop, k, weights = task
+    return (start, *_scorer.top_k_table(np.arange(start, stop), k, weights))
+
+
+def precompute(scorer, k, weights, processes, chunk_size):
+    """
+    Compute the top-k neighbours of all films of a scorer.
+
+    Args:
+        scorer (HybridScorer): The loaded scorer.
+        k (int): The number of neighbours per film.
+        weights (dict): The weight per attribute.
+        processes (int): The number of worker processes.
+        chunk_size (int): The number of target films scored per matrix product.
+
+    Returns:
+        tuple: The int32 neighbour ids, float16 total scores, float32 attribute scores and cosine similarities of
+            all films, and the float32 attribute score of every film with itself.
+    """
+    global _scorer
+    _scorer = scorer
+    n_movies = len(scorer.uris)
+    k = min(k, n_movies)
+    neighbour_ids = np.full((n_movies, k), -1, dtype=np.int32)
+    scores = np.zeros((n_movies, k), dtype=np.float16)
+    similarity_scores = np.zeros((n_movies, k), dtype=np.float32)
+    cosine = np.zeros((n_movies, k), dtype=np.float32)
+    self_scores = np.zeros(n_movies, dtype=np.float32)
+    tasks = [(start, min(start + chunk_size, n_movies), k, weights) for start in range(0, n_movies, chunk_size)]
+
+    # Fork, so the workers share the matrices of the scorer instead of receiving a pickled copy
+    with multiprocessing.get_context("fork").Pool(processes) as pool:
+        for done, (start, chunk_ids, chunk_scores, chunk_similarity_scores, chunk_cosine, chunk_self_scores) in \
+                enumerate(pool.imap_unordered(_score_chunk, tasks), 1):
+            stop = start + len(chunk_ids)
+            neighbour_ids[start:stop] = chunk_ids
+            scores[start:stop] = chunk_scores
+            similarity_scores[start:stop] = chunk_similarity_scores
+            cosine[start:stop] = chunk_cosine
+            self_scores[start:stop] = chunk_self_scores
+            if done % 50 == 0 or done == len(tasks):
+                logging.info(f"Scored {done} of {len(tasks)} chunks")
+    return neighbour_ids, scores, similarity_scores, cosine, self_scores
+
+
+async def load_scorer():
+    """
+    Load the plot embeddings and the similarity attributes of all films.
+
+    Returns:
+        HybridScorer: The loaded scorer.
+    """
+    db = MovieDatabase()
+    try:
+        await db.load_plot_embeddings()
+        await db.load_similarity_scorer()
+    finally:
+        await db.close()
+    return db.similarity
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the most similar films of every film")
+    parser.add_argument("--k", type=int, default=SIMILARITY_TABLE_K, help="Neighbours per film")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--chunk-size", type=int, default=128, help="Target films per matrix product")
+    parser.add_argument("--output", default=SIMILARITY_TABLE_FILE, help="Path of the .npz table")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    scorer = asyncio.run(load_scorer())
+    table = precompute(scorer, args.k, SIMILARITY_WEIGHTS, args.processes, args.chunk_size)
+    neighbour_ids = table[0]
+    SimilarityTable().save(args.output, scorer.uris, scorer.titles, *table, SIMILARITY_WEIGHTS)
+    logging.info(f"Wrote the {neighbour_ids.shape[1]} nearest films of {len(scorer.uris)} films to {args.output} "
+                 f"in {time.perf_counter() - start:.1f} seconds")
+
+
+if __name__ == "__main__":
+    main()
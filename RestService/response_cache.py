@@ -0,0 +1,453 @@
+"""
+file: response_cache.py
+date: 17-10-2026
+description: This module provides the response cache of the REST service. Cache keys are built from the endpoint name
+and a hash of its canonicalised parameters, so equivalent requests share one entry. Values are stored in Redis as
+orjson bytes with a time-to-live per endpoint, and hits and misses are counted per endpoint. A bounded in-process LRU
+tier in front of Redis keeps the hottest responses of each worker decoded in memory; it is invalidated over Redis
+pub/sub when the cache is cleared.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+import orjson
+import redis
+
+CACHE_PREFIX = os.environ.get("CACHE_PREFIX", "kade")
+CACHE_DEFAULT_TTL = int(os.environ.get("CACHE_DEFAULT_TTL", "300"))
+LOCAL_CACHE_MAX_BYTES = int(os.environ.get("LOCAL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Lookup results and the details of a movie only change when new data is imported (after which /clear_cache is
+# called), movies_details are searches
+DEFAULT_CACHE_TTLS = {
+    "movies": 3600, "genres": 3600, "actors": 3600, "directors": 3600, "distributors": 3600, "writers": 3600,
+    "producers": 3600, "composers": 3600, "cinematographers": 3600, "production_companies": 3600,
+    "countries": 3600, "movies_details": 300, "movie_details": 3600,
+}
+
+
+def parse_ttls(spec):
+    """
+    Parse per-endpoint time-to-live overrides of the form "movies_details=600,genres=86400".
+
+    Args:
+        spec (str): The comma-separated endpoint=seconds pairs.
+
+    Returns:
+        dict: The time-to-live in seconds per endpoint.
+    """
+    ttls = {}
+    for pair in filter(None, (part.strip() for part in spec.split(","))):
+        endpoint, _, seconds = pair.partition("=")
+        ttls[endpoint.strip()] = int(seconds)
+    return ttls
+
+
+CACHE_TTLS = {**DEFAULT_CACHE_TTLS, **parse_ttls(os.environ.get("CACHE_TTLS", ""))}
+
+
+def canonicalise(params, ordered=()):
+    """
+    Canonicalise request parameters, so equivalent requests produce the same cache key. Empty parameters are
+    dropped and lists are sorted, except for the parameters in ordered whose order changes the result. Strings
+    are kept as they are, since every character of a name ends up in a CONTAINS filter.
+
+    Args:
+        params (dict): The request parameters.
+        ordered (tuple, optional): The names of list parameters whose order matters. Defaults to ().
+
+    Returns:
+        dict: The canonical parameters.
+    """
+    canonical = {}
+    for name, value in params.items():
+        if value is None or value is False or value == "" or value == []:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = list(value)
+            if name not in ordered:
+                value = sorted(set(value), key=str)
+        canonical[name] = value
+    return canonical
+
+
+class LocalCache:
+    """
+    A bounded in-process LRU cache with a time-to-live per entry and a size limit in (serialised) bytes.
+    Values are shared between requests and must not be modified.
+    """
+
+    def __init__(self, max_bytes=LOCAL_CACHE_MAX_BYTES):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_bytes (int, optional): The maximum total size of the cached values. Defaults to LOCAL_CACHE_MAX_BYTES.
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """
+        Get a cached value, dropping it if it has expired.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            The cached value, or None if the key is not cached.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, size = entry
+        if expires_at <= time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, size, ttl):
+        """
+        Cache a value, evicting the least recently used values when the size limit is exceeded.
+        Values larger than the whole cache are not cached.
+
+        Args:
+            key (str): The cache key.
+            value: The value.
+            size (int): The size of the serialised value in bytes.
+            ttl (int): The time-to-live in seconds.
+        """
+        if key in self._entries:
+            self._drop(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key):
+        _, _, size = self._entries.pop(key)
+        self.bytes -= size
+
+    def clear(self, prefix=""):
+        """
+        Drop all cached values whose key starts with a prefix.
+
+        Args:
+            prefix (str, optional): The key prefix. Defaults to "" (all values).
+        """
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            self._drop(key)
+
+    def stats(self):
+        """
+        Get the size of the cache.
+
+        Returns:
+            dict: The number of entries, their size in bytes, the size limit and the number of evictions.
+        """
+        return {"entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "evictions": self.evictions}
+
+
+class ResponseCache:
+    """
+    A Redis-backed cache of endpoint responses with canonical keys, per-endpoint TTLs and hit/miss counters.
+    """
+
+    def __init__(self, prefix=CACHE_PREFIX, ttls=None, default_ttl=CACHE_DEFAULT_TTL):
+        """
+        Initialize the cache.
+
+        Args:
+            prefix (str, optional): The prefix of all cache keys. Defaults to CACHE_PREFIX.
+            ttls (dict, optional): The time-to-live in seconds per endpoint. Defaults to CACHE_TTLS.
+            default_ttl (int, optional): The time-to-live of endpoints without their own. Defaults to CACHE_DEFAULT_TTL.
+        """
+        self.prefix = prefix
+        self.ttls = CACHE_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.counters = {}
+        self.local = LocalCache()
+        self._inflight = {}
+        self.invalidation_channel = f"{prefix}:invalidate"
+
+    def ttl(self, endpoint):
+        """
+        Get the time-to-live of an endpoint.
+
+        Args:
+            endpoint (str): The endpoint name.
+
+        Returns:
+            int: The time-to-live in seconds.
+        """
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def key(self, endpoint, params, ordered=()):
+        """
+        Build the cache key of a request.
+
+        Args:
+            endpoint (str): The endpoint name.
+            params (dict): The request parameters.
+            ordered (tuple, optional): The names of list parameters whose order matters. Defaults to ().
+
+        Returns:
+            str: The key "<prefix>:<endpoint>:<sha1 of the canonical parameters>".
+        """
+        canonical = orjson.dumps(canonicalise(params, ordered), option=orjson.OPT_SORT_KEYS)
+        return f"{self.prefix}:{endpoint}:{hashlib.sha1(canonical).hexdigest()}"
+
+    def _count(self, endpoint, event, amount=1):
+        counter = self.counters.setdefault(endpoint, {"local_hits": 0, "hits": 0, "misses": 0, "coalesced": 0,
+                                                      "errors": 0, "stored_bytes": 0})
+        counter[event] += amount
+
+    async def get_or_load(self, redis_client, endpoint, params, loader, ordered=()):
+        """
+        Get a response from the in-process cache or Redis, or load it and store it in both for the time-to-live
+        of the endpoint. When Redis is unavailable the response is only cached in-process. Concurrent requests
+        for the same key share one Redis read and at most one load.
+
+        Args:
+            redis_client (redis.asyncio.Redis): The Redis client.
+            endpoint (str): The endpoint name.
+            params (dict): The request parameters.
+            loader (callable): An async function without arguments that loads the response.
+            ordered (tuple, optional): The names of list parameters whose order matters. Defaults to ().
+
+        Returns:
+            The cached or loaded response.
+        """
+        key = self.key(endpoint, params, ordered)
+        value = self.local.get(key)
+        if value is not None:
+            self._count(endpoint, "local_hits")
+            return value
+
+        # Single-flight: concurrent requests for the same key wait for the first one instead of querying again
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(redis_client, endpoint, key, loader))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self._count(endpoint, "coalesced")
+        # Shield the shared load, so one cancelled request does not fail the others waiting on it
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def _load(self, redis_client, endpoint, key, loader):
+        """
+        Get a response from Redis, or load it and store it in both cache tiers.
+        """
+        try:
+            cached_answer = await redis_client.get(key)
+        except redis.RedisError as e:
+            logging.error(f"Reading {key} from the cache failed: {e}")
+            self._count(endpoint, "errors")
+            cached_answer = None
+        if cached_answer is not None:
+            self._count(endpoint, "hits")
+            value = orjson.loads(cached_answer)
+            self.local.set(key, value, len(cached_answer), self.ttl(endpoint))
+            return value
+
+        self._count(endpoint, "misses")
+        value = await loader()
+        data = orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)
+        self.local.set(key, value, len(data), self.ttl(endpoint))
+        try:
+            await redis_client.set(key, data, ex=self.ttl(endpoint))
+            self._count(endpoint, "stored_bytes", len(data))
+        except redis.RedisError as e:
+            logging.error(f"Writing {key} to the cache failed: {e}")
+            self._count(endpoint, "errors")
+        return value
+
+    async def get_many(self, redis_client, endpoint, keys):
+        """
+        Get several cached values of an endpoint with a single MGET round-trip.
+
+        Args:
+            redis_client (redis.asyncio.Redis): The Redis client.
+            endpoint (str): The endpoint name.
+            keys (list): The cache keys.
+
+        Returns:
+            dict: The decoded value per cached key; keys that are not cached are left out.
+        """
+        values = {}
+        for key in keys:
+            value = self.local.get(key)
+            if value is not None:
+                values[key] = value
+        self._count(endpoint, "local_hits", len(values))
+        keys = [key for key in keys if key not in values]
+        if not keys:
+            return values
+
+        try:
+            cached_answers = await redis_client.mget(keys)
+        except redis.RedisError as e:
+            logging.error(f"Reading {len(keys)} {endpoint} keys from the cache failed: {e}")
+            self._count(endpoint, "errors")
+            cached_answers = [None] * len(keys)
+
+        ttl = self.ttl(endpoint)
+        hits = 0
+        for key, data in zip(keys, cached_answers):
+            if data is not None:
+                values[key] = orjson.loads(data)
+                self.local.set(key, values[key], len(data), ttl)
+                hits += 1
+        self._count(endpoint, "hits", hits)
+        self._count(endpoint, "misses", len(keys) - hits)
+        return values
+
+    async def set_many(self, redis_client, endpoint, values):
+        """
+        Store several values of an endpoint in one pipelined round-trip.
+
+        Args:
+            redis_client (redis.asyncio.Redis): The Redis client.
+            endpoint (str): The endpoint name.
+            values (dict): The value per cache key.
+        """
+        if not values:
+            return
+        ttl = self.ttl(endpoint)
+        stored_bytes = 0
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for key, value in values.items():
+                    data = orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)
+                    self.local.set(key, value, len(data), ttl)
+                    stored_bytes += len(data)
+                    pipe.set(key, data, ex=ttl)
+                await pipe.execute()
+            self._count(endpoint, "stored_bytes", stored_bytes)
+        except redis.RedisError as e:
+            logging.error(f"Writing {len(values)} {endpoint} keys to the cache failed: {e}")
+            self._count(endpoint, "errors")
+
+    async def get_or_load_many(self, redis_client, endpoint, ids, loader, params=None):
+        """
+        Get the cached values of several entities, each under its own key, and load and store only the
+        missing ones.
+
+        Args:
+            redis_client (redis.asyncio.Redis): The Redis client.
+            endpoint (str): The endpoint name.
+            ids (list): The entity identifiers.
+            loader (callable): An async function that takes the missing identifiers and returns a dictionary of
+                the value per identifier; identifiers it leaves out are not cached.
+            params (dict, optional): Parameters shared by all keys, e.g. the selected fields. Defaults to None.
+
+        Returns:
+            dict: The value per identifier that is cached or was loaded.
+        """
+        keys = {entity_id: self.key(endpoint, dict(params or {}, id=entity_id)) for entity_id in ids}
+        cached = await self.get_many(redis_client, endpoint, list(keys.values()))
+        values = {entity_id: cached[key] for entity_id, key in keys.items() if key in cached}
+
+        missing = [entity_id for entity_id in keys if entity_id not in values]
+        if missing:
+            loaded = await loader(missing)
+            await self.set_many(redis_client, endpoint, {keys[entity_id]: value for entity_id, value in loaded.items()
+                                                         if entity_id in keys})
+            values.update(loaded)
+        return values
+
+    async def invalidate(self, redis_client, prefix=""):
+        """
+        Drop cached values from the in-process cache of every worker, by publishing the key prefix on the
+        invalidation channel. The values in Redis itself are not touched.
+
+        Args:
+            redis_client (redis.asyncio.Redis): The Redis client.
+            prefix (str, optional): The key prefix, e.g. "kade:genres:". Defaults to "" (all values).
+        """
+        self.local.clear(prefix)
+        try:
+            await redis_client.publish(self.invalidation_channel, prefix)
+        except redis.RedisError as e:
+            logging.error(f"Publishing the cache invalidation of '{prefix}' failed: {e}")
+
+    async def evict(self, redis_client, endpoints):
+        """
+        Drop the cached responses of endpoints from Redis and from the in-process cache of every worker, e.g. after
+        the index they are answered from was rebuilt.
+
+        Args:
+            redis_client (redis.asyncio.Redis): The Redis client.
+            endpoints (list): The endpoint names.
+        """
+        for endpoint in endpoints:
+            prefix = f"{self.prefix}:{endpoint}:"
+            try:
+                keys = [key async for key in redis_client.scan_iter(match=f"{prefix}*", count=1000)]
+                for start in range(0, len(keys), 1000):
+                    await redis_client.unlink(*keys[start:start + 1000])
+            except redis.RedisError as e:
+                logging.error(f"Evicting the cached {endpoint} responses failed: {e}")
+                self._count(endpoint, "errors")
+            await self.invalidate(redis_client, prefix)
+
+    async def listen_for_invalidations(self, redis_client, retry_seconds=5):
+        """
+        Clear the in-process cache whenever any worker publishes an invalidation. Runs until cancelled,
+        and clears the whole in-process cache after reconnecting, as invalidations may have been missed.
+
+        Args:
+            redis_client (redis.asyncio.Redis): The Redis client.
+            retry_seconds (float, optional): Seconds to wait before resubscribing after an error. Defaults to 5.
+        """
+        while True:
+            try:
+                async with redis_client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.invalidation_channel)
+                    self.local.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            prefix = message["data"].decode() if isinstance(message["data"], bytes) else message["data"]
+                            self.local.clear(prefix)
+                            logging.info(f"Invalidated the in-process cache of '{prefix or '*'}'")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Listening for cache invalidations failed, retrying in {retry_seconds} seconds: {e}")
+                await asyncio.sleep(retry_seconds)
+
+    def stats(self):
+        """
+        Get the hit and miss counters of this worker per endpoint and the size of its in-process cache.
+
+        Returns:
+            dict: Per endpoint the in-process and Redis hits, misses, requests coalesced with an identical
+                request in flight, Redis errors, hit ratio, bytes written and time-to-live, and the in-process
+                cache statistics under "local".
+        """
+        endpoints = {}
+        for endpoint, counter in sorted(self.counters.items()):
+            hits = counter["local_hits"] + counter["hits"]
+            lookups = hits + counter["misses"]
+            endpoints[endpoint] = {**counter, "hit_ratio": round(hits / lookups, 4) if lookups else None,
+                                   "ttl": self.ttl(endpoint)}
+        return {"endpoints": endpoints, "local": self.local.stats()}
+
+
+response_cache = ResponseCache()
@@ -5,21 +5,36 @@ Description: rest api service for movie app
 """
 
 from fastapi import FastAPI, HTTPException, Query, Depends
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from typing import Optional, List
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
-from fastapi_cache.decorator import cache
 from urllib.parse import unquote
+from pydantic import BaseModel, Field
 import redis
-import pickle
-from redis.asyncio import Redis  # Async Redis client
+from redis.asyncio import Redis, BlockingConnectionPool  # Async Redis client
 from contextlib import asynccontextmanager
+import asyncio
 import logging
-from SPARQLWrapper import SPARQLWrapper, JSON
-from db_crud import MovieDatabase
+import os
+import uuid
+import orjson
+from db_crud import MovieDatabase, DETAIL_LARGE_PROPERTIES, select_detail_fields
+from health import HealthMonitor, CircuitBreaker, CircuitOpenError
+from response_cache import response_cache
+from similarity import parse_weights
+from sparql_templates import query_templates, IRI_PATTERN
+from cache_warmup import CacheWarmup, WARMUP_ON_START
+from encoder import encoder
 
 movieDatabase = MovieDatabase()
 
+# Page size of the lookup endpoints (/movies, /actors, /genres, ...) when no limit is given, and the largest allowed
+LOOKUP_PAGE_SIZE = int(os.environ.get("LOOKUP_PAGE_SIZE", "1000"))
+LOOKUP_MAX_PAGE_SIZE = int(os.environ.get("LOOKUP_MAX_PAGE_SIZE", "5000"))
+STREAM_CHUNK_ROWS = int(os.environ.get("STREAM_CHUNK_ROWS", "1000"))
+# Largest number of movie URIs accepted by /movies/batch
+MOVIES_BATCH_MAX_URIS = int(os.environ.get("MOVIES_BATCH_MAX_URIS", "10000"))
+healthMonitor = HealthMonitor(movieDatabase)
+
 DO_LOGS = True
 if DO_LOGS:
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -32,14 +47,198 @@ def write_log(message, type="info"):
         else:
             logger.info(message)
 
+# One pooled async Redis client per worker; requests wait up to REDIS_POOL_TIMEOUT seconds for a free connection
+REDIS_HOST = os.environ.get("REDIS_HOST", "redis-cache")
+REDIS_PORT = int(os.environ.get("REDIS_PORT", "6379"))
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_POOL_TIMEOUT = float(os.environ.get("REDIS_POOL_TIMEOUT", "5"))
+redis_client = Redis(connection_pool=BlockingConnectionPool(host=REDIS_HOST, port=REDIS_PORT,
+                                                            max_connections=REDIS_MAX_CONNECTIONS,
+                                                            timeout=REDIS_POOL_TIMEOUT))
+
 def get_redis_cache():
-    return redis.Redis(
-        host='redis-cache',
-        port='6379',
-    )
+    return redis_client
+
+def operation_error(e):
+    """
+    Get the HTTP error of a failed operation: 503 while the circuit breaker rejects queries to GraphDB, 500 otherwise.
+    """
+    status_code = 503 if isinstance(e, CircuitOpenError) else 500
+    return HTTPException(status_code=status_code, detail=f"The following error occurred during the operation: {str(e)}")
+
+# Cache endpoint of the lookups of each label index
+LOOKUP_ENDPOINTS = {
+    "Film": "movies", "Genre": "genres", "Actor": "actors", "Director": "directors", "Distributor": "distributors",
+    "Writer": "writers", "Producer": "producers", "Composer": "composers", "Cinematographer": "cinematographers",
+    "productionCompany": "production_companies", "Country": "countries",
+}
+# Index refreshes are broadcast to the other workers over this channel; a worker skips its own messages
+REFRESH_CHANNEL = f"{response_cache.prefix}:refresh"
+WORKER_ID = uuid.uuid4().hex
+
+async def get_movies_details_by_uri(redis_client, movie_uris, fields):
+    """
+    Get the details of movies from the per-movie cache, fetching only the movies that are not cached.
+    Cached rows hold all default details (or all details when a large one is requested) and are projected
+    on the requested fields, so searches with different fields share them.
+    """
+    default_fields = select_detail_fields()
+    cached_fields = default_fields if set(fields) <= set(default_fields) else select_detail_fields(exclude=())
+
+    async def load_movies(missing_uris):
+        rows = await movieDatabase.fetch_movies_details([{"object_uri": movie_uri} for movie_uri in missing_uris],
+                                                        fields=cached_fields)
+        return {row["movie"]: row for row in rows}
+
+    rows = await response_cache.get_or_load_many(redis_client, "movie_details", movie_uris, load_movies,
+                                                 {"fields": list(cached_fields)})
+    return [{field: value for field, value in rows[movie_uri].items() if field in ("movie", "title") or field in fields}
+            for movie_uri in movie_uris if movie_uri in rows]
+
+
+async def stream_lookup(object_type, name, limit, offset):
+    """
+    Stream a lookup as newline-delimited JSON from the cursor on, so the first objects are sent while the
+    remaining ones are still being read from the label index or GraphDB. Objects are encoded in chunks of
+    STREAM_CHUNK_ROWS lines and the results are not cached.
+    """
+    rows = movieDatabase.stream_objects_by_title(object_type, name, offset)
+    # Read the first object before the response starts, so a failing query still returns an error status
+    first = await anext(rows, None)
+    total = movieDatabase.count_objects_by_title(object_type, name)
+
+    async def encode():
+        try:
+            if first is None:
+                return
+            chunk = [orjson.dumps(first)]
+            sent = 1
+            async for row in rows:
+                if limit is not None and sent >= limit:
+                    break
+                chunk.append(orjson.dumps(row))
+                sent += 1
+                if len(chunk) >= STREAM_CHUNK_ROWS:
+                    yield b"\n".join(chunk) + b"\n"
+                    chunk = []
+            if chunk:
+                yield b"\n".join(chunk) + b"\n"
+        except Exception as e:
+            # The status is already sent, the client sees a truncated stream
+            write_log(f"Streaming {object_type} lookup failed: {e}", "error")
+            raise
+        finally:
+            await rows.aclose()
+
+    headers = {}
+    if total is not None:
+        headers["X-Total-Count"] = str(total)
+    return StreamingResponse(encode(), media_type="application/x-ndjson", headers=headers)
+
+
+async def get_lookup_page(endpoint, object_type, name, limit, cursor, redis_client, response_format="json"):
+    """
+    Get one page of a lookup endpoint, with the X-Total-Count header and, when more
+    results follow, the X-Next-Cursor header to pass as cursor for the next page.
+    With response_format "ndjson" the results from the cursor on are streamed instead,
+    up to limit objects if given.
+    """
+    try:
+        offset = int(cursor) if cursor else 0
+        if offset < 0:
+            raise ValueError(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+
+    if response_format == "ndjson":
+        return await stream_lookup(object_type, name, limit, offset)
+    if limit is None:
+        limit = LOOKUP_PAGE_SIZE
+
+    async def load_page():
+        return await movieDatabase.fetch_objects_page(object_type, name, limit, offset)
+
+    params = {"name": name, "limit": limit, "offset": offset}
+    page, total = await response_cache.get_or_load(redis_client, endpoint, params, load_page)
+
+    headers = {"X-Total-Count": str(total)}
+    if offset + len(page) < total:
+        headers["X-Next-Cursor"] = str(offset + len(page))
+    return ORJSONResponse(page, headers=headers)
+
+
+async def load_similarity_scorer():
+    try:
+        loaded = await movieDatabase.load_similarity_table()
+        write_log(f"Loaded the precomputed similar movies of {loaded} films", "info")
+    except Exception as e:
+        write_log(f"Failed to load the similar-movies table: {e}", "error")
+    try:
+        loaded = await movieDatabase.load_similarity_scorer()
+        write_log(f"Loaded the similarity attributes of {loaded} films into memory", "info")
+    except Exception as e:
+        write_log(f"Failed to load the similarity scorer: {e}", "error")
+
 
-redis_client = Redis(host="redis-cache", port=6379)
-FastAPICache.init(RedisBackend(redis_client), prefix="fastapi-cache")
+async def refresh_label_indexes(object_types=None):
+    """
+    Rebuild the label indexes of this worker and drop the cached lookups answered from them.
+    """
+    loaded = await movieDatabase.load_label_indexes(object_types)
+    endpoints = [LOOKUP_ENDPOINTS[object_type] for object_type in loaded if object_type in LOOKUP_ENDPOINTS]
+    await response_cache.evict(redis_client, endpoints)
+    return loaded
+
+
+async def refresh_similarity_index():
+    """
+    Rebuild the similarity scorer and reload the similar-movies table of this worker, and drop the cached
+    movie details and similar-movie searches.
+    """
+    loaded = {"scorer": await movieDatabase.load_similarity_scorer(),
+              "table": await movieDatabase.load_similarity_table()}
+    await response_cache.evict(redis_client, ["movies_details", "movie_details"])
+    return loaded
+
+
+REFRESHES = {"label_index": refresh_label_indexes, "similarity_index": refresh_similarity_index}
+
+
+async def broadcast_refresh(index, **params):
+    """
+    Ask the other workers to refresh an index, see listen_for_refreshes.
+    """
+    message = orjson.dumps({"index": index, "params": params, "worker": WORKER_ID})
+    try:
+        await redis_client.publish(REFRESH_CHANNEL, message)
+    except redis.RedisError as e:
+        write_log(f"Publishing the refresh of {index} failed: {e}", "error")
+
+
+async def listen_for_refreshes(retry_seconds=5):
+    """
+    Refresh an index whenever another worker publishes a refresh of it. Runs until cancelled.
+    """
+    while True:
+        try:
+            async with redis_client.pubsub() as pubsub:
+                await pubsub.subscribe(REFRESH_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        request = orjson.loads(message["data"])
+                        if request["worker"] == WORKER_ID:
+                            continue
+                        write_log(f"Refreshing {request['index']} on request of another worker", "info")
+                        await REFRESHES[request["index"]](**request["params"])
+                    except Exception as e:
+                        write_log(f"Refreshing on request of another worker failed: {e}", "error")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            write_log(f"Listening for index refreshes failed, retrying in {retry_seconds} seconds: {e}", "error")
+            await asyncio.sleep(retry_seconds)
 
 
 @asynccontextmanager
@@ -47,48 +246,68 @@ async def lifespan(app: FastAPI):
     print("Lifespan context manager invoked.", flush=True)
     # Startup actions
     write_log("Starting up the application...", "info")
-    # FastAPICache.init(RedisBackend(redis_client), prefix="fastapi-cache")
     # movieDatabase = MovieDatabase()
+    try:
+        loaded = await movieDatabase.load_plot_embeddings()
+        write_log(f"Loaded {loaded} plot embeddings into memory", "info")
+    except Exception as e:
+        # The matrix is loaded lazily on the first similarity query instead
+        write_log(f"Failed to preload plot embeddings: {e}", "error")
+    # Name filters use the full-text index when the repository was created with it
+    await movieDatabase.detect_full_text_search()
+    healthMonitor.start()
+    # Lookups are answered from GraphDB until the label indexes are built
+    label_index_task = asyncio.create_task(movieDatabase.load_label_indexes())
+    # Similar movies are scored by GraphDB until the in-memory scorer is built
+    similarity_task = asyncio.create_task(load_similarity_scorer())
+    invalidation_task = asyncio.create_task(response_cache.listen_for_invalidations(redis_client))
+    refresh_task = asyncio.create_task(listen_for_refreshes())
+    warmup_task = None
+    if WARMUP_ON_START:
+        # Warm the lookups once they are answered from the label indexes
+        warmup_task = asyncio.create_task(cacheWarmup.run_on_start(redis_client, response_cache.prefix,
+                                                                   wait_for=label_index_task))
     yield
     # Shutdown actions
     write_log("Shutting down the application...", "info")
-
-
-app = FastAPI(lifespan=lifespan, title="Knowledge and Data Engineer assignment FastAPI Service")
+    if warmup_task is not None:
+        warmup_task.cancel()
+    label_index_task.cancel()
+    similarity_task.cancel()
+    invalidation_task.cancel()
+    refresh_task.cancel()
+    await healthMonitor.stop()
+    await movieDatabase.close()
+    await redis_client.aclose()
+
+
+# Responses are encoded with orjson; the large endpoints return an ORJSONResponse themselves to also skip jsonable_encoder
+app = FastAPI(lifespan=lifespan, title="Knowledge and Data Engineer assignment FastAPI Service",
+              default_response_class=ORJSONResponse)
+cacheWarmup = CacheWarmup(app, movieDatabase)
 
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
 
 @app.get('/movies')
-@cache(expire=300)
-async def get_movies_titles(title: Optional[str] = Query(None, alias="movieLabel"), 
-                            redis_client: cache = Depends(get_redis_cache)):
+async def get_movies_titles(title: Optional[str] = Query(None, alias="movieLabel"),
+                            limit: Optional[int] = Query(None, ge=1, le=LOOKUP_MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                            response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+                            redis_client: Redis = Depends(get_redis_cache)):
     try:
-        write_log(f"Getting movies with provided filters", "info")        
-        params = {
-            "title": title
-        }
-        filtered_params = {k: v for k, v in params.items() if v}
-        
-        # Generate a cache key based on the filtered parameters
-        var_name = "movies" + "_".join(f"{k}_{'_'.join(v) if isinstance(v, list) else v}" for k, v in filtered_params.items())
-        if (cached_answer := redis_client.get(var_name)) is not None:
-            write_log(f"Found movie query in cache")
-            return pickle.loads(cached_answer)
-
-        results = await movieDatabase.fetch_movies_by_name(title=title)
-        
-        redis_client.set(var_name, pickle.dumps(results))
-        write_log(f"Written movie query into cache")
+        write_log(f"Getting movies with provided filters", "info")
+        results = await get_lookup_page("movies", "Film", title, limit, cursor, redis_client,
+                                        response_format)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error executing query: {e}")
-        raise HTTPException(status_code=500, detail=f"The following error occurred during the operation: {str(e)}")
+        raise operation_error(e)
 
     return results
 
 @app.get('/movies_details')
-@cache(expire=300)
 async def get_movies_details(title: Optional[List[str]] = Query(None, alias="movieLabel"),
                             movie_uri: Optional[List[str]] = Query(None, alias="movieUri"),
                             genre: Optional[List[str]] = Query(None, alias="genres"),
@@ -105,13 +324,26 @@ async def get_movies_details(title: Optional[List[str]] = Query(None, alias="mov
                             cinematographer: Optional[List[str]] = Query(None, alias="cinematographer"),
                             production_company: Optional[List[str]] = Query(None, alias="productionCompany"),
                             get_similar_movies: Optional[bool] = Query(False, alias="getSimilarMovies"),
-                            redis_client: cache = Depends(get_redis_cache)):
+                            include_embedding: bool = Query(False, alias="includeEmbedding"),
+                            fields: Optional[List[str]] = Query(None),
+                            similarity_weights: Optional[str] = Query(None, alias="similarityWeights"),
+                            redis_client: Redis = Depends(get_redis_cache)):
+    # Only the requested details are queried; without fields all details except the large ones are returned
+    try:
+        detail_fields = select_detail_fields(fields, () if include_embedding else DETAIL_LARGE_PROPERTIES)
+        # e.g. "genre=10,actor=6", the attributes not given keep their default weight
+        weights = parse_weights(similarity_weights) if similarity_weights else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    invalid = [uri for uri in movie_uri or [] if not IRI_PATTERN.match(unquote(uri))]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid movie URIs: {', '.join(invalid[:10])}")
+
     try:
         write_log(f"Getting movies details with provided filters", "info")
 
         if number_of_results is None:  # set default number of results to 10 if not provided
             number_of_results = 10
-        movies_details = []
         params = {
             # "movie": movie,
             "title": title,
@@ -131,14 +363,7 @@ async def get_movies_details(title: Optional[List[str]] = Query(None, alias="mov
             "production_company": production_company,
             "get_similar_movies": get_similar_movies
         }
-        filtered_params = {k: v for k, v in params.items() if v}
-        
-        # Generate a cache key based on the filtered parameters
-        var_name = "movies_details_" + "_".join(f"{k}_{'_'.join(v) if isinstance(v, list) else v}" for k, v in filtered_params.items())
-        if (cached_answer := redis_client.get(var_name)) is not None:
-            write_log(f"Found movie query in cache")
-            return pickle.loads(cached_answer)
-        
+
         # Decode relevant parameters
         decoded_params = {}
         for k, v in params.items():
@@ -149,22 +374,26 @@ async def get_movies_details(title: Optional[List[str]] = Query(None, alias="mov
             else:
                 decoded_params[k] = v
 
-        
-        if title: # get similar movies
-            write_log(f"Getting similar movies for {title} calling fetch_similar_movies", "info")
-            movies = await movieDatabase.fetch_similar_movies(decoded_params)
-        else: # get movies with provided filters
-            write_log(f"Getting movies with provided filters, calling fetch_movies_by_properties", "info")
-            movies = await movieDatabase.fetch_movies_by_properties(**decoded_params)
-
-        if movies:
-            movies_details = await movieDatabase.fetch_movies_details(movies)
-            
-            if movies_details and title and get_similar_movies:
-                # Copy similarity_score from movies to movies_details if it exists
-                for movie_detail in movies_details:
-                    for movie in movies:
-                        if movie_detail['movie'] == movie['object_uri']:
+        async def load_movies_details():
+            movies_details = []
+            if title: # get similar movies
+                write_log(f"Getting similar movies for {title} calling fetch_similar_movies", "info")
+                movies = await movieDatabase.fetch_similar_movies(decoded_params, weights)
+            else: # get movies with provided filters
+                write_log(f"Getting movies with provided filters, calling fetch_movies_by_properties", "info")
+                movies = await movieDatabase.fetch_movies_by_properties(**decoded_params)
+
+            if movies:
+                # Hydrate the results from the per-movie cache, querying GraphDB only for the missing movies
+                movie_uris = list(dict.fromkeys(movie['object_uri'] for movie in movies))
+                movies_details = await get_movies_details_by_uri(redis_client, movie_uris, detail_fields)
+
+                if movies_details and title and get_similar_movies:
+                    # Copy similarity_score from movies to movies_details if it exists
+                    movies_by_uri = {movie['object_uri']: movie for movie in movies}
+                    for movie_detail in movies_details:
+                        movie = movies_by_uri.get(movie_detail['movie'])
+                        if movie is not None:
                             if 'similarity_score' in movie:
                                 movie_detail['similarity_score'] = movie['similarity_score']
                             if 'cosine_similarity' in movie:
@@ -173,217 +402,301 @@ async def get_movies_details(title: Optional[List[str]] = Query(None, alias="mov
                                 movie_detail['cosine_similarity_scaled'] = movie['cosine_similarity_scaled']
                             if 'total_similarity_score' in movie:
                                 movie_detail['total_similarity_score'] = movie['total_similarity_score']
-        
-        
-        redis_client.set(var_name, pickle.dumps(movies_details))
-        write_log(f"Written movie query into cache")
+            return movies_details
+
+        # Only the first title and movie URI are used, so their order is part of the key
+        cache_params = dict(decoded_params, fields=list(detail_fields), weights=weights)
+        movies_details = await response_cache.get_or_load(redis_client, "movies_details", cache_params,
+                                                          load_movies_details, ordered=("title", "movie_uri"))
+    except Exception as e:
+        print(f"Error executing query: {e}")
+        raise operation_error(e)
+
+    return ORJSONResponse(movies_details)
+
+class MovieBatchRequest(BaseModel):
+    movie_uris: List[str] = Field(alias="movieUris", min_length=1, max_length=MOVIES_BATCH_MAX_URIS)
+    fields: Optional[List[str]] = None
+    include_embedding: bool = Field(False, alias="includeEmbedding")
+
+
+@app.post('/movies/batch')
+async def get_movies_batch(request: MovieBatchRequest, redis_client: Redis = Depends(get_redis_cache)):
+    try:
+        detail_fields = select_detail_fields(request.fields,
+                                             () if request.include_embedding else DETAIL_LARGE_PROPERTIES)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    invalid = [movie_uri for movie_uri in request.movie_uris if not IRI_PATTERN.match(movie_uri)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid movie URIs: {', '.join(invalid[:10])}")
+
+    try:
+        movie_uris = list(dict.fromkeys(request.movie_uris))
+        write_log(f"Getting details of {len(movie_uris)} movies by URI", "info")
+        movies_details = await get_movies_details_by_uri(redis_client, movie_uris, detail_fields)
     except Exception as e:
         print(f"Error executing query: {e}")
-        raise HTTPException(status_code=500, detail=f"The following error occurred during the operation: {str(e)}")
+        raise operation_error(e)
 
-    return movies_details
+    return ORJSONResponse(movies_details)
 
 @app.get('/genres')
-@cache(expire=300)
-async def get_genres_by_name(name: Optional[str] = Query(None, alias="genreName"), redis_client: cache = Depends(get_redis_cache)):
+async def get_genres_by_name(name: Optional[str] = Query(None, alias="genreName"),
+                             limit: Optional[int] = Query(None, ge=1, le=LOOKUP_MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                             response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+                             redis_client: Redis = Depends(get_redis_cache)):
     try:
         write_log(f"Getting genres with name {name}", "info")
-        var_name = f"genre_{name}"
-        if (cached_answer := redis_client.get(var_name)) is not None:
-            write_log(f"Found genre query in cache")
-            return pickle.loads(cached_answer)
-
-        results = await movieDatabase.fetch_genres_by_name(name)
-        redis_client.set(var_name, pickle.dumps(results))
-        write_log(f"Written genre query into cache")
+        results = await get_lookup_page("genres", "Genre", name, limit, cursor, redis_client,
+                                        response_format)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error executing query: {e}")
-        raise HTTPException(status_code=500, detail=f"The following error occurred during the operation: {str(e)}")
+        raise operation_error(e)
 
     return results
 
 @app.get('/actors')
-@cache(expire=300)
-async def get_actors_by_name(name: Optional[str] = Query(None, alias="actorName"), redis_client: cache = Depends(get_redis_cache)):
+async def get_actors_by_name(name: Optional[str] = Query(None, alias="actorName"),
+                             limit: Optional[int] = Query(None, ge=1, le=LOOKUP_MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                             response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+                             redis_client: Redis = Depends(get_redis_cache)):
     try:
         write_log(f"Getting actors with name {name}", "info")
-        var_name = f"actor_{name}"
-        if (cached_answer := redis_client.get(var_name)) is not None:
-            write_log(f"Found actor query in cache")
-            return pickle.loads(cached_answer)
-
-        results = await movieDatabase.fetch_actors_by_name(name)
-        redis_client.set(var_name, pickle.dumps(results))
-        write_log(f"Written actor query into cache")
+        results = await get_lookup_page("actors", "Actor", name, limit, cursor, redis_client,
+                                        response_format)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error executing query: {e}")
-        raise HTTPException(status_code=500, detail=f"The following error occurred during the operation: {str(e)}")
+        raise operation_error(e)
 
     return results
 
 @app.get('/directors')
-@cache(expire=300)
-async def get_directors_by_name(name: Optional[str] = Query(None, alias="directorName"), redis_client: cache = Depends(get_redis_cache)):
+async def get_directors_by_name(name: Optional[str] = Query(None, alias="directorName"),
+                                limit: Optional[int] = Query(None, ge=1, le=LOOKUP_MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                                response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+                                redis_client: Redis = Depends(get_redis_cache)):
     try:
         write_log(f"Getting directors with name {name}", "info")
-        var_name = f"director_{name}"
-        if (cached_answer := redis_client.get(var_name)) is not None:
-            write_log(f"Found director query in cache")
-            return pickle.loads(cached_answer)
-
-        results = await movieDatabase.fetch_directors_by_name(name)
-        redis_client.set(var_name, pickle.dumps(results))
-        write_log(f"Written director query into cache")
+        results = await get_lookup_page("directors", "Director", name, limit, cursor, redis_client,
+                                        response_format)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error executing query: {e}")
-        raise HTTPException(status_code=500, detail=f"The following error occurred during the operation: {str(e)}")
+        raise operation_error(e)
 
     return results
 
 @app.get('/distributors')
-@cache(expire=300)
-async def get_distributors_by_name(name: Optional[str] = Query(None, alias="distributorName"), redis_client: cache = Depends(get_redis_cache)):
+async def get_distributors_by_name(name: Optional[str] = Query(None, alias="distributorName"),
+                                   limit: Optional[int] = Query(None, ge=1, le=LOOKUP_MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                                   response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+                                   redis_client: Redis = Depends(get_redis_cache)):
     try:
         write_log(f"Getting distributors with name {name}", "info")
-        var_name = f"distributor_{name}"
-        if (cached_answer := redis_client.get(var_name)) is not None:
-            write_log(f"Found distributor query in cache")
-            return pickle.loads(cached_answer)
-
-        results = await movieDatabase.fetch_distributors_by_name(name)
-        redis_client.set(var_name, pickle.dumps(results))
-        write_log(f"Written distributor query into cache")
+        results = await get_lookup_page("distributors", "Distributor", name, limit, cursor, redis_client,
+                                        response_format)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error executing query: {e}")
-        raise HTTPException(status_code=500, detail=f"The following error occurred during the operation: {str(e)}")
+        raise operation_error(e)
 
     return results
 
 @app.get('/writers')
-@cache(expire=300)
-async def get_writers_by_name(name: Optional[str] = Query(None, alias="writerName"), redis_client: cache = Depends(get_redis_cache)):
+async def get_writers_by_name(name: Optional[str] = Query(None, alias="writerName"),
+                              limit: Optional[int] = Query(None, ge=1, le=LOOKUP_MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                              response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+                              redis_client: Redis = Depends(get_redis_cache)):
     try:
         write_log(f"Getting writers with name {name}", "info")
-        var_name = f"writer_{name}"
-        if (cached_answer := redis_client.get(var_name)) is not None:
-            write_log(f"Found writer query in cache")
-            return pickle.loads(cached_answer)
-
-        results = await movieDatabase.fetch_writers_by_name(name)
-        redis_client.set(var_name, pickle.dumps(results))
-        write_log(f"Written writer query into cache")
+        results = await get_lookup_page("writers", "Writer", name, limit, cursor, redis_client,
+                                        response_format)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error executing query: {e}")
-        raise HTTPException(status_code=500, detail=f"The following error occurred during the operation: {str(e)}")
+        raise operation_error(e)
 
     return results
 
 @app.get('/producers')
-@cache(expire=300)
-async def get_producers_by_name(name: Optional[str] = Query(None, alias="producerName"), redis_client: cache = Depends(get_redis_cache)):
+async def get_producers_by_name(name: Optional[str] = Query(None, alias="producerName"),
+                                limit: Optional[int] = Query(None, ge=1, le=LOOKUP_MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                                response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+                                redis_client: Redis = Depends(get_redis_cache)):
     try:
         write_log(f"Getting producers with name {name}", "info")
-        var_name = f"producer_{name}"
-        if (cached_answer := redis_client.get(var_name)) is not None:
-            write_log(f"Found producer query in cache")
-            return pickle.loads(cached_answer)
-
-        results = await movieDatabase.fetch_producers_by_name(name)
-        redis_client.set(var_name, pickle.dumps(results))
-        write_log(f"Written producer query into cache")
+        results = await get_lookup_page("producers", "Producer", name, limit, cursor, redis_client,
+                                        response_format)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error executing query: {e}")
-        raise HTTPException(status_code=500, detail=f"The following error occurred during the operation: {str(e)}")
+        raise operation_error(e)
 
     return results
 
 @app.get('/composers')
-@cache(expire=300)
-async def get_composers_by_name(name: Optional[str] = Query(None, alias="composerName"), redis_client: cache = Depends(get_redis_cache)):
+async def get_composers_by_name(name: Optional[str] = Query(None, alias="composerName"),
+                                limit: Optional[int] = Query(None, ge=1, le=LOOKUP_MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                                response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+                                redis_client: Redis = Depends(get_redis_cache)):
     try:
         write_log(f"Getting composers with name {name}", "info")
-        var_name = f"composer_{name}"
-        if (cached_answer := redis_client.get(var_name)) is not None:
-            write_log(f"Found composer query in cache")
-            return pickle.loads(cached_answer)
-
-        results = await movieDatabase.fetch_composers_by_name(name)
-        redis_client.set(var_name, pickle.dumps(results))
-        write_log(f"Written composer query into cache")
+        results = await get_lookup_page("composers", "Composer", name, limit, cursor, redis_client,
+                                        response_format)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error executing query: {e}")
-        raise HTTPException(status_code=500, detail=f"The following error occurred during the operation: {str(e)}")
+        raise operation_error(e)
 
     return results
 
 @app.get('/cinematographers')
-@cache(expire=300)
-async def get_cinematographers_by_name(name: Optional[str] = Query(None, alias="cinematographerName"), redis_client: cache = Depends(get_redis_cache)):
+async def get_cinematographers_by_name(name: Optional[str] = Query(None, alias="cinematographerName"),
+                                       limit: Optional[int] = Query(None, ge=1, le=LOOKUP_MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                                       response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+                                       redis_client: Redis = Depends(get_redis_cache)):
     try:
         write_log(f"Getting cinematographers with name {name}", "info")
-        var_name = f"cinematographer_{name}"
-        if (cached_answer := redis_client.get(var_name)) is not None:
-            write_log(f"Found cinematographer query in cache")
-            return pickle.loads(cached_answer)
-
-        results = await movieDatabase.fetch_cinematographers_by_name(name)
-        redis_client.set(var_name, pickle.dumps(results))
-        write_log(f"Written cinematographer query into cache")
+        results = await get_lookup_page("cinematographers", "Cinematographer", name, limit, cursor, redis_client,
+                                        response_format)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error executing query: {e}")
-        raise HTTPException(status_code=500, detail=f"The following error occurred during the operation: {str(e)}")
+        raise operation_error(e)
 
     return results
 
 @app.get('/production_companies')
-@cache(expire=300)
-async def get_production_companies_by_name(name: Optional[str] = Query(None, alias="productionCompanyName"), redis_client: cache = Depends(get_redis_cache)):
+async def get_production_companies_by_name(name: Optional[str] = Query(None, alias="productionCompanyName"),
+                                           limit: Optional[int] = Query(None, ge=1, le=LOOKUP_MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                                           response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+                                           redis_client: Redis = Depends(get_redis_cache)):
     try:
         write_log(f"Getting production companies with name {name}", "info")
-        var_name = f"production_company_{name}"
-        if (cached_answer := redis_client.get(var_name)) is not None:
-            write_log(f"Found production company query in cache")
-            return pickle.loads(cached_answer)
-
-        results = await movieDatabase.fetch_productionCompanies_by_name(name)
-        redis_client.set(var_name, pickle.dumps(results))
-        write_log(f"Written production company query into cache")
+        results = await get_lookup_page("production_companies", "productionCompany", name, limit, cursor, redis_client,
+                                        response_format)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error executing query: {e}")
-        raise HTTPException(status_code=500, detail=f"The following error occurred during the operation: {str(e)}")
+        raise operation_error(e)
 
     return results
 
 @app.get('/countries')
-@cache(expire=300)
-async def get_countries_by_name(name: Optional[str] = Query(None, alias="country"), redis_client: cache = Depends(get_redis_cache)):
+async def get_countries_by_name(name: Optional[str] = Query(None, alias="country"),
+                                limit: Optional[int] = Query(None, ge=1, le=LOOKUP_MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                                response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+                                redis_client: Redis = Depends(get_redis_cache)):
     try:
         write_log(f"Getting countries with name {name}", "info")
-        var_name = f"country_{name}"
-        if (cached_answer := redis_client.get(var_name)) is not None:
-            write_log(f"Found country_ query in cache")
-            return pickle.loads(cached_answer)
-
-        results = await movieDatabase.fetch_countries_by_name(name)
-        redis_client.set(var_name, pickle.dumps(results))
-        write_log(f"Written country_ query into cache")
+        results = await get_lookup_page("countries", "Country", name, limit, cursor, redis_client,
+                                        response_format)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error executing query: {e}")
-        raise HTTPException(status_code=500, detail=f"The following error occurred during the operation: {str(e)}")
+        raise operation_error(e)
 
     return results
 
 @app.get('/clear_cache')
-async def clear_cache(redis_client: cache = Depends(get_redis_cache)):
+async def clear_cache(redis_client: Redis = Depends(get_redis_cache)):
     try:
-        redis_client.flushall()
+        await redis_client.flushall()
+        await response_cache.invalidate(redis_client)
         write_log("Cleared all cache", "info")
         return {"message": "Cache cleared successfully"}
     except Exception as e:
         print(f"Error clearing cache: {e}")
-        raise HTTPException(status_code=500, detail=f"The following error occurred during the operation: {str(e)}")
+        raise operation_error(e)
+
+
+@app.get('/warmup')
+async def warmup():
+    try:
+        write_log("Warming the caches", "info")
+        return await cacheWarmup.run()
+    except Exception as e:
+        print(f"Error warming the caches: {e}")
+        raise operation_error(e)
+
+@app.get('/cache_stats')
+async def get_cache_stats(redis_client: Redis = Depends(get_redis_cache)):
+    stats = {"worker": os.getpid(), **response_cache.stats(), "encoder": encoder.stats(),
+             "warmup": cacheWarmup.last_report}
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            info, keys = await pipe.info().dbsize().execute()
+        stats["redis"] = {key: info.get(key) for key in ("used_memory", "used_memory_human", "maxmemory",
+                                                          "keyspace_hits", "keyspace_misses", "evicted_keys",
+                                                          "expired_keys")}
+        stats["redis"]["keys"] = keys
+    except redis.RedisError as e:
+        write_log(f"Reading Redis statistics failed: {e}", "error")
+    return stats
+
+@app.get('/query_stats')
+async def get_query_stats():
+    # Execution counts and times per prepared SPARQL query, over all query shapes, of this worker
+    return {"worker": os.getpid(), "full_text_search": movieDatabase.full_text_search,
+            "queries": query_templates.stats()}
+
+@app.get('/label_index')
+async def get_label_index():
+    return [index.describe() for index in movieDatabase.label_indexes.values()]
+
+@app.get('/label_index/refresh')
+async def refresh_label_index(object_type: Optional[List[str]] = Query(None, alias="objectType")):
+    try:
+        write_log(f"Refreshing label indexes {object_type or 'of all object types'}", "info")
+        await broadcast_refresh("label_index", object_types=object_type)
+        return await refresh_label_indexes(object_type)
+    except Exception as e:
+        print(f"Error refreshing label indexes: {e}")
+        raise operation_error(e)
+
+
+@app.get('/similarity_index')
+async def get_similarity_index():
+    return {"scorer": movieDatabase.similarity.describe(), "table": movieDatabase.similarity_table.describe()}
+
+@app.get('/similarity_index/refresh')
+async def refresh_similarity():
+    try:
+        write_log("Refreshing the similarity scorer and the similar-movies table", "info")
+        await broadcast_refresh("similarity_index")
+        return await refresh_similarity_index()
+    except Exception as e:
+        print(f"Error refreshing the similarity scorer: {e}")
+        raise operation_error(e)
+
+
+@app.get('/ann_index')
+async def get_ann_index():
+    if movieDatabase.ann_index is None:
+        raise HTTPException(status_code=404, detail="The plot embedding index is not loaded")
+    return movieDatabase.ann_index.describe()
 
 
 @app.get('/ping')
 async def ping():
-    return {"message": "I am alive :)"}
\ No newline at end of file
+    return {"message": "I am alive :)"}
+
+@app.get('/health')
+async def health():
+    status = movieDatabase.breaker.describe()
+    if status["state"] == CircuitBreaker.OPEN:
+        raise HTTPException(status_code=503, detail=status)
+    return status
\ No newline at end of file
@@ -0,0 +1,611 @@
+"""
+file: similarity.py
+date: 17-10-2026
+description: This module scores similar movies in memory. The genres, actors, directors, countries and release year
+of all films are kept as sparse one-hot matrices next to the plot embedding matrix, so the hybrid score of every film
+against a target film (weighted shared attributes plus scaled cosine similarity of the plots) is computed in one
+vectorised pass instead of a GROUP BY over OPTIONAL joins in GraphDB and a pandas pipeline. The columns of the matrices
+double as inverted indexes (attribute value -> sorted film ids), so the candidates of a target film are the union of
+the posting lists of its attribute values and only films sharing something with it are scored. The top-K neighbours of
+every film can be precomputed offline (precompute_similar.py) into a compact table that is served in O(1).
+"""
+
+import json
+import logging
+import math
+import os
+import time
+import numpy as np
+from scipy import sparse
+from label_index import ngrams
+
+# Attributes shared with the target film and the score each one adds; the same weights the SPARQL query used
+DEFAULT_SIMILARITY_WEIGHTS = {"genre": 10, "actor": 6, "director": 5, "country": 4, "releaseYear": 3}
+# Predicates of the attributes, exported once per film
+SIMILARITY_FEATURES = {
+    "genre": "dbo:genre",
+    "actor": "dbo:starring",
+    "director": "dbo:director",
+    "country": "dbo:country",
+    "releaseYear": "dbo:releaseYear",
+}
+
+# The shared attribute that earns each weight. As in the original GraphDB query, the releaseYear weight is earned by a
+# shared country, not a shared release year; the release years only serve the year filters
+SIMILARITY_WEIGHT_FEATURES = {
+    "genre": "genre",
+    "actor": "actor",
+    "director": "director",
+    "country": "country",
+    "releaseYear": "country",
+}
+
+
+def parse_weights(spec):
+    """
+    Parse similarity weights of the form "genre=10,actor=6".
+
+    Args:
+        spec (str): The comma-separated attribute=weight pairs.
+
+    Returns:
+        dict: The weight per attribute.
+
+    Raises:
+        ValueError: If an attribute is unknown or a weight is not a finite, non-negative number.
+    """
+    weights = {}
+    for pair in filter(None, (part.strip() for part in spec.split(","))):
+        feature, _, weight = pair.partition("=")
+        feature = feature.strip()
+        if feature not in SIMILARITY_FEATURES:
+            raise ValueError(f"Unknown similarity attribute: {feature}")
+        weights[feature] = float(weight)
+        if not math.isfinite(weights[feature]) or weights[feature] < 0:
+            raise ValueError(f"Invalid weight of {feature}: {weight.strip()}")
+    return weights
+
+
+SIMILARITY_WEIGHTS = {**DEFAULT_SIMILARITY_WEIGHTS, **parse_weights(os.environ.get("SIMILARITY_WEIGHTS", ""))}
+# The precomputed neighbours table and the number of neighbours per film it holds
+SIMILARITY_TABLE_FILE = os.environ.get("SIMILARITY_TABLE_FILE",
+                                       os.path.join(os.path.dirname(os.path.abspath(__file__)), "indexes",
+                                                    "similar_movies.npz"))
+SIMILARITY_TABLE_K = int(os.environ.get("SIMILARITY_TABLE_K", "50"))
+# The attributes searches can filter on, and the number of filter values whose matching films are kept per scorer
+SIMILARITY_FILTER_FEATURES = ("genre", "actor", "director")
+SIMILARITY_FILTER_CACHE_SIZE = int(os.environ.get("SIMILARITY_FILTER_CACHE_SIZE", "1024"))
+
+
+def parse_year(value):
+    """
+    Get the year of an xsd:gYear or xsd:date literal.
+
+    Returns:
+        int: The year, or 0 if the literal does not start with one.
+    """
+    value = value.strip()
+    return int(value[:4]) if value[:4].isdigit() else 0
+
+
+class HybridScorer:
+    """
+    Sparse one-hot attribute matrices of all films with a vectorised hybrid similarity score.
+    """
+
+    def __init__(self, embeddings):
+        """
+        Initialize an empty scorer.
+
+        Args:
+            embeddings (PlotEmbeddingMatrix): The plot embeddings, which may be loaded later.
+        """
+        self.embeddings = embeddings
+        self.uris = []
+        self.titles = []
+        self.uri_to_id = {}
+        self.features = {}
+        self.postings = {}
+        self.filter_labels = {}
+        self.filter_ngrams = {}
+        self._filter_matches = {}
+        self.years = np.zeros(0, dtype=np.int16)
+        self.built_at = None
+        self.build_seconds = None
+        self._embedding_rows = None
+        self._embedding_matrix = None
+
+    @property
+    def is_loaded(self):
+        """
+        Check if the scorer holds any films.
+
+        Returns:
+            bool: True if at least one film is loaded, False otherwise.
+        """
+        return len(self.uris) > 0
+
+    def build(self, rows):
+        """
+        Build the matrices from exported (movie URI, property, value, label) rows, where the property is "title"
+        or one of SIMILARITY_FEATURES and the label is the English label of the value, if any.
+
+        Args:
+            rows (list): The exported rows.
+        """
+        start = time.perf_counter()
+        uri_to_id = {}
+        titles = {}
+        attribute_ids = {feature: {} for feature in SIMILARITY_FEATURES}
+        attribute_labels = {feature: [] for feature in SIMILARITY_FEATURES}
+        pairs = {feature: ([], []) for feature in SIMILARITY_FEATURES}
+        years = {}
+
+        for movie_uri, prop, value, label in rows:
+            movie_id = uri_to_id.setdefault(movie_uri, len(uri_to_id))
+            if prop == "title":
+                titles.setdefault(movie_id, value)
+                continue
+            if prop not in attribute_ids:
+                continue
+            if prop == "releaseYear":
+                # Films of the same year share the attribute, whatever the form of the literal
+                year = parse_year(value)
+                if not year:
+                    continue
+                years.setdefault(movie_id, year)
+                value = label = str(year)
+            ids = attribute_ids[prop]
+            if value not in ids:
+                ids[value] = len(ids)
+                attribute_labels[prop].append((label or "").lower())
+            pairs[prop][0].append(movie_id)
+            pairs[prop][1].append(ids[value])
+
+        n_movies = len(uri_to_id)
+        features = {}
+        for feature, (movie_ids, value_ids) in pairs.items():
+            matrix = sparse.csr_matrix((np.ones(len(movie_ids), dtype=np.float32),
+                                        (np.asarray(movie_ids, dtype=np.int32), np.asarray(value_ids, dtype=np.int32))),
+                                       shape=(n_movies, len(attribute_ids[feature])))
+            matrix.sum_duplicates()
+            matrix.data[:] = 1.0
+            features[feature] = matrix
+
+        year_array = np.zeros(n_movies, dtype=np.int16)
+        for movie_id, year in years.items():
+            year_array[movie_id] = year
+
+        self.uris = list(uri_to_id)
+        self.titles = [titles.get(movie_id, "") for movie_id in range(n_movies)]
+        self.uri_to_id = uri_to_id
+        self.features = features
+        # The columns of the one-hot matrices are the inverted indexes: attribute value -> sorted film ids
+        self.postings = {feature: matrix.tocsc() for feature, matrix in features.items()}
+        for postings in self.postings.values():
+            postings.sort_indices()
+        self.filter_labels, self.filter_ngrams = self._build_filter_indexes(attribute_labels)
+        self._filter_matches = {}
+        self.years = year_array
+        self._embedding_rows = None
+        self.built_at = time.time()
+        self.build_seconds = time.perf_counter() - start
+        logging.info(f"Similarity scorer built with {n_movies} films in {self.build_seconds:.2f} seconds")
+
+    @staticmethod
+    def _build_filter_indexes(attribute_labels):
+        """
+        Index the distinct lower-cased labels of the filterable attributes by their trigrams, so a filter value is
+        matched against the few labels sharing all its trigrams instead of every label.
+
+        Args:
+            attribute_labels (dict): The lower-cased label of every column per feature.
+
+        Returns:
+            tuple: The distinct labels with the int32 columns carrying each, and the sorted label ids per trigram,
+                per feature.
+        """
+        filter_labels, filter_ngrams = {}, {}
+        for feature in SIMILARITY_FILTER_FEATURES:
+            columns = {}
+            for column, label in enumerate(attribute_labels[feature]):
+                columns.setdefault(label, []).append(column)
+            grams = {}
+            for label_id, label in enumerate(columns):
+                for gram in ngrams(label):
+                    grams.setdefault(gram, []).append(label_id)
+            filter_labels[feature] = (list(columns), [np.asarray(ids, dtype=np.int32) for ids in columns.values()])
+            filter_ngrams[feature] = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in grams.items()}
+        return filter_labels, filter_ngrams
+
+    def embedding_rows(self):
+        """
+        Map the films to rows of the plot embedding matrix, using -1 for films without an embedding. The mapping is
+        rebuilt when the embeddings are (re)loaded.
+
+        Returns:
+            np.ndarray: The embedding row per film.
+        """
+        if self._embedding_rows is None or self._embedding_matrix is not self.embeddings.matrix:
+            self._embedding_rows = np.fromiter((self.embeddings.uri_to_row.get(uri, -1) for uri in self.uris),
+                                               dtype=np.int64, count=len(self.uris))
+            self._embedding_matrix = self.embeddings.matrix
+        return self._embedding_rows
+
+    def posting(self, feature, attribute):
+        """
+        Get the posting list of an attribute value: the sorted ids of the films that have it.
+
+        Args:
+            feature (str): The attribute, e.g. "genre".
+            attribute (int): The column of the attribute value.
+
+        Returns:
+            np.ndarray: The int32 film ids.
+        """
+        postings = self.postings[feature]
+        return postings.indices[postings.indptr[attribute]:postings.indptr[attribute + 1]]
+
+    def matching_films(self, feature, value):
+        """
+        Get the films with an attribute whose label contains a filter value. The candidate labels come from the
+        trigram index and the matches of recent values are cached.
+
+        Args:
+            feature (str): The filterable attribute, e.g. "actor".
+            value (str): The lower-cased filter value.
+
+        Returns:
+            np.ndarray: The sorted int32 film ids.
+        """
+        key = (feature, value)
+        matches = self._filter_matches.get(key)
+        if matches is not None:
+            return matches
+
+        labels, columns = self.filter_labels[feature]
+        grams = self.filter_ngrams[feature]
+        label_ids = None
+        # Intersect the label ids of the trigrams of the value, rarest first
+        for gram in sorted(ngrams(value), key=lambda gram: len(grams.get(gram, ()))):
+            posting = grams.get(gram, np.zeros(0, dtype=np.int32))
+            label_ids = posting if label_ids is None else np.intersect1d(label_ids, posting, assume_unique=True)
+            if len(label_ids) == 0:
+                break
+        if label_ids is None:
+            # Values shorter than a trigram are checked against every label
+            label_ids = range(len(labels))
+        # Sharing the trigrams does not make a substring, so the remaining labels are checked
+        films = [self.posting(feature, column) for label_id in label_ids if value in labels[label_id]
+                 for column in columns[label_id].tolist()]
+        matches = np.unique(np.concatenate(films)) if films else np.zeros(0, dtype=np.int32)
+
+        if len(self._filter_matches) >= SIMILARITY_FILTER_CACHE_SIZE:
+            self._filter_matches.pop(next(iter(self._filter_matches)))
+        self._filter_matches[key] = matches
+        return matches
+
+    def filter_candidates(self, candidates, genre=None, actor=None, director=None, start_year=None, end_year=None):
+        """
+        Keep the candidates matching the search filters: every genre, actor and director value must be contained
+        in the label of one of the film's attributes, case-insensitively, like the filters of the SPARQL query.
+
+        Args:
+            candidates (np.ndarray): The sorted candidate film ids.
+
+        Returns:
+            np.ndarray: The candidates that match all filters.
+        """
+        for feature, values in (("genre", genre), ("actor", actor), ("director", director)):
+            if not values:
+                continue
+            for value in values if isinstance(values, list) else [values]:
+                matches = self.matching_films(feature, value.lower())
+                candidates = candidates[np.isin(candidates, matches, assume_unique=True)]
+        if start_year and end_year:
+            years = self.years[candidates]
+            candidates = candidates[(years >= int(start_year)) & (years <= int(end_year))]
+        return candidates
+
+    @staticmethod
+    def feature_weights(weights):
+        """
+        Sum the weights per shared attribute that earns them (see SIMILARITY_WEIGHT_FEATURES).
+
+        Args:
+            weights (dict): The weight per attribute.
+
+        Returns:
+            dict: The total weight per feature matrix, without the features that earn nothing.
+        """
+        totals = {}
+        for name, feature in SIMILARITY_WEIGHT_FEATURES.items():
+            totals[feature] = totals.get(feature, 0) + weights.get(name, 0)
+        return {feature: weight for feature, weight in totals.items() if weight}
+
+    def candidate_scores(self, target_id, weights):
+        """
+        Find the films sharing an attribute with the target film from the union of the posting lists of its
+        attribute values, and score them by the weighted attributes they share, each attribute counting once.
+        Only the films in those posting lists are touched.
+
+        Returns:
+            tuple: The sorted candidate film ids (including the target) and their attribute scores.
+        """
+        film_ids, film_weights = [], []
+        for feature, weight in self.feature_weights(weights).items():
+            matrix = self.features[feature]
+            attributes = matrix.indices[matrix.indptr[target_id]:matrix.indptr[target_id + 1]]
+            if len(attributes) == 0:
+                continue
+            sharing = np.unique(np.concatenate([self.posting(feature, attribute) for attribute in attributes]))
+            film_ids.append(sharing)
+            film_weights.append(np.full(len(sharing), weight, dtype=np.float32))
+        if not film_ids:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+
+        candidates, positions = np.unique(np.concatenate(film_ids), return_inverse=True)
+        scores = np.bincount(positions, weights=np.concatenate(film_weights), minlength=len(candidates))
+        return candidates, scores.astype(np.float32)
+
+    def score(self, target_uri, weights=None, filters=None):
+        """
+        Compute the hybrid similarity of the films sharing an attribute with the target film: the attribute score
+        plus the cosine similarity of the plots scaled to 0-100, relative to the score of the target itself (10).
+
+        Args:
+            target_uri (str): The URI of the target film.
+            weights (dict, optional): The weight per attribute. Defaults to None (SIMILARITY_WEIGHTS).
+            filters (dict, optional): The genre, actor, director, start_year and end_year filters of the search.
+                Defaults to None.
+
+        Returns:
+            list: A list of dictionaries with the object URI, label, similarity score, cosine similarity, scaled
+                cosine similarity and total similarity score, most similar first, or None if the film is unknown.
+        """
+        target_id = self.uri_to_id.get(target_uri)
+        if target_id is None:
+            return None
+        weights = SIMILARITY_WEIGHTS if weights is None else {**SIMILARITY_WEIGHTS, **weights}
+
+        candidates, scores = self.candidate_scores(target_id, weights)
+        position = np.searchsorted(candidates, target_id)
+        target_score = scores[position] if position < len(candidates) and candidates[position] == target_id else 0
+        if filters:
+            kept = self.filter_candidates(candidates, **filters)
+            scores = scores[np.searchsorted(candidates, kept)]
+            candidates = kept
+        return self._rank(target_id, candidates, scores, target_score)
+
+    def _rank(self, target_id, candidates, scores, target_score):
+        """
+        Add the scaled cosine similarity to the attribute scores of the candidates and sort them, relative to the
+        total score of the target film with itself.
+        """
+        target_row = self.embedding_rows()[target_id]
+        if target_row < 0:
+            logging.warning(f"Target embedding not found for {self.uris[target_id]}")
+            order = np.argsort(-scores, kind="stable")
+            return [{"object_uri": self.uris[movie_id], "label": self.titles[movie_id],
+                     "similarity_score": float(scores[position])}
+                    for position, movie_id in zip(order.tolist(), candidates[order].tolist())]
+
+        rows = self.embedding_rows()[candidates]
+        cosine = np.zeros(len(candidates), dtype=np.float32)
+        known = rows >= 0
+        if known.any():
+            cosine[known] = self.embeddings.matrix[rows[known]] @ self.embeddings.matrix[target_row]
+        cosine = np.clip(np.round(cosine, 6), -1.0, 1.0)
+        scaled = np.floor((cosine + 1) * 50).astype(np.int32)
+        totals = scaled + scores
+
+        # The plot of the target is identical to itself, so its total is its attribute score plus 100
+        relative = totals / (target_score + 100) * 10
+        order = np.argsort(-relative, kind="stable")
+        return [{"object_uri": self.uris[movie_id], "label": self.titles[movie_id],
+                 "similarity_score": float(scores[position]), "cosine_similarity": float(cosine[position]),
+                 "cosine_similarity_scaled": int(scaled[position]),
+                 "total_similarity_score": float(relative[position])}
+                for position, movie_id in zip(order.tolist(), candidates[order].tolist())]
+
+    def top_k_table(self, target_ids, k, weights=None):
+        """
+        Compute the k most similar films of a chunk of target films at once, with the score of score(): the
+        attribute scores are sparse matrix products of the chunk with all films and the cosine similarities one
+        dense matrix product with the embedding matrix.
+
+        Args:
+            target_ids (np.ndarray): The film ids of the targets.
+            k (int): The number of neighbours per target.
+            weights (dict, optional): The weight per attribute. Defaults to None (SIMILARITY_WEIGHTS).
+
+        Returns:
+            tuple: The neighbour ids (int32, -1 where a target has fewer neighbours or no embedding), their total
+                similarity scores (float16), attribute scores (float32) and cosine similarities (float32), all of
+                shape (len(target_ids), k), most similar first, and the attribute score of each target with itself.
+        """
+        weights = SIMILARITY_WEIGHTS if weights is None else {**SIMILARITY_WEIGHTS, **weights}
+        n_targets, n_movies = len(target_ids), len(self.uris)
+        scores = np.zeros((n_targets, n_movies), dtype=np.float32)
+        for feature, weight in self.feature_weights(weights).items():
+            matrix = self.features[feature]
+            shared = (matrix[target_ids] @ matrix.T).tocoo()
+            scores[shared.row, shared.col] += weight
+
+        embedding_rows = self.embedding_rows()
+        target_rows = embedding_rows[target_ids]
+        has_embedding = target_rows >= 0
+        known = embedding_rows >= 0
+        cosine = np.zeros((n_targets, n_movies), dtype=np.float32)
+        if has_embedding.any() and known.any():
+            products = self.embeddings.matrix[target_rows[has_embedding]] @ self.embeddings.matrix.T
+            cosine[np.ix_(has_embedding, known)] = products[:, embedding_rows[known]]
+        cosine = np.clip(np.round(cosine, 6), -1.0, 1.0)
+
+        target_scores = scores[np.arange(n_targets), target_ids]
+        relative = (np.floor((cosine + 1) * 50) + scores) / (target_scores[:, None] + 100) * 10
+        # Like score(), only films sharing an attribute are neighbours
+        relative[scores <= 0] = -np.inf
+        relative[~has_embedding] = -np.inf
+
+        k = min(k, n_movies)
+        if k < n_movies:
+            best = np.argpartition(-relative, k - 1, axis=1)[:, :k]
+        else:
+            best = np.tile(np.arange(n_movies), (n_targets, 1))
+        best_scores = np.take_along_axis(relative, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        missing = ~np.isfinite(best_scores)
+        best_attribute_scores = np.take_along_axis(scores, best, axis=1)
+        best_cosine = np.take_along_axis(cosine, best, axis=1)
+        best[missing] = -1
+        best_scores[missing] = 0
+        best_attribute_scores[missing] = 0
+        best_cosine[missing] = 0
+        return (best.astype(np.int32), best_scores.astype(np.float16), best_attribute_scores, best_cosine,
+                target_scores)
+
+    def describe(self):
+        """
+        Get the size and age of the scorer.
+
+        Returns:
+            dict: The number of films and attribute values per feature, and the build time.
+        """
+        return {"films": len(self.uris),
+                "attributes": {feature: matrix.shape[1] for feature, matrix in self.features.items()},
+                "links": {feature: int(matrix.nnz) for feature, matrix in self.features.items()},
+                "built_at": self.built_at, "build_seconds": self.build_seconds}
+
+
+class SimilarityTable:
+    """
+    A precomputed table of the top-K most similar films of every film.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty table.
+        """
+        self.uris = []
+        self.titles = []
+        self.uri_to_id = {}
+        self.neighbour_ids = np.zeros((0, 0), dtype=np.int32)
+        self.scores = np.zeros((0, 0), dtype=np.float16)
+        self.similarity_scores = np.zeros((0, 0), dtype=np.float32)
+        self.cosine = np.zeros((0, 0), dtype=np.float32)
+        self.self_scores = np.zeros(0, dtype=np.float32)
+        self.weights = {}
+        self.built_at = None
+
+    @property
+    def is_loaded(self):
+        """
+        Check if the table holds any films.
+
+        Returns:
+            bool: True if at least one film is loaded, False otherwise.
+        """
+        return len(self.uris) > 0
+
+    @property
+    def k(self):
+        """
+        Get the number of neighbours per film.
+
+        Returns:
+            int: The number of neighbours.
+        """
+        return self.neighbour_ids.shape[1]
+
+    def save(self, path, uris, titles, neighbour_ids, scores, similarity_scores, cosine, self_scores, weights):
+        """
+        Write a table to an .npz file.
+
+        Args:
+            path (str): Path of the .npz file.
+            uris (list): The film URIs, indexed by film id.
+            titles (list): The film titles, indexed by film id.
+            neighbour_ids (np.ndarray): The int32 neighbour ids per film.
+            scores (np.ndarray): The float16 total similarity scores per film.
+            similarity_scores (np.ndarray): The float32 attribute scores per film.
+            cosine (np.ndarray): The float32 cosine similarities of the plots per film.
+            self_scores (np.ndarray): The float32 attribute score of every film with itself.
+            weights (dict): The weights the scores were computed with.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez(path, uris=np.asarray(uris, dtype=str), titles=np.asarray(titles, dtype=str),
+                 neighbour_ids=neighbour_ids, scores=scores, similarity_scores=similarity_scores, cosine=cosine,
+                 self_scores=self_scores, weights=np.asarray(json.dumps(weights, sort_keys=True)),
+                 built_at=np.asarray(time.time()))
+
+    def load(self, path):
+        """
+        Load a table written by save().
+
+        Args:
+            path (str): Path of the .npz file.
+        """
+        with np.load(path) as data:
+            if "similarity_scores" not in data.files:
+                logging.warning(f"The similarity table at {path} has no component scores, rerun precompute_similar.py")
+                return
+            uris = data["uris"].tolist()
+            self.titles = data["titles"].tolist()
+            self.neighbour_ids = data["neighbour_ids"]
+            self.scores = data["scores"]
+            self.similarity_scores = data["similarity_scores"]
+            self.cosine = data["cosine"]
+            self.self_scores = data["self_scores"]
+            self.weights = json.loads(str(data["weights"]))
+            self.built_at = float(data["built_at"])
+        self.uris = uris
+        self.uri_to_id = {uri: movie_id for movie_id, uri in enumerate(uris)}
+        logging.info(f"Similarity table loaded from {path} with {len(uris)} films and {self.k} neighbours each")
+
+    def neighbours(self, uri, k):
+        """
+        Get the precomputed most similar films of a film.
+
+        Args:
+            uri (str): The film URI.
+            k (int): The number of neighbours.
+
+        Returns:
+            list: A list of dictionaries with the object URI, label, attribute score, cosine similarity and total
+                similarity score, like HybridScorer.score(), most similar first, plus the film itself if it is not
+                among them, or None if the film is not in the table or k exceeds the neighbours kept per film.
+        """
+        movie_id = self.uri_to_id.get(uri)
+        if movie_id is None or k > self.k or self.neighbour_ids[movie_id, 0] < 0:
+            return None
+        neighbours = []
+        for neighbour_id, score, similarity_score, cosine in zip(self.neighbour_ids[movie_id, :k].tolist(),
+                                                                 self.scores[movie_id, :k].tolist(),
+                                                                 self.similarity_scores[movie_id, :k].tolist(),
+                                                                 self.cosine[movie_id, :k].tolist()):
+            if neighbour_id < 0:
+                break
+            neighbours.append({"object_uri": self.uris[neighbour_id], "label": self.titles[neighbour_id],
+                               "similarity_score": similarity_score, "cosine_similarity": cosine,
+                               "cosine_similarity_scaled": int(np.floor((cosine + 1) * 50)),
+                               "total_similarity_score": score})
+        if all(neighbour["object_uri"] != uri for neighbour in neighbours):
+            # Scores are relative to the film itself, whose plot is identical to itself and which scores 10
+            neighbours.append({"object_uri": uri, "label": self.titles[movie_id],
+                               "similarity_score": float(self.self_scores[movie_id]),
+                               "cosine_similarity": 1.0, "cosine_similarity_scaled": 100,
+                               "total_similarity_score": 10.0})
+        return neighbours
+
+    def describe(self):
+        """
+        Get the size, weights and age of the table.
+
+        Returns:
+            dict: The number of films and neighbours per film, the weights and the build time.
+        """
+        return {"films": len(self.uris), "neighbours": self.k if self.is_loaded else 0, "weights": self.weights,
+                "built_at": self.built_at}
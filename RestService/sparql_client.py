@@ -0,0 +1,174 @@
+"""
+file: sparql_client.py
+date: 17-10-2026
+description: This module provides an asynchronous SPARQL client for the GraphDB endpoint. It keeps a pool of
+keep-alive HTTP connections and builds a new request per query, so concurrent queries overlap instead of
+blocking the event loop or racing on a shared query object.
+"""
+
+import logging
+import os
+import re
+import httpx
+
+SPARQL_MAX_CONNECTIONS = int(os.environ.get("SPARQL_MAX_CONNECTIONS", "20"))
+SPARQL_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("SPARQL_MAX_KEEPALIVE_CONNECTIONS", "10"))
+SPARQL_CONNECT_TIMEOUT = float(os.environ.get("SPARQL_CONNECT_TIMEOUT", "5"))
+SPARQL_QUERY_TIMEOUT = float(os.environ.get("SPARQL_QUERY_TIMEOUT", "120"))
+
+
+_ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+_ESCAPE_PATTERN = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))')
+
+
+def _unescape(match):
+    code = match.group(1) or match.group(2)
+    if code:
+        return chr(int(code, 16))
+    return _ESCAPES.get(match.group(3), match.group(0))
+
+
+def parse_tsv_term(term):
+    """
+    Parse an RDF term of a SPARQL TSV result into its value: the IRI of an IRI, the (unescaped) lexical form
+    of a literal without its language tag or datatype, and anything else (blank nodes, bare numbers) as is.
+
+    Args:
+        term (str): The term in N-Triples syntax.
+
+    Returns:
+        str: The value of the term, or None for an unbound variable.
+    """
+    if not term:
+        return None
+    if term[0] == "<" and term[-1] == ">":
+        return term[1:-1]
+    if term[0] == '"':
+        lexical = term[1:term.rindex('"')]
+        return _ESCAPE_PATTERN.sub(_unescape, lexical) if "\\" in lexical else lexical
+    return term
+
+
+class SparqlQueryError(Exception):
+    """
+    Raised when the SPARQL endpoint cannot be reached or rejects a query.
+    """
+
+
+class SparqlConnectionError(SparqlQueryError):
+    """
+    Raised when the SPARQL endpoint cannot be reached or fails with a server error, as opposed to rejecting a query.
+    """
+
+
+class AsyncSparqlClient:
+    """
+    An asynchronous SPARQL client with a pool of keep-alive connections to one endpoint.
+    """
+
+    def __init__(self, endpoint, max_connections=SPARQL_MAX_CONNECTIONS,
+                 max_keepalive_connections=SPARQL_MAX_KEEPALIVE_CONNECTIONS,
+                 connect_timeout=SPARQL_CONNECT_TIMEOUT, query_timeout=SPARQL_QUERY_TIMEOUT):
+        """
+        Initialize the client. The connection pool is created on first use, inside the running event loop.
+
+        Args:
+            endpoint (str): The SPARQL endpoint URL.
+            max_connections (int, optional): The maximum number of concurrent connections. Defaults to SPARQL_MAX_CONNECTIONS.
+            max_keepalive_connections (int, optional): The maximum number of idle connections kept open.
+                Defaults to SPARQL_MAX_KEEPALIVE_CONNECTIONS.
+            connect_timeout (float, optional): Seconds to wait for a connection. Defaults to SPARQL_CONNECT_TIMEOUT.
+            query_timeout (float, optional): Seconds to wait for a query response. Defaults to SPARQL_QUERY_TIMEOUT.
+        """
+        self.endpoint = endpoint
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        self.timeout = httpx.Timeout(query_timeout, connect=connect_timeout)
+        self._client = None
+
+    @property
+    def client(self):
+        """
+        Get the pooled HTTP client, creating it on first use.
+
+        Returns:
+            httpx.AsyncClient: The HTTP client.
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        return self._client
+
+    async def query(self, query, accept="application/sparql-results+json"):
+        """
+        Execute a SPARQL query.
+
+        Args:
+            query (str): The SPARQL query.
+            accept (str, optional): The result format to request. Defaults to SPARQL JSON results.
+
+        Returns:
+            dict: The parsed SPARQL JSON results.
+        """
+        try:
+            response = await self.client.post(self.endpoint, data={"query": query}, headers={"Accept": accept})
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            error = SparqlConnectionError if e.response.status_code >= 500 else SparqlQueryError
+            raise error(f"SPARQL endpoint returned {e.response.status_code}: {e.response.text[:500]}") from e
+        except httpx.HTTPError as e:
+            raise SparqlConnectionError(f"SPARQL request to {self.endpoint} failed: {e!r}") from e
+        return response.json()
+
+    async def stream_rows(self, query):
+        """
+        Execute a SPARQL SELECT query and yield the result rows while the response is still being received,
+        using the tab-separated results format, which holds exactly one row per line.
+
+        Args:
+            query (str): The SPARQL query.
+
+        Returns:
+            AsyncIterator[dict]: The value of every bound variable per row, keyed by variable name.
+        """
+        try:
+            async with self.client.stream("POST", self.endpoint, data={"query": query},
+                                          headers={"Accept": "text/tab-separated-values"}) as response:
+                if response.is_error:
+                    await response.aread()
+                    response.raise_for_status()
+                variables = None
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    terms = line.split("\t")
+                    if variables is None:
+                        variables = [variable.lstrip("?$") for variable in terms]
+                        continue
+                    yield {variable: value for variable, value in zip(variables, map(parse_tsv_term, terms))
+                           if value is not None}
+        except httpx.HTTPStatusError as e:
+            error = SparqlConnectionError if e.response.status_code >= 500 else SparqlQueryError
+            raise error(f"SPARQL endpoint returned {e.response.status_code}: {e.response.text[:500]}") from e
+        except httpx.HTTPError as e:
+            raise SparqlConnectionError(f"SPARQL request to {self.endpoint} failed: {e!r}") from e
+
+    async def ask(self, query="ASK WHERE { ?s ?p ?o }"):
+        """
+        Execute a SPARQL ASK query.
+
+        Args:
+            query (str, optional): The ASK query. Defaults to checking that the repository holds any triple.
+
+        Returns:
+            bool: The boolean result of the query.
+        """
+        result = await self.query(query)
+        return result.get("boolean", False)
+
+    async def close(self):
+        """
+        Close all pooled connections.
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logging.info(f"Closed SPARQL connection pool to {self.endpoint}")
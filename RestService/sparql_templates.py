@@ -0,0 +1,241 @@
+"""
+file: sparql_templates.py
+date: 17-10-2026
+description: This module prepares the SPARQL queries of the REST service as templates. Each query shape (e.g. the
+movie search with two genre filters and a year range) is compiled once and reused; request values are bound as
+escaped literals, IRIs and VALUES blocks instead of being spliced into the query text. Every template keeps its
+execution count and timings, served at /query_stats.
+"""
+
+import re
+import string
+import textwrap
+from urllib.parse import quote
+
+PREFIXES = """PREFIX dbo: <http://dbpedia.org/ontology/>
+PREFIX dbr: <http://dbpedia.org/resource/>
+PREFIX onto: <http://www.ontotext.com/>
+PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
+"""
+
+_LITERAL_ESCAPES = {"\\": "\\\\", '"': '\\"', "\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+_LITERAL_PATTERN = re.compile(r'[\\"\n\r\t\b\f]')
+# Characters that cannot occur in an IRI, so a bound IRI cannot break out of <...>
+IRI_PATTERN = re.compile(r'^[^<>"{}|^`\\\s]+$')
+_IRI_UNSAFE_PATTERN = re.compile(r'[<>"{}|^`\\\s]')
+# Words of a full-text search; everything else, including the Lucene operators, is dropped
+_FTS_WORD_PATTERN = re.compile(r"\w+")
+
+
+def literal(value):
+    """
+    Bind a value as an escaped string literal.
+
+    Args:
+        value (str): The value.
+
+    Returns:
+        str: The quoted SPARQL literal.
+    """
+    return '"' + _LITERAL_PATTERN.sub(lambda match: _LITERAL_ESCAPES[match.group()], str(value)) + '"'
+
+
+def typed_literal(value, datatype):
+    """
+    Bind a value as an escaped literal of a datatype, e.g. typed_literal(1994, "xsd:gYear").
+
+    Args:
+        value: The value.
+        datatype (str): The prefixed name of the datatype.
+
+    Returns:
+        str: The typed SPARQL literal.
+    """
+    return f"{literal(value)}^^{datatype}"
+
+
+def integer(value):
+    """
+    Bind a value as an integer, e.g. for LIMIT.
+
+    Raises:
+        ValueError: If the value is not an integer.
+    """
+    return str(int(value))
+
+
+def number(value):
+    """
+    Bind a value as a decimal number, e.g. a weight.
+
+    Raises:
+        ValueError: If the value is not a number.
+    """
+    return f"{float(value):g}"
+
+
+def iri(value):
+    """
+    Bind a value as an IRI.
+
+    Args:
+        value (str): The absolute IRI.
+
+    Returns:
+        str: The IRI in angle brackets.
+
+    Raises:
+        ValueError: If the value contains characters that are not allowed in an IRI.
+    """
+    if not IRI_PATTERN.match(value):
+        raise ValueError(f"Invalid IRI: {value}")
+    return f"<{value}>"
+
+
+def iri_encode(value):
+    """
+    Percent-encode the characters that are not allowed in an IRI, e.g. for an IRI derived from a title.
+
+    Args:
+        value (str): The value.
+
+    Returns:
+        str: The value, safe to bind with iri().
+    """
+    return _IRI_UNSAFE_PATTERN.sub(lambda match: quote(match.group()), value)
+
+
+def fts_query(values):
+    """
+    Build the Lucene query of the GraphDB full-text index (onto:fts) matching any of the values, with every word
+    of a value required as a word prefix. E.g. ["Star Wa"] gives "(star* AND wa*)".
+
+    Args:
+        values (list): The searched values.
+
+    Returns:
+        str: The Lucene query, to bind with literal(), or None if a value has no words to search for.
+    """
+    clauses = []
+    for value in values:
+        words = _FTS_WORD_PATTERN.findall(value.lower())
+        if not words:
+            return None
+        clauses.append("(" + " AND ".join(f"{word}*" for word in words) + ")")
+    return " OR ".join(clauses)
+
+
+def values_block(variable, terms):
+    """
+    Bind a list of terms to a variable with a VALUES block.
+
+    Args:
+        variable (str): The variable name, without "?".
+        terms (list): The bound terms, e.g. from iri() or literal().
+
+    Returns:
+        str: The VALUES block.
+    """
+    return f"VALUES ?{variable} {{ {' '.join(terms)} }}"
+
+
+class QueryTemplate:
+    """
+    A SPARQL query shape compiled once, with $name placeholders for the bound values and execution statistics.
+    """
+
+    def __init__(self, name, text):
+        """
+        Compile a template.
+
+        Args:
+            name (str): The name the statistics are reported under.
+            text (str): The query without prefixes, with $name placeholders for bound terms.
+        """
+        self.name = name
+        self.template = string.Template(PREFIXES + textwrap.dedent(text))
+        self.executions = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def render(self, **bindings):
+        """
+        Bind the values of the placeholders. The values must already be SPARQL terms (see literal() and iri()).
+
+        Returns:
+            str: The query.
+        """
+        return self.template.substitute(bindings)
+
+    def record(self, seconds, failed=False):
+        """
+        Record one execution of the template.
+
+        Args:
+            seconds (float): The execution time.
+            failed (bool, optional): Whether the execution failed. Defaults to False.
+        """
+        self.executions += 1
+        self.errors += int(failed)
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+
+class TemplateRegistry:
+    """
+    The prepared query templates, one per name and shape.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty registry.
+        """
+        self.templates = {}
+
+    def prepare(self, name, shape, build):
+        """
+        Get the template of a query shape, compiling it on first use.
+
+        Args:
+            name (str): The query name.
+            shape (tuple): What distinguishes the shapes of the query, e.g. the number of filters per property.
+            build (callable): A function of the shape that returns the template text.
+
+        Returns:
+            QueryTemplate: The prepared template.
+        """
+        key = (name, shape)
+        template = self.templates.get(key)
+        if template is None:
+            template = self.templates[key] = QueryTemplate(name, build(shape))
+        return template
+
+    def stats(self):
+        """
+        Get the execution statistics per query name, over all its shapes.
+
+        Returns:
+            dict: The number of shapes, executions and errors, and the mean and maximum execution time in
+                milliseconds per query name.
+        """
+        stats = {}
+        for template in self.templates.values():
+            entry = stats.setdefault(template.name, {"shapes": 0, "executions": 0, "errors": 0, "total_ms": 0.0,
+                                                     "max_ms": 0.0})
+            entry["shapes"] += 1
+            entry["executions"] += template.executions
+            entry["errors"] += template.errors
+            entry["total_ms"] += template.total_seconds * 1000
+            entry["max_ms"] = max(entry["max_ms"], template.max_seconds * 1000)
+        for entry in stats.values():
+            entry["mean_ms"] = round(entry["total_ms"] / entry["executions"], 2) if entry["executions"] else None
+            entry["total_ms"] = round(entry["total_ms"], 2)
+            entry["max_ms"] = round(entry["max_ms"], 2)
+        return stats
+
+
+query_templates = TemplateRegistry()
+
@@ -15,22 +15,35 @@ logging.basicConfig(level=logging.INFO)
 app = Dash(__name__, suppress_callback_exceptions=True)
 
 # Function to fetch dropdown options from REST API
-def get_options_from_api(endpoint, retries=5, wait=5):
-    for attempt in range(retries):
-        try:
-            logging.info(f"Fetching options from API: {endpoint} (attempt {attempt + 1}/{retries})")
-            response = requests.get(endpoint)
-            response.raise_for_status()
-            data = response.json()
-            if data:
-                logging.info(f"Successfully fetched options from API: {endpoint}")
-                return [{"label": item["label"], "value": item["label"]} for item in data], {item["label"]: item["object_uri"] for item in data}
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error fetching options from API (attempt {attempt + 1}/{retries}): {e}")
-            if attempt < retries - 1:
-                time.sleep(wait)
-    logging.error(f"Failed to fetch options from API after {retries} attempts: {endpoint}")
-    return [], {}
+# The lookup endpoints are paginated: follow the X-Next-Cursor header for up to max_pages pages (None for all)
+def get_options_from_api(endpoint, retries=5, wait=5, max_pages=1):
+    data = []
+    cursor = None
+    pages = 0
+    while True:
+        for attempt in range(retries):
+            try:
+                logging.info(f"Fetching options from API: {endpoint} cursor {cursor} (attempt {attempt + 1}/{retries})")
+                response = requests.get(endpoint, params={"cursor": cursor} if cursor else None)
+                response.raise_for_status()
+                data.extend(response.json())
+                break
+            except requests.exceptions.RequestException as e:
+                logging.error(f"Error fetching options from API (attempt {attempt + 1}/{retries}): {e}")
+                if attempt < retries - 1:
+                    time.sleep(wait)
+        else:
+            logging.error(f"Failed to fetch options from API after {retries} attempts: {endpoint}")
+            break
+
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor or (max_pages is not None and pages >= max_pages):
+            break
+
+    if data:
+        logging.info(f"Successfully fetched {len(data)} options from API: {endpoint}")
+    return [{"label": item["label"], "value": item["label"]} for item in data], {item["label"]: item["object_uri"] for item in data}
 
 def is_running_in_docker():
     """Check if the code is running inside a Docker container."""
@@ -44,9 +57,13 @@ REST_SERVICE_URI = "http://localhost:80"
 if is_running_in_docker():
     REST_SERVICE_URI = "http://host.docker.internal:80"
 
+# Movie details rendered in the results, the REST service only queries these
+MOVIE_DETAIL_FIELDS = ['runtime', 'releaseYear', 'country', 'genres', 'starring', 'directors', 'abstract']
+
 # Fetch initial options
 logging.info("Fetching initial options for dropdowns")
-movies_options, movies_uri_mapping = get_options_from_api(f'{REST_SERVICE_URI}/movies')
+# The film title dropdown has no search callback, so it needs every title
+movies_options, movies_uri_mapping = get_options_from_api(f'{REST_SERVICE_URI}/movies', max_pages=None)
 director_options, _ = get_options_from_api(f'{REST_SERVICE_URI}/directors')
 actor_options, _ = get_options_from_api(f'{REST_SERVICE_URI}/actors')
 genre_options, _ = get_options_from_api(f'{REST_SERVICE_URI}/genres')
@@ -184,7 +201,8 @@ def handle_search_and_display(n_clicks, film_title, enable_year_range, year,
         'actors': [quote(actor) for actor in actors] if actors else None,
         'director': quote(director) if director else None,
         'description': quote(plot_description) if plot_description else None,
-        'getSimilarMovies': True if film_uri else False
+        'getSimilarMovies': True if film_uri else False,
+        'fields': MOVIE_DETAIL_FIELDS
     }
     
     logging.info(f"Sending request to {REST_SERVICE_URI}/movies_details with params: {params}")
@@ -13,6 +13,9 @@ import docker
 import pandas as pd
 import urllib.parse
 
+# Create the repository with the GraphDB full-text index, which the Rest Service uses for name filters
+ENABLE_FULL_TEXT_SEARCH = os.environ.get("GRAPHDB_FULL_TEXT_SEARCH", "false").lower() == "true"
+
 
 def info(message):
     print(f"[INFO] {message}")
@@ -111,8 +114,12 @@ def setup_environment(ttl_file_path):
         # Upload repository configuration file
         repo_config_path = "DB/Datasets/TTLs/repo-config.ttl"
         with open(repo_config_path, 'rb') as repo_config_file:
-            files = {'config': repo_config_file}
-            response = requests.post(f"{GRAPHDB_URL}", files=files)
+            repo_config = repo_config_file.read()
+        if ENABLE_FULL_TEXT_SEARCH:
+            info("Enabling the full-text search index of the repository.")
+            repo_config = repo_config.replace(b'graphdb:enable-fts-index "false"', b'graphdb:enable-fts-index "true"')
+        files = {'config': ("repo-config.ttl", repo_config)}
+        response = requests.post(f"{GRAPHDB_URL}", files=files)
         if response.status_code == 201:
             success("GraphDB repository created successfully.")
         else:
@@ -120,6 +127,8 @@ def setup_environment(ttl_file_path):
             return
     else:
         info("GraphDB repository already exists.")
+        if ENABLE_FULL_TEXT_SEARCH:
+            info("The full-text search index is only enabled when the repository is created; run delete_all first to enable it.")
         # Delete existing data in the repository
         delete_existing_data(REPO_ID)
 
@@ -164,6 +173,7 @@ def setup_environment(ttl_file_path):
     PING_REST_SERVICE = "http://localhost:80/genres"
     if not wait_for_service(PING_REST_SERVICE):
         return
+    warm_up_cache("http://localhost:80/warmup")
     print("Creating the UI container...")
     subprocess.run(["docker-compose", "-f", "./UI/ui.yml", "up", "-d", "--build"])
 
@@ -174,6 +184,19 @@ def setup_environment(ttl_file_path):
     print("Waiting for the containers to be in a valid state...")
     wait_for_containers(container_names)
 
+def warm_up_cache(url, timeout=1800):
+    # Replay the hot queries of the UI, so its first users do not pay the cold-cache latency
+    info("Warming the Rest Service caches...")
+    try:
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+        report = response.json()
+        success(f"Warmed the caches with {report['responses']} responses in {report['seconds']} seconds.")
+        if report["failed"]:
+            error(f"{len(report['failed'])} warm-up requests failed: {report['failed']}")
+    except requests.exceptions.RequestException as e:
+        error(f"Failed to warm the caches: {e}")
+
 def wait_for_containers(container_names, timeout=300, interval=10):
     client = docker.from_env()
     elapsed = 0